@@ -8,12 +8,13 @@ import streamlit as st
 import boto3
 import json
 import os
+import uuid
 from datetime import datetime, timedelta
-from io import BytesIO
-from PIL import Image
 import pandas as pd
 import time
 
+from dashboard import s3_data, bundler, progress, status_channel, costs, analytics, preflight
+
 # Page configuration
 st.set_page_config(
     page_title="Campaign Creator",
@@ -87,7 +88,9 @@ def get_aws_clients():
         's3': boto3.client('s3', verify=False, config=config),
         'logs': boto3.client('logs', verify=False, config=config),
         'lambda': boto3.client('lambda', verify=False, config=config),
-        'sqs': boto3.client('sqs', verify=False, config=config)
+        'sqs': boto3.client('sqs', verify=False, config=config),
+        'cloudwatch': boto3.client('cloudwatch', verify=False, config=config),
+        'sns': boto3.client('sns', verify=False, config=config)
     }
 
 # Suppress SSL warnings
@@ -96,11 +99,51 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 clients = get_aws_clients()
 
+@st.cache_resource
+def get_status_channel():
+    """Start the process-wide status channel subscriber (None if no channel is configured)"""
+    channel = status_channel.from_environment(clients['sqs'], clients['sns'])
+    if channel:
+        channel.start()
+    return channel
+
 # Configuration
 BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'creative-automation-dev-keita-2025')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
 PROJECT_NAME = os.environ.get('PROJECT_NAME', 'creative-automation')
 
+# How often a live-updating page checks the status channel, and refreshes without an event (seconds)
+LIVE_POLL_INTERVAL = 2
+LIVE_UPDATE_TIMEOUT = 30
+
+def show_preflight(brief):
+    """Estimate a brief with the parser's pre-flight check and show the result"""
+    try:
+        with st.spinner("Estimating cost and time..."):
+            estimate = preflight.estimate(clients['lambda'], f"{ENVIRONMENT}-{PROJECT_NAME}-parser", brief)
+    except ValueError as e:
+        st.error(f"❌ {str(e)}")
+        return
+    except Exception as e:
+        st.error("Unable to estimate this campaign right now. Please try again.")
+        return
+    
+    duration = estimate['duration']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Estimated Cost", f"${estimate['cost']['dollars']:.2f}")
+    col2.metric("AI Generations", estimate['generation']['products'], help=f"About {estimate['generation']['bedrock_calls']} Bedrock calls including retries")
+    col3.metric("Expected Time", preflight.format_duration(duration['expected_seconds']), help=f"95% of similar products finished within {preflight.format_duration(duration['p95_seconds'])}")
+    col4.metric("Queued Ahead", estimate['generation']['queue_depth'], help=f"Generation jobs already waiting in the {estimate['priority']} queue")
+    
+    assets = estimate['existing_assets']
+    if assets['requested']:
+        st.write(f"🖼️ Existing images found for {assets['available']} of {assets['requested']} products"
+                 f" ({estimate['render_cache']['cached']} of {estimate['render_cache']['variants']} formats already rendered)")
+    if assets['missing']:
+        st.warning(f"No existing image found for: {', '.join(assets['missing'])}")
+    if not duration['latency_samples']:
+        st.caption("Times are rough defaults until recent campaigns have been recorded.")
+
 # Main header
 st.markdown('<h1 class="main-header">🎨 Campaign Creator</h1>', unsafe_allow_html=True)
 st.markdown("**Create Professional Social Media Campaigns in Minutes**")
@@ -119,129 +162,115 @@ if page == "🏠 Overview":
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
     
+    # Bounded reads only: the briefs prefix, campaign prefixes, analytics totals and ledger rollups.
+    # Each is read on its own, so one that fails (a missing permission, say) blanks only its own figure
+    unavailable = []
+    try:
+        briefs = s3_data.count_briefs(clients['s3'], BUCKET_NAME)
+    except Exception:
+        briefs = None
+        unavailable.append("Campaigns Created")
+    try:
+        campaign_ids = s3_data.list_campaign_ids(clients['s3'], BUCKET_NAME)
+    except Exception:
+        campaign_ids = None
+        unavailable.append("Campaigns Ready")
+    try:
+        spend = costs.all_costs(clients['s3'], BUCKET_NAME, tuple((campaign_ids or [])[:10]))
+    except Exception:
+        spend = None
+        unavailable.append("Total Investment")
+    try:
+        variants = analytics.export_totals(clients['s3'], BUCKET_NAME)['variants']
+    except Exception:
+        variants = None
+        unavailable.append("Images Generated")
+    
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        try:
-            # Count campaign briefs
-            response = clients['s3'].list_objects_v2(
-                Bucket=BUCKET_NAME,
-                Prefix='input/campaign-briefs/'
-            )
-            contents = response.get('Contents', [])
-            # Count only actual JSON files, not folder markers
-            total_briefs = sum(1 for obj in contents if obj['Key'].endswith('.json'))
-            st.metric("Campaigns Created", total_briefs)
-        except:
-            st.metric("Campaigns Created", 0)
+        st.metric("Campaigns Created", briefs if briefs is not None else "N/A")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        try:
-            # Count generated images
-            response = clients['s3'].list_objects_v2(
-                Bucket=BUCKET_NAME,
-                Prefix='output/',
-                Delimiter='/'
-            )
-            total_outputs = len(response.get('CommonPrefixes', []))
-            st.metric("Campaigns Ready", total_outputs)
-        except:
-            st.metric("Campaigns Ready", "N/A")
+        st.metric("Campaigns Ready", len(campaign_ids) if campaign_ids is not None else "N/A")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        try:
-            # Calculate total cost from manifests
-            response = clients['s3'].list_objects_v2(
-                Bucket=BUCKET_NAME,
-                Prefix='output/'
-            )
-            total_cost = 0.0
-            for obj in response.get('Contents', []):
-                if 'manifest.json' in obj['Key']:
-                    try:
-                        manifest_obj = clients['s3'].get_object(Bucket=BUCKET_NAME, Key=obj['Key'])
-                        manifest = json.loads(manifest_obj['Body'].read())
-                        total_cost += manifest.get('total_cost', 0.0)
-                    except:
-                        pass
-            st.metric("Total Investment", f"${total_cost:.2f}")
-        except:
-            st.metric("Total Investment", "$0.00")
+        st.metric("Total Investment", f"${spend['total']:.2f}" if spend else "N/A")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        try:
-            # Count total variants
-            response = clients['s3'].list_objects_v2(
-                Bucket=BUCKET_NAME,
-                Prefix='output/'
-            )
-            total_variants = sum(1 for obj in response.get('Contents', []) if 'variants/' in obj['Key'])
-            st.metric("Images Generated", total_variants)
-        except:
-            st.metric("Images Generated", "N/A")
+        st.metric("Images Generated", variants if variants is not None else "N/A")
         st.markdown('</div>', unsafe_allow_html=True)
     
+    if unavailable:
+        st.warning(f"⚠️ Couldn't load {', '.join(unavailable)} right now; the other figures are up to date.")
+    
     st.divider()
     
     # Recent campaigns
     st.subheader("📋 Your Recent Campaigns")
     
-    try:
-        # List recent campaign outputs
-        response = clients['s3'].list_objects_v2(
-            Bucket=BUCKET_NAME,
-            Prefix='output/',
-            Delimiter='/'
-        )
-        
-        campaigns = []
-        for prefix in response.get('CommonPrefixes', [])[:10]:
-            campaign_id = prefix['Prefix'].split('/')[-2]
+    if campaign_ids is None:
+        st.error("We're having trouble loading your campaigns right now. Please refresh the page or contact support.")
+    else:
+        try:
+            recent_ids = campaign_ids[:10]
+            recent_manifests = s3_data.get_manifests(clients['s3'], BUCKET_NAME, tuple(recent_ids))
             
-            # Try to get manifest
-            try:
-                manifest_obj = clients['s3'].get_object(
-                    Bucket=BUCKET_NAME,
-                    Key=f"{prefix['Prefix']}manifest.json"
-                )
-                manifest = json.loads(manifest_obj['Body'].read())
-                
-                # Count unique products by using expected_products or counting those with variants
-                product_count = manifest.get('expected_products', 0)
-                if product_count == 0:
-                    # Fallback: count unique products with variants
-                    product_count = sum(1 for p in manifest.get('products', []) if 'variants' in p)
+            campaigns = []
+            for campaign_id in recent_ids:
+                manifest = recent_manifests.get(campaign_id)
                 
-                status_display = "✅ Ready" if manifest.get('status') == 'completed' else "⏳ Processing"
-                campaigns.append({
-                    'Campaign Name': manifest.get('campaign_name', 'N/A'),
-                    'Products': product_count,
-                    'Status': status_display,
-                    'Investment': f"${manifest.get('total_cost', 0.0):.2f}",
-                    'Created': manifest.get('created_at', 'N/A')[:19]
-                })
-            except:
-                campaigns.append({
-                    'Campaign Name': campaign_id,
-                    'Products': 0,
-                    'Status': '⏳ Processing',
-                    'Investment': '$0.00',
-                    'Created': 'N/A'
-                })
+                if manifest:
+                    # Count unique products by using expected_products or counting those with variants
+                    product_count = manifest.get('expected_products', 0)
+                    if product_count == 0:
+                        # Fallback: count unique products with variants
+                        product_count = sum(1 for p in manifest.get('products', []) if 'variants' in p)
+                    
+                    status_display = "✅ Ready" if manifest.get('status') == 'completed' else "⏳ Processing"
+                    campaigns.append({
+                        'Campaign Name': manifest.get('campaign_name', 'N/A'),
+                        'Products': product_count,
+                        'Status': status_display,
+                        'Investment': f"${spend['by_campaign'].get(campaign_id, 0.0):.2f}" if spend else "N/A",
+                        'Created': manifest.get('created_at', 'N/A')[:19]
+                    })
+                else:
+                    campaigns.append({
+                        'Campaign Name': campaign_id,
+                        'Products': 0,
+                        'Status': '⏳ Processing',
+                        'Investment': '$0.00',
+                        'Created': 'N/A'
+                    })
+            
+            if campaigns:
+                df = pd.DataFrame(campaigns)
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            else:
+                st.info("🚀 Ready to get started? Create your first campaign and watch the magic happen!")
         
-        if campaigns:
-            df = pd.DataFrame(campaigns)
-            st.dataframe(df, use_container_width=True, hide_index=True)
-        else:
-            st.info("🚀 Ready to get started? Create your first campaign and watch the magic happen!")
+        except Exception as e:
+            st.error("We're having trouble loading your campaigns right now. Please refresh the page or contact support.")
     
-    except Exception as e:
-        st.error("We're having trouble loading your campaigns right now. Please refresh the page or contact support.")
+    # Historical analytics from the Parquet export (refreshed by the scheduled compaction)
+    with st.expander("📈 Last 7 Days"):
+        try:
+            history = analytics.summarize(analytics.recent_products(clients['s3'], BUCKET_NAME))
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Products", history['products'])
+            col2.metric("Spend", f"${history['spend']:.2f}")
+            col3.metric("Generation p50 / p95", f"{history['generate_p50']:.0f}s / {history['generate_p95']:.0f}s" if history['generate_p50'] is not None else "N/A")
+            col4.metric("Bedrock Throttles", history['throttles'])
+            if not history['spend_by_day'].empty:
+                st.bar_chart(history['spend_by_day'])
+        except Exception as e:
+            st.info("Analytics will appear after the next scheduled export.")
     
     st.divider()
     
@@ -281,9 +310,17 @@ if page == "🏠 Overview":
             st.success("✅ Storage connected")
             
             # Get bucket size
-            response = clients['s3'].list_objects_v2(Bucket=BUCKET_NAME)
-            total_size = sum(obj['Size'] for obj in response.get('Contents', []))
-            st.info(f"📊 Space Used: {total_size / (1024**2):.1f} MB")
+            # From S3's daily storage metric, so it lags new uploads by up to a day
+            try:
+                total_size = s3_data.bucket_size(clients['cloudwatch'], BUCKET_NAME)
+            except Exception:
+                # Needs cloudwatch:GetMetricStatistics; the storage connection itself is fine
+                st.warning("📊 Space Used: storage metric unavailable")
+            else:
+                if total_size is None:
+                    st.info("📊 Space Used: available after S3's first daily storage report")
+                else:
+                    st.info(f"📊 Space Used: {total_size / (1024**2):.1f} MB")
         except Exception as e:
             st.error("❌ Storage connection issue")
 
@@ -345,29 +382,51 @@ elif page == "📝 Create Campaign":
                         "description": p_desc
                     }
                     if p_existing:
-                        product["existing_asset_url"] = p_existing
+                        product["existing_assets"] = p_existing
                     products.append(product)
         
         st.divider()
         
+        preview_first = st.checkbox(
+            "⚡ Preview first",
+            help="Get a fast, low-cost draft (standard quality, 2 social formats). Promote the products you approve to full quality afterwards."
+        )
+        
+        # Build campaign brief
+        brief = {
+            "campaign_name": campaign_name,
+            "campaign_message": campaign_message,
+            "target_audience": target_audience,
+            "target_regions": target_regions,
+            "products": products
+        }
+        
+        if brand_colors:
+            colors = [c.strip() for c in brand_colors.split(',')]
+            brief["brand_colors"] = colors
+        
+        if preview_first:
+            brief["tier"] = "preview"
+        
+        form_complete = campaign_name and campaign_message and target_audience and len(products) > 0
+        
+        col_estimate, col_launch = st.columns(2)
+        with col_estimate:
+            estimate_clicked = st.button("🧮 Estimate Cost & Time", key="estimate_from_form")
+        with col_launch:
+            launch_clicked = st.button("🚀 Launch Campaign", type="primary", key="launch_from_form")
+        
+        if estimate_clicked:
+            if not form_complete:
+                st.error("⚠️ Please fill in all required fields marked with (*)")
+            else:
+                show_preflight(brief)
+        
         # Generate campaign JSON
-        if st.button("🚀 Launch Campaign", type="primary", key="launch_from_form"):
-            if not campaign_name or not campaign_message or not target_audience or len(products) == 0:
+        if launch_clicked:
+            if not form_complete:
                 st.error("⚠️ Please fill in all required fields marked with (*)")
             else:
-                # Build campaign brief
-                brief = {
-                    "campaign_name": campaign_name,
-                    "campaign_message": campaign_message,
-                    "target_audience": target_audience,
-                    "target_regions": target_regions,
-                    "products": products
-                }
-                
-                if brand_colors:
-                    colors = [c.strip() for c in brand_colors.split(',')]
-                    brief["brand_colors"] = colors
-                
                 # Upload to S3
                 try:
                     filename = f"{campaign_name.lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
@@ -379,6 +438,7 @@ elif page == "📝 Create Campaign":
                         Body=json.dumps(brief, indent=2),
                         ContentType='application/json'
                     )
+                    s3_data.clear_cache()
                     
                     st.markdown(f'<div class="success-box">✅ <strong>Campaign created successfully!</strong><br>File: {filename}<br>S3: s3://{BUCKET_NAME}/{key}</div>', unsafe_allow_html=True)
                     
@@ -413,6 +473,9 @@ elif page == "📝 Create Campaign":
                     with st.expander("📄 Preview JSON"):
                         st.json(brief)
                     
+                    if st.button("🧮 Estimate Cost & Time", key="estimate_from_upload"):
+                        show_preflight(brief)
+                    
                     if st.button("🚀 Launch Campaign", type="primary", key="launch_from_upload"):
                         try:
                             filename = f"{brief['campaign_name'].lower().replace(' ', '-')}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
@@ -424,6 +487,7 @@ elif page == "📝 Create Campaign":
                                 Body=json.dumps(brief, indent=2),
                                 ContentType='application/json'
                             )
+                            s3_data.clear_cache()
                             
                             st.markdown(f'<div class="success-box">🎉 <strong>Campaign launched successfully!</strong><br>Your campaign is now being processed. Check the "Track Progress" section to see updates.</div>', unsafe_allow_html=True)
                         
@@ -486,101 +550,144 @@ elif page == "📊 Track Progress":
     st.header("Campaign Progress")
     st.write("Monitor your campaigns as they're being processed.")
     
-    # Function selector
-    col1, col2 = st.columns([2, 1])
+    if 'progress_tracker' not in st.session_state:
+        st.session_state['progress_tracker'] = progress.ProgressTracker(clients['s3'], BUCKET_NAME)
+    tracker = st.session_state['progress_tracker']
+    
+    col1, col2 = st.columns([3, 1])
     
     with col1:
-        process_names = {
-            f"{ENVIRONMENT}-{PROJECT_NAME}-parser": "📋 Campaign Validation",
-            f"{ENVIRONMENT}-{PROJECT_NAME}-generator": "🎨 Image Generation", 
-            f"{ENVIRONMENT}-{PROJECT_NAME}-variants": "📐 Format Creation"
-        }
-        
-        function = st.selectbox(
-            "View Progress for:",
-            list(process_names.keys()),
-            format_func=lambda x: process_names[x]
-        )
+        try:
+            campaign_ids = s3_data.list_campaign_ids(clients['s3'], BUCKET_NAME)
+        except:
+            campaign_ids = []
+        selected_campaign = st.selectbox("Campaign:", campaign_ids) if campaign_ids else None
     
     with col2:
-        time_range = st.selectbox("Show activity from:", ["5 minutes", "15 minutes", "1 hour", "24 hours"])
+        channel = get_status_channel()
+        live = channel is not None and st.toggle("🔴 Live updates", help="Refresh automatically as soon as a product completes")
+        if not live and st.button("🔄 Refresh"):
+            st.rerun()
     
-    # Convert time range to minutes
-    time_map = {"5 minutes": 5, "15 minutes": 15, "1 hour": 60, "24 hours": 1440}
-    since_minutes = time_map[time_range]
-    
-    if st.button("🔄 Refresh"):
-        st.rerun()
+    if selected_campaign:
+        try:
+            # One conditional GET per refresh; unchanged manifests are not re-downloaded
+            manifest = tracker.get(selected_campaign)
+            summary = progress.summarize(manifest)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Products Ready", f"{summary['completed']}/{summary['expected']}")
+            with col2:
+                st.metric("Failed", summary['failed'])
+            with col3:
+                st.metric("Status", "✅ Ready" if summary['campaign_status'] == 'completed' else "⏳ Processing")
+            
+            st.progress(summary['fraction'])
+            
+            if summary['rows']:
+                st.dataframe(pd.DataFrame(summary['rows']), use_container_width=True, hide_index=True)
+            else:
+                st.info("⏳ Your campaign is being validated. Products will appear here shortly.")
+        except Exception as e:
+            st.error("Unable to load campaign progress right now. Please try again later.")
+    else:
+        st.info("No campaigns yet. Create a campaign to see progress here.")
     
     st.divider()
     
-    # Fetch logs
-    try:
-        log_group = f"/aws/lambda/{function}"
-        
-        # Get log streams
-        streams_response = clients['logs'].describe_log_streams(
-            logGroupName=log_group,
-            orderBy='LastEventTime',
-            descending=True,
-            limit=5
-        )
+    # Detailed activity log (CloudWatch) only loads on request
+    if st.toggle("Show detailed activity log"):
+        # Function selector
+        col1, col2 = st.columns([2, 1])
         
-        if streams_response['logStreams']:
-            # Get latest stream
-            latest_stream = streams_response['logStreams'][0]['logStreamName']
-            
-            # Get log events
-            start_time = int((datetime.now() - timedelta(minutes=since_minutes)).timestamp() * 1000)
-            
-            logs_response = clients['logs'].get_log_events(
+        with col1:
+            process_names = {
+                f"{ENVIRONMENT}-{PROJECT_NAME}-parser": "📋 Campaign Validation",
+                f"{ENVIRONMENT}-{PROJECT_NAME}-generator": "🎨 Image Generation", 
+                f"{ENVIRONMENT}-{PROJECT_NAME}-variants": "📐 Format Creation"
+            }
+        
+            function = st.selectbox(
+                "View Progress for:",
+                list(process_names.keys()),
+                format_func=lambda x: process_names[x]
+            )
+        
+        with col2:
+            time_range = st.selectbox("Show activity from:", ["5 minutes", "15 minutes", "1 hour", "24 hours"])
+        
+        # Convert time range to minutes
+        time_map = {"5 minutes": 5, "15 minutes": 15, "1 hour": 60, "24 hours": 1440}
+        since_minutes = time_map[time_range]
+        
+        # Fetch logs
+        try:
+            log_group = f"/aws/lambda/{function}"
+        
+            # Get log streams
+            streams_response = clients['logs'].describe_log_streams(
                 logGroupName=log_group,
-                logStreamName=latest_stream,
-                startTime=start_time,
-                startFromHead=False
+                orderBy='LastEventTime',
+                descending=True,
+                limit=5
             )
+        
+            if streams_response['logStreams']:
+                # Get latest stream
+                latest_stream = streams_response['logStreams'][0]['logStreamName']
             
-            events = logs_response['events']
+                # Get log events
+                start_time = int((datetime.now() - timedelta(minutes=since_minutes)).timestamp() * 1000)
             
-            if events:
-                st.success(f"📊 Showing recent activity ({len(events)} entries from last {time_range})")
+                logs_response = clients['logs'].get_log_events(
+                    logGroupName=log_group,
+                    logStreamName=latest_stream,
+                    startTime=start_time,
+                    startFromHead=False
+                )
+            
+                events = logs_response['events']
+            
+                if events:
+                    st.success(f"📊 Showing recent activity ({len(events)} entries from last {time_range})")
                 
-                # Display logs with business-friendly messages
-                for event in reversed(events[-50:]):  # Show last 50 events
-                    timestamp = datetime.fromtimestamp(event['timestamp'] / 1000).strftime('%H:%M:%S')
-                    message = event['message'].strip()
+                    # Display logs with business-friendly messages
+                    for event in reversed(events[-50:]):  # Show last 50 events
+                        timestamp = datetime.fromtimestamp(event['timestamp'] / 1000).strftime('%H:%M:%S')
+                        message = event['message'].strip()
                     
-                    # Translate technical messages to business-friendly ones
-                    if 'ERROR' in message or 'Error' in message:
-                        if 'timeout' in message.lower():
-                            st.error(f"[{timestamp}] ⚠️ Process is taking longer than expected")
-                        elif 'permission' in message.lower():
-                            st.error(f"[{timestamp}] ⚠️ Access issue detected")
+                        # Translate technical messages to business-friendly ones
+                        if 'ERROR' in message or 'Error' in message:
+                            if 'timeout' in message.lower():
+                                st.error(f"[{timestamp}] ⚠️ Process is taking longer than expected")
+                            elif 'permission' in message.lower():
+                                st.error(f"[{timestamp}] ⚠️ Access issue detected")
+                            else:
+                                st.error(f"[{timestamp}] ❌ An error occurred during processing")
+                        elif 'WARNING' in message or 'Warning' in message:
+                            st.warning(f"[{timestamp}] ⚠️ Minor issue detected - continuing")
+                        elif 'START RequestId' in message:
+                            st.info(f"[{timestamp}] 🚀 Campaign processing started")
+                        elif 'END RequestId' in message:
+                            st.success(f"[{timestamp}] ✅ Step completed successfully")
+                        elif 'Generated image' in message:
+                            st.success(f"[{timestamp}] 🎨 Product image created")
+                        elif 'variants' in message.lower():
+                            st.success(f"[{timestamp}] 📐 Social media formats created")
                         else:
-                            st.error(f"[{timestamp}] ❌ An error occurred during processing")
-                    elif 'WARNING' in message or 'Warning' in message:
-                        st.warning(f"[{timestamp}] ⚠️ Minor issue detected - continuing")
-                    elif 'START RequestId' in message:
-                        st.info(f"[{timestamp}] 🚀 Campaign processing started")
-                    elif 'END RequestId' in message:
-                        st.success(f"[{timestamp}] ✅ Step completed successfully")
-                    elif 'Generated image' in message:
-                        st.success(f"[{timestamp}] 🎨 Product image created")
-                    elif 'variants' in message.lower():
-                        st.success(f"[{timestamp}] 📐 Social media formats created")
-                    else:
-                        # Hide very technical messages, show simplified version
-                        if not any(tech in message.lower() for tech in ['lambda', 'requestid', 'duration', 'billed']):
-                            st.text(f"[{timestamp}] 📋 {message}")
+                            # Hide very technical messages, show simplified version
+                            if not any(tech in message.lower() for tech in ['lambda', 'requestid', 'duration', 'billed']):
+                                st.text(f"[{timestamp}] 📋 {message}")
+                else:
+                    st.info(f"No activity found in the last {time_range}. Your campaigns may be processing quietly.")
             else:
-                st.info(f"No activity found in the last {time_range}. Your campaigns may be processing quietly.")
-        else:
-            st.info("No activity detected yet. Create a campaign to see progress here.")
-    
-    except clients['logs'].exceptions.ResourceNotFoundException:
-        st.warning("🔍 No activity logs found. This process hasn't run recently.")
-    except Exception as e:
-        st.error("Unable to load activity information right now. Please try again later.")
+                st.info("No activity detected yet. Create a campaign to see progress here.")
+        
+        except clients['logs'].exceptions.ResourceNotFoundException:
+            st.warning("🔍 No activity logs found. This process hasn't run recently.")
+        except Exception as e:
+            st.error("Unable to load activity information right now. Please try again later.")
     
     st.divider()
     
@@ -620,6 +727,21 @@ elif page == "📊 Track Progress":
     
     except Exception as e:
         st.error("Unable to check campaign queue status right now.")
+    
+    # Live updates: a fragment checks the status channel without blocking the page, and reruns it once this campaign changes
+    if live and selected_campaign:
+        st.session_state.setdefault('status_seq', channel.seq)
+        st.session_state['live_refreshed_at'] = time.monotonic()
+        
+        @st.fragment(run_every=LIVE_POLL_INTERVAL)
+        def watch_status():
+            events = channel.wait(selected_campaign, st.session_state['status_seq'])
+            if events:
+                st.session_state['status_seq'] = events[-1][0]
+            if events or time.monotonic() - st.session_state['live_refreshed_at'] >= LIVE_UPDATE_TIMEOUT:
+                st.rerun()
+        
+        watch_status()
 
 # ==================== PAGE: VIEW RESULTS ====================
 elif page == "🖼️ View Results":
@@ -628,16 +750,7 @@ elif page == "🖼️ View Results":
     
     try:
         # List all campaigns
-        response = clients['s3'].list_objects_v2(
-            Bucket=BUCKET_NAME,
-            Prefix='output/',
-            Delimiter='/'
-        )
-        
-        campaigns = []
-        for prefix in response.get('CommonPrefixes', []):
-            campaign_id = prefix['Prefix'].split('/')[-2]
-            campaigns.append(campaign_id)
+        campaigns = s3_data.list_campaign_ids(clients['s3'], BUCKET_NAME)
         
         if campaigns:
             selected_campaign = st.selectbox("Choose a campaign to view:", campaigns)
@@ -645,11 +758,11 @@ elif page == "🖼️ View Results":
             if selected_campaign:
                 # Load manifest
                 try:
-                    manifest_obj = clients['s3'].get_object(
-                        Bucket=BUCKET_NAME,
-                        Key=f"output/{selected_campaign}/manifest.json"
-                    )
-                    manifest = json.loads(manifest_obj['Body'].read())
+                    manifest = s3_data.get_manifest(clients['s3'], BUCKET_NAME, selected_campaign)
+                    if manifest is None:
+                        raise KeyError(selected_campaign)
+                    
+                    campaign_spend = costs.campaign_costs(clients['s3'], BUCKET_NAME, selected_campaign)
                     
                     # Display campaign info
                     col1, col2, col3 = st.columns(3)
@@ -659,10 +772,44 @@ elif page == "🖼️ View Results":
                         status_display = "✅ Ready" if manifest['status'] == 'completed' else "⏳ Processing"
                         st.metric("Status", status_display)
                     with col3:
-                        st.metric("Investment", f"${manifest.get('total_cost', 0.0):.2f}")
+                        st.metric("Investment", f"${campaign_spend['total']:.2f}")
                     
                     st.info(f"💬 **Campaign Message:** {manifest.get('campaign_message', 'N/A')}")
                     
+                    # Promote approved preview products to full quality
+                    preview_products = [
+                        p for p in manifest.get('products', [])
+                        if p.get('tier') == 'preview' and p.get('status') == 'completed'
+                    ]
+                    if preview_products:
+                        with st.expander(f"⚡ {len(preview_products)} product(s) are previews — promote to full quality"):
+                            labels = {
+                                p.get('product_index', p.get('index')): p.get('product_name', p.get('name', 'Unknown Product'))
+                                for p in preview_products
+                            }
+                            approved = st.multiselect(
+                                "Approved products",
+                                list(labels),
+                                format_func=lambda index: labels[index]
+                            )
+                            if st.button("✨ Generate Final Versions", disabled=not approved):
+                                try:
+                                    clients['lambda'].invoke(
+                                        FunctionName=f"{ENVIRONMENT}-{PROJECT_NAME}-parser",
+                                        InvocationType='Event',
+                                        Payload=json.dumps({
+                                            'action': 'promote',
+                                            'campaign_id': selected_campaign,
+                                            'product_indexes': approved,
+                                            # Retries of this invocation resume the same promotion round
+                                            'request_id': str(uuid.uuid4())
+                                        })
+                                    )
+                                    s3_data.clear_cache()
+                                    st.success("Final versions are being created. Track them on the progress page.")
+                                except Exception as e:
+                                    st.error("Unable to start the promotion right now. Please try again.")
+                    
                     st.divider()
                     
                     # Display products (only those with variants)
@@ -672,32 +819,35 @@ elif page == "🖼️ View Results":
                         st.info("⏳ Your campaign is being processed. Images will appear here once generation is complete.")
                     
                     for product in completed_products:
-                        st.subheader(f"📦 {product.get('product_name', product.get('name', 'Unknown Product'))}")
+                        tier_label = " · Preview" if product.get('tier') == 'preview' else ""
+                        st.subheader(f"📦 {product.get('product_name', product.get('name', 'Unknown Product'))}{tier_label}")
                         
                         col1, col2 = st.columns(2)
                         with col1:
-                            st.metric("Cost", f"${product.get('processing_cost', product.get('cost', 0.0)):.2f}")
+                            product_index = product.get('product_index', product.get('index'))
+                            st.metric("Cost", f"${campaign_spend['by_product'].get(product_index, 0.0):.3f}")
                         with col2:
                             formats_count = len(product.get('variants', []))
                             st.metric("Social Formats", f"{formats_count} created")
                         
-                        # Display generated image
+                        product_label = product.get('product_name', product.get('name', 'product'))
+                        
+                        # Display generated image (thumbnail preview, download served directly by S3)
                         image_key = product.get('image_key', '')
                         if image_key:
                             try:
-                                img_obj = clients['s3'].get_object(Bucket=BUCKET_NAME, Key=image_key)
-                                img = Image.open(BytesIO(img_obj['Body'].read()))
-                                
-                                st.image(img, caption="Original Product Image (High Resolution)", use_container_width=True)
+                                preview_key = product.get('thumbnail_key', image_key)
+                                st.image(
+                                    s3_data.presigned_url(clients['s3'], BUCKET_NAME, preview_key),
+                                    caption="Original Product Image",
+                                    use_container_width=True
+                                )
                                 
                                 # Download button
-                                img_bytes = BytesIO()
-                                img.save(img_bytes, format='PNG')
-                                st.download_button(
+                                extension = os.path.splitext(image_key)[1] or '.png'
+                                st.link_button(
                                     "📥 Download Original Image",
-                                    data=img_bytes.getvalue(),
-                                    file_name=f"{product['name']}-original.png",
-                                    mime="image/png"
+                                    s3_data.presigned_url(clients['s3'], BUCKET_NAME, image_key, f"{product_label}-original{extension}")
                                 )
                             except Exception as e:
                                 st.error("Unable to load the product image right now.")
@@ -725,22 +875,19 @@ elif page == "🖼️ View Results":
                                 
                                 if variant_key:
                                     try:
-                                        variant_obj = clients['s3'].get_object(Bucket=BUCKET_NAME, Key=variant_key)
-                                        variant_img = Image.open(BytesIO(variant_obj['Body'].read()))
+                                        preview_key = variant_info.get('thumbnail_key', variant_key)
                                         
                                         with cols[idx]:
-                                            st.image(variant_img, caption=platform_names.get(variant_platform, variant_platform), use_container_width=True)
+                                            st.image(
+                                                s3_data.presigned_url(clients['s3'], BUCKET_NAME, preview_key),
+                                                caption=platform_names.get(variant_platform, variant_platform),
+                                                use_container_width=True
+                                            )
                                             
                                             # Download button
-                                            var_bytes = BytesIO()
-                                            variant_img.save(var_bytes, format='JPEG')
-                                            product_idx = product.get('product_index', product.get('index', idx))
-                                            st.download_button(
+                                            st.link_button(
                                                 "📥",
-                                                data=var_bytes.getvalue(),
-                                                file_name=f"{product.get('product_name', 'product')}-{variant_platform}.jpg",
-                                                mime="image/jpeg",
-                                                key=f"dl_{product_idx}_{variant_platform}"
+                                                s3_data.presigned_url(clients['s3'], BUCKET_NAME, variant_key, f"{product_label}-{variant_platform}.jpg")
                                             )
                                     except Exception as e:
                                         with cols[idx]:
@@ -752,7 +899,15 @@ elif page == "🖼️ View Results":
                     
                     # Download all button
                     if st.button("📦 Download Complete Campaign"):
-                        st.info(f"💡 **Pro Tip:** To download all files at once, use this command in your terminal:\n\n`aws s3 sync s3://{BUCKET_NAME}/output/{selected_campaign}/ ./my-campaign/`")
+                        try:
+                            with st.spinner("Preparing your campaign bundle..."):
+                                bundle = bundler.get_or_build_bundle(clients['s3'], BUCKET_NAME, selected_campaign)
+                            st.link_button(
+                                "📥 Download Campaign (.zip)",
+                                s3_data.presigned_url(clients['s3'], BUCKET_NAME, bundle, f"{selected_campaign}.zip")
+                            )
+                        except Exception as e:
+                            st.info(f"💡 **Pro Tip:** To download all files at once, use this command in your terminal:\n\n`aws s3 sync s3://{BUCKET_NAME}/output/{selected_campaign}/ ./my-campaign/`")
                 
                 except Exception as e:
                     st.error("We're having trouble loading this campaign. Please try refreshing or contact support.")
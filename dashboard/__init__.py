@@ -0,0 +1,14 @@
+"""
+Dashboard Support Modules
+
+Data access and helpers used by the Streamlit dashboard (app.py). Manifest
+and ledger formats are read with the Lambdas' own shared modules
+(lambda/shared), imported as `shared` exactly as the Lambda images do.
+"""
+
+import os
+import sys
+
+_LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda')
+if _LAMBDA_DIR not in sys.path:
+    sys.path.append(_LAMBDA_DIR)
@@ -0,0 +1,83 @@
+"""
+Campaign Analytics
+
+Historical queries over the Parquet export the parser compacts campaign
+manifests into (analytics/products/date=YYYY-MM-DD/products.parquet, one
+row per product). Only the partitions in the requested date range are
+downloaded, concurrently, and the loaded frame is cached.
+"""
+
+import json
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Any
+
+import pandas as pd
+import streamlit as st
+from botocore.exceptions import ClientError
+
+from dashboard import s3_data
+
+ANALYTICS_PREFIX = 'analytics/products/'
+STATE_KEY = 'analytics/_state.json'
+ANALYTICS_TTL = 300
+MAX_WORKERS = 8
+
+
+def _read_partition(s3, bucket: str, key: str) -> pd.DataFrame:
+    response = s3.get_object(Bucket=bucket, Key=key)
+    return pd.read_parquet(BytesIO(response['Body'].read()))
+
+
+@st.cache_data(ttl=ANALYTICS_TTL, show_spinner=False)
+def load_products(_s3, bucket: str, start: date, end: date) -> pd.DataFrame:
+    """Product rows of campaigns created between start and end (inclusive)"""
+    keys = []
+    for obj in s3_data.list_objects(_s3, bucket, ANALYTICS_PREFIX):
+        partition = obj['Key'][len(ANALYTICS_PREFIX):].split('/', 1)[0]
+        if partition.startswith('date=') and start.isoformat() <= partition[5:] <= end.isoformat():
+            keys.append(obj['Key'])
+    if not keys:
+        return pd.DataFrame()
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(keys))) as pool:
+        return pd.concat(pool.map(lambda k: _read_partition(_s3, bucket, k), keys), ignore_index=True)
+
+
+@st.cache_data(ttl=ANALYTICS_TTL, show_spinner=False)
+def export_totals(_s3, bucket: str) -> Dict[str, int]:
+    """All-time campaign, product and variant counts, from the per-date totals the compaction keeps"""
+    totals = {'campaigns': 0, 'products': 0, 'variants': 0}
+    try:
+        state = json.loads(_s3.get_object(Bucket=bucket, Key=STATE_KEY)['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return totals
+        raise
+    for counts in state.get('dates', {}).values():
+        for name in totals:
+            totals[name] += counts.get(name, 0)
+    return totals
+
+
+def recent_products(_s3, bucket: str, days: int = 7) -> pd.DataFrame:
+    today = date.today()
+    return load_products(_s3, bucket, today - timedelta(days=days - 1), today)
+
+
+def summarize(products: pd.DataFrame) -> Dict[str, Any]:
+    """Headline figures: volume, spend, generation latency and throttling"""
+    if products.empty:
+        return {'campaigns': 0, 'products': 0, 'spend': 0.0, 'generate_p50': None, 'generate_p95': None, 'throttles': 0, 'spend_by_day': pd.Series(dtype=float)}
+    
+    generate = products['generate_seconds'].dropna()
+    return {
+        'campaigns': products['campaign_id'].nunique(),
+        'products': len(products),
+        'spend': products['cost_cents'].sum() / 100,
+        'generate_p50': generate.quantile(0.5) if not generate.empty else None,
+        'generate_p95': generate.quantile(0.95) if not generate.empty else None,
+        'throttles': int(products['throttles'].fillna(0).sum()),
+        'spend_by_day': products.groupby('date')['cost_cents'].sum() / 100
+    }
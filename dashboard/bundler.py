@@ -0,0 +1,102 @@
+"""
+Campaign Bundler
+
+Builds a zip of a campaign's originals, variants and manifest by streaming
+objects from S3 into the archive chunk by chunk. Bundles are cached in S3
+keyed by the manifest hash, so an unchanged campaign is only zipped once.
+"""
+
+import json
+import tempfile
+import zipfile
+from typing import Dict, Any, Iterator
+
+from botocore.exceptions import ClientError
+
+from shared.manifest import ManifestStore, manifest_key
+
+BUNDLE_PREFIX = 'bundles/'
+
+# Bytes read from S3 per write into the archive
+CHUNK_SIZE = 1024 * 1024
+
+# Dashboard-only derivatives are left out of the download
+EXCLUDED_SEGMENTS = ('/thumbnails/', '/manifest-log/')
+
+# Entries above this size need zip64 headers up front when streamed
+ZIP64_THRESHOLD = 2 ** 31
+
+
+def bundle_key(campaign_id: str, manifest_hash: str) -> str:
+    """S3 key of a cached campaign bundle"""
+    return f"{BUNDLE_PREFIX}{campaign_id}/{manifest_hash}.zip"
+
+
+def get_manifest_hash(s3, bucket: str, campaign_id: str) -> str:
+    """Content hash (ETag) of the campaign manifest, qualified by its uncompacted updates (highest sequence and count)"""
+    response = s3.head_object(Bucket=bucket, Key=manifest_key(campaign_id))
+    etag = response['ETag'].strip('"')
+    pending = ManifestStore(s3, bucket).log_entries(campaign_id)
+    return f"{etag}-{pending[-1][0]}-{len(pending)}" if pending else etag
+
+
+def object_exists(s3, bucket: str, key: str) -> bool:
+    """Check if S3 object exists"""
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def iter_campaign_objects(s3, bucket: str, campaign_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield every object that belongs in the campaign bundle"""
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"output/{campaign_id}/"):
+        for obj in page.get('Contents', []):
+            if not any(segment in obj['Key'] for segment in EXCLUDED_SEGMENTS):
+                yield obj
+
+
+def write_bundle(s3, bucket: str, campaign_id: str, fileobj) -> int:
+    """Stream campaign objects into a zip written to fileobj, returning the entry count"""
+    prefix = f"output/{campaign_id}/"
+    count = 0
+    
+    # Images are already compressed, so entries are stored as-is
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for obj in iter_campaign_objects(s3, bucket, campaign_id):
+            arcname = f"{campaign_id}/{obj['Key'][len(prefix):]}"
+            
+            # The manifest is stored compact (possibly gzip) with a delta log; ship it whole and readable
+            if obj['Key'] == manifest_key(campaign_id):
+                archive.writestr(arcname, json.dumps(ManifestStore(s3, bucket).load(campaign_id), indent=2))
+                count += 1
+                continue
+            
+            body = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body']
+            
+            with archive.open(arcname, 'w', force_zip64=obj['Size'] >= ZIP64_THRESHOLD) as entry:
+                for chunk in body.iter_chunks(CHUNK_SIZE):
+                    entry.write(chunk)
+            count += 1
+    
+    return count
+
+
+def get_or_build_bundle(s3, bucket: str, campaign_id: str) -> str:
+    """Return the S3 key of the campaign zip, building and caching it if needed"""
+    key = bundle_key(campaign_id, get_manifest_hash(s3, bucket, campaign_id))
+    
+    if object_exists(s3, bucket, key):
+        return key
+    
+    # Spool to local disk, then multipart upload: memory stays bounded by CHUNK_SIZE
+    with tempfile.TemporaryFile() as spool:
+        write_bundle(s3, bucket, campaign_id, spool)
+        spool.seek(0)
+        s3.upload_fileobj(spool, bucket, key, ExtraArgs={'ContentType': 'application/zip'})
+    
+    return key
@@ -0,0 +1,50 @@
+"""
+Campaign Costs
+
+Spend read from the cost ledger the Lambdas append to, through the same
+shared.costs code that writes it. A campaign's spend comes from a cached
+listing of its own ledger prefix; overall spend comes from the latest daily
+rollup plus the days after it, so the Overview never lists every entry.
+"""
+
+from decimal import Decimal
+from typing import Dict, Any, Iterable
+
+import streamlit as st
+
+from dashboard import s3_data
+from shared.costs import CostLedger, CAMPAIGNS_PREFIX, aggregate
+
+
+def _dollars(totals: Dict[Any, Decimal]) -> Dict[Any, float]:
+    return {k: float(v / 100) for k, v in totals.items()}
+
+
+def _summary(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """Dollar totals overall and by campaign, stage and product"""
+    return {
+        'total': float(totals['total_cents'] / 100),
+        'by_campaign': _dollars(totals.get('by_campaign', {})),
+        'by_stage': _dollars(totals['by_stage']),
+        'by_product': _dollars(totals.get('by_product', {}))
+    }
+
+
+def _aggregate(_s3, bucket: str, prefix: str) -> Dict[str, Any]:
+    return aggregate(obj['Key'] for obj in s3_data.list_objects(_s3, bucket, prefix))
+
+
+@st.cache_data(ttl=s3_data.LISTING_TTL, show_spinner=False)
+def all_costs(_s3, bucket: str, campaign_ids: Iterable[str] = ()) -> Dict[str, Any]:
+    """Spend across every campaign, broken down by campaign for campaign_ids only"""
+    summary = _summary(CostLedger(_s3, bucket).total_costs())
+    summary['by_campaign'] = {
+        campaign_id: float(_aggregate(_s3, bucket, f"{CAMPAIGNS_PREFIX}{campaign_id}/")['total_cents'] / 100)
+        for campaign_id in campaign_ids
+    }
+    return summary
+
+
+def campaign_costs(_s3, bucket: str, campaign_id: str) -> Dict[str, Any]:
+    return _summary(_aggregate(_s3, bucket, f"{CAMPAIGNS_PREFIX}{campaign_id}/"))
+
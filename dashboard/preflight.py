@@ -0,0 +1,36 @@
+"""
+Campaign Pre-flight
+
+Estimates a brief before it is launched by invoking the parser's
+'preflight' action synchronously: existing-asset availability, render
+cache hits, the generation backlog in the brief's priority class, and from
+these the Bedrock calls, cost and expected completion time.
+"""
+
+import json
+from typing import Dict, Any
+
+
+def estimate(lambda_client, function_name: str, brief: Dict[str, Any]) -> Dict[str, Any]:
+    """Pre-flight estimate of a brief; ValueError if the parser rejects the brief"""
+    response = lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps({'action': 'preflight', 'brief': brief})
+    )
+    result = json.loads(response['Payload'].read())
+    if 'FunctionError' in response:
+        raise RuntimeError(result.get('errorMessage', 'Pre-flight estimate failed'))
+    
+    body = json.loads(result['body'])
+    if result.get('statusCode') != 200:
+        raise ValueError(body.get('error', 'Invalid campaign brief'))
+    return body
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
@@ -0,0 +1,125 @@
+"""
+Campaign Progress
+
+Per-product progress read from the campaign manifest, which every stage
+updates as it completes. Polling is incremental: the manifest document is
+fetched with If-None-Match on its ETag, and only log entries not seen
+before are downloaded, so an unchanged campaign costs one conditional
+request and one listing per refresh. Entries are applied in sequence order
+over the document, whatever order they were listed in.
+"""
+
+import copy
+from typing import Dict, Any, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from shared.manifest import ManifestStore, manifest_key, decode, apply_delta, is_folded
+
+# Product status -> (label, stages completed); a failed product is finished, so it fills its share of the bar
+STATUS_STAGES = {
+    'processing': ('⏳ Queued', 0),
+    'generated': ('🎨 Image created', 1),
+    'completed': ('✅ Ready', 2),
+    'failed': ('❌ Failed', 2)
+}
+TOTAL_STAGES = 2
+
+
+def poll_manifest(
+    s3,
+    bucket: str,
+    campaign_id: str,
+    etag: Optional[str] = None
+) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
+    """Conditionally fetch a manifest, returning (changed, manifest, etag)"""
+    params = {'Bucket': bucket, 'Key': manifest_key(campaign_id)}
+    if etag:
+        params['IfNoneMatch'] = etag
+    
+    try:
+        response = s3.get_object(**params)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            return False, None, etag
+        raise
+    
+    return True, decode(response['Body'].read()), response['ETag']
+
+
+class ProgressTracker:
+    """Caches the last seen manifest document and log entries per campaign and refreshes them incrementally"""
+    
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+        self.store = ManifestStore(s3, bucket)
+        self._state: Dict[str, Tuple[Optional[str], Dict[str, Any], Dict[int, Dict[str, Any]], Dict[str, Any]]] = {}
+    
+    def get(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current manifest, downloading only what changed"""
+        etag, document, deltas, manifest = self._state.get(campaign_id, (None, None, {}, None))
+        changed, latest, etag = poll_manifest(self.s3, self.bucket, campaign_id, etag)
+        if changed:
+            # New document (first poll or a compaction): entries it folded no longer apply
+            document = latest
+            deltas = {sequence: delta for sequence, delta in deltas.items() if not is_folded(document, sequence)}
+        
+        entries = [
+            (sequence, key) for sequence, key in self.store.log_entries(campaign_id)
+            if sequence not in deltas and not is_folded(document, sequence)
+        ]
+        fresh = self.store.read_deltas([key for _, key in entries])
+        new = {sequence: delta for (sequence, _), delta in zip(entries, fresh) if delta is not None}
+        
+        # A late entry may sort before ones already applied, so the manifest is rebuilt in sequence order
+        if changed or new:
+            deltas = {**deltas, **new}
+            manifest = copy.deepcopy(document)
+            for sequence in sorted(deltas):
+                apply_delta(manifest, deltas[sequence])
+        
+        self._state[campaign_id] = (etag, document, deltas, manifest)
+        return manifest
+
+
+def served_by(product: Dict[str, Any]) -> str:
+    """Generation path that produced a product's image (model, region, quality)"""
+    if product.get('image_source') == 'existing':
+        return 'existing asset'
+    if not product.get('model'):
+        return ''
+    served = f"{product['model']} ({product.get('region', '')} {product.get('quality', '')})".replace(' )', ')')
+    return served + (' hedged' if product.get('hedged') else '')
+
+
+def summarize(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-product progress rows and campaign totals from a manifest"""
+    products = sorted(
+        manifest.get('products', []),
+        key=lambda p: p.get('product_index', p.get('index', 0))
+    )
+    expected = manifest.get('expected_products') or len(products)
+    
+    rows: List[Dict[str, Any]] = []
+    stages_done = 0
+    for product in products:
+        status = product.get('status', 'processing')
+        label, done = STATUS_STAGES.get(status, (status, 0))
+        stages_done += done
+        rows.append({
+            'Product': product.get('product_name', product.get('name', 'Unknown')),
+            'Status': label,
+            'Updated': product.get('updated_at', product.get('completed_at', ''))[:19],
+            'Served By': served_by(product),
+            'Error': product.get('error', '')
+        })
+    
+    return {
+        'rows': rows,
+        'expected': expected,
+        'completed': sum(1 for p in products if p.get('status') == 'completed'),
+        'failed': sum(1 for p in products if p.get('status') == 'failed'),
+        'fraction': min(1.0, stages_done / (expected * TOTAL_STAGES)) if expected else 0.0,
+        'campaign_status': manifest.get('status', 'processing')
+    }
@@ -0,0 +1,125 @@
+"""
+Dashboard S3 Data Access
+
+Paginated, cached and concurrent reads of campaign data from S3 so the
+dashboard does not repeat identical listings on every Streamlit rerun.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+import streamlit as st
+
+from shared.manifest import ManifestStore
+
+# Cache lifetimes (seconds)
+LISTING_TTL = 30
+MANIFEST_TTL = 15
+# S3 publishes storage metrics once a day
+STORAGE_TTL = 3600
+
+# Concurrent manifest downloads
+MAX_WORKERS = 16
+
+# Presigned URL lifetime (seconds)
+PRESIGNED_URL_EXPIRY = 3600
+
+
+def _paginate(s3, **kwargs):
+    """Yield every page of a list_objects_v2 call"""
+    paginator = s3.get_paginator('list_objects_v2')
+    yield from paginator.paginate(**kwargs)
+
+
+@st.cache_data(ttl=LISTING_TTL, show_spinner=False)
+def list_objects(_s3, bucket: str, prefix: str) -> List[Dict[str, Any]]:
+    """List all objects under a prefix (cached per bucket/prefix)"""
+    objects = []
+    for page in _paginate(_s3, Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects.append({
+                'Key': obj['Key'],
+                'Size': obj['Size'],
+                'ETag': obj.get('ETag', '').strip('"'),
+                'LastModified': obj.get('LastModified')
+            })
+    return objects
+
+
+@st.cache_data(ttl=LISTING_TTL, show_spinner=False)
+def list_prefixes(_s3, bucket: str, prefix: str) -> List[str]:
+    """List the immediate sub-prefixes of a prefix (cached per bucket/prefix)"""
+    prefixes = []
+    for page in _paginate(_s3, Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+    return prefixes
+
+
+def list_campaign_ids(_s3, bucket: str) -> List[str]:
+    """List campaign IDs, most recent first"""
+    campaign_ids = [p.split('/')[-2] for p in list_prefixes(_s3, bucket, 'output/')]
+    # Campaign IDs end with a -YYYYmmdd-HHMMSS timestamp
+    return sorted(campaign_ids, key=lambda c: c[-15:], reverse=True)
+
+
+def _fetch_manifest(s3, bucket: str, campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Download a single manifest, returning None if missing or unreadable"""
+    try:
+        return ManifestStore(s3, bucket).load(campaign_id)
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=MANIFEST_TTL, show_spinner=False)
+def get_manifest(_s3, bucket: str, campaign_id: str) -> Optional[Dict[str, Any]]:
+    """Get a campaign manifest (cached per campaign)"""
+    return _fetch_manifest(_s3, bucket, campaign_id)
+
+
+@st.cache_data(ttl=MANIFEST_TTL, show_spinner=False)
+def get_manifests(_s3, bucket: str, campaign_ids: Tuple[str, ...]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Get many manifests concurrently (cached per set of campaigns)"""
+    if not campaign_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(campaign_ids))) as pool:
+        manifests = pool.map(lambda c: _fetch_manifest(_s3, bucket, c), campaign_ids)
+        return dict(zip(campaign_ids, manifests))
+
+
+@st.cache_data(ttl=STORAGE_TTL, show_spinner=False)
+def bucket_size(_cloudwatch, bucket: str) -> Optional[int]:
+    """Stored bytes from S3's daily BucketSizeBytes metric (None until the first datapoint)"""
+    now = datetime.now(timezone.utc)
+    response = _cloudwatch.get_metric_statistics(
+        Namespace='AWS/S3',
+        MetricName='BucketSizeBytes',
+        Dimensions=[{'Name': 'BucketName', 'Value': bucket}, {'Name': 'StorageType', 'Value': 'StandardStorage'}],
+        StartTime=now - timedelta(days=3),
+        EndTime=now,
+        Period=86400,
+        Statistics=['Average']
+    )
+    datapoints = sorted(response.get('Datapoints', []), key=lambda d: d['Timestamp'])
+    return int(datapoints[-1]['Average']) if datapoints else None
+
+
+def count_briefs(_s3, bucket: str) -> int:
+    """Briefs submitted, from a listing of the briefs prefix only"""
+    return sum(1 for o in list_objects(_s3, bucket, 'input/campaign-briefs/') if o['Key'].endswith('.json'))
+
+
+def presigned_url(_s3, bucket: str, key: str, filename: Optional[str] = None) -> str:
+    """Presigned GET URL so the browser fetches the stored bytes directly from S3"""
+    params = {'Bucket': bucket, 'Key': key}
+    if filename:
+        params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+    return _s3.generate_presigned_url('get_object', Params=params, ExpiresIn=PRESIGNED_URL_EXPIRY)
+
+
+def clear_cache():
+    """Drop cached listings and manifests (e.g. after launching a campaign)"""
+    list_objects.clear()
+    list_prefixes.clear()
+    get_manifest.clear()
+    get_manifests.clear()
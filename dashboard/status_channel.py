@@ -0,0 +1,226 @@
+"""
+Campaign Status Channel
+
+Long-poll subscription to the status events published by the pipeline
+stages (lambda/shared/status.py). One background thread per dashboard
+process receives from the channel and wakes any page session waiting on
+that campaign. No process consumes events meant for another:
+
+- In AWS the stages publish to an SNS topic, and each dashboard process
+  subscribes a queue of its own to it (deleted again on exit).
+- In development they write a spool directory, which every process reads
+  without removing files; old files are pruned by age.
+
+Sessions never block on the channel: they check it with a zero timeout.
+"""
+
+import json
+import os
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQS long-poll duration (seconds, max 20)
+SQS_WAIT_SECONDS = 20
+
+# A dashboard queue only holds events while they are fresh (seconds)
+QUEUE_RETENTION_SECONDS = 3600
+
+# Local spool directory poll interval, and age after which spooled events are pruned (seconds)
+LOCAL_POLL_INTERVAL = 0.5
+LOCAL_RETENTION_SECONDS = 600
+
+# Events kept in memory for sessions to catch up on
+HISTORY_SIZE = 1000
+
+# Back-off after a failed receive (seconds)
+ERROR_BACKOFF = 5
+
+
+def _parse(bodies) -> List[Dict[str, Any]]:
+    events = []
+    for body in bodies:
+        try:
+            events.append(json.loads(body))
+        except ValueError:
+            logger.warning("Skipping malformed status event")
+    return events
+
+
+class SNSBackend:
+    """Receives status events through a queue of this process's own, subscribed to the status topic"""
+    
+    def __init__(self, sns, sqs, topic_arn: str, queue_prefix: str):
+        self.sns = sns
+        self.sqs = sqs
+        self.subscription_arn = None
+        
+        name = f"{queue_prefix}-{uuid.uuid4().hex[:12]}"
+        self.queue_url = sqs.create_queue(QueueName=name, Attributes={
+            'MessageRetentionPeriod': str(QUEUE_RETENTION_SECONDS),
+            'ReceiveMessageWaitTimeSeconds': str(SQS_WAIT_SECONDS)
+        })['QueueUrl']
+        queue_arn = sqs.get_queue_attributes(QueueUrl=self.queue_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+        
+        # Only the status topic may deliver to the queue
+        sqs.set_queue_attributes(QueueUrl=self.queue_url, Attributes={'Policy': json.dumps({
+            'Version': '2012-10-17',
+            'Statement': [{
+                'Effect': 'Allow',
+                'Principal': {'Service': 'sns.amazonaws.com'},
+                'Action': 'sqs:SendMessage',
+                'Resource': queue_arn,
+                'Condition': {'ArnEquals': {'aws:SourceArn': topic_arn}}
+            }]
+        })})
+        self.subscription_arn = sns.subscribe(
+            TopicArn=topic_arn,
+            Protocol='sqs',
+            Endpoint=queue_arn,
+            Attributes={'RawMessageDelivery': 'true'},
+            ReturnSubscriptionArn=True
+        )['SubscriptionArn']
+        atexit.register(self.close)
+        logger.info(f"Subscribed {name} to {topic_arn}")
+    
+    def receive(self) -> List[Dict[str, Any]]:
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=SQS_WAIT_SECONDS
+        )
+        messages = response.get('Messages', [])
+        if not messages:
+            return []
+        
+        # The queue is this process's alone: deleting only drops what it has already seen
+        self.sqs.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[{'Id': str(i), 'ReceiptHandle': m['ReceiptHandle']} for i, m in enumerate(messages)]
+        )
+        return _parse(m['Body'] for m in messages)
+    
+    def close(self):
+        """Unsubscribe and delete the queue (best effort, on exit)"""
+        try:
+            if self.subscription_arn:
+                self.sns.unsubscribe(SubscriptionArn=self.subscription_arn)
+            self.sqs.delete_queue(QueueUrl=self.queue_url)
+        except Exception as e:
+            logger.warning(f"Failed to remove status queue {self.queue_url}: {e}")
+
+
+class LocalBackend:
+    """Reads status events from a local spool directory (development stand-in) without consuming them"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Names already read: writers' renames can land out of name order, so there is no single cursor
+        self.seen = set()
+        os.makedirs(directory, exist_ok=True)
+    
+    def receive(self) -> List[Dict[str, Any]]:
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith('.json') and not n.startswith('.'))
+        names = self._prune(names)
+        new = [n for n in names if n not in self.seen]
+        if not new:
+            time.sleep(LOCAL_POLL_INTERVAL)
+            return []
+        
+        bodies = []
+        for name in new:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    bodies.append(f.read())
+            except OSError:
+                logger.warning(f"Skipping unreadable status event: {name}")
+        self.seen.update(new)
+        return _parse(bodies)
+    
+    def _prune(self, names: List[str]) -> List[str]:
+        """Remove events older than the retention period, returning the names still spooled"""
+        cutoff = time.time() - LOCAL_RETENTION_SECONDS
+        kept = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                else:
+                    kept.append(name)
+            except OSError:
+                pass
+        self.seen.intersection_update(kept)
+        return kept
+
+
+class StatusChannel:
+    """Process-wide subscriber that fans status events out to waiting sessions"""
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self._condition = threading.Condition()
+        self._events: deque = deque(maxlen=HISTORY_SIZE)
+        self._seq = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest event received"""
+        with self._condition:
+            return self._seq
+    
+    def start(self):
+        """Start the background receive loop (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='status-channel', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            try:
+                events = self.backend.receive()
+            except Exception as e:
+                logger.warning(f"Status channel receive failed: {e}")
+                time.sleep(ERROR_BACKOFF)
+                continue
+            
+            if events:
+                with self._condition:
+                    for event in events:
+                        self._seq += 1
+                        self._events.append((self._seq, event))
+                    self._condition.notify_all()
+    
+    def wait(self, campaign_id: Optional[str], since: int, timeout: float = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """Events newer than `since` for the campaign, waiting up to timeout for one (0: return at once)"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                matching = [
+                    (seq, event) for seq, event in self._events
+                    if seq > since and (campaign_id is None or event.get('campaign_id') == campaign_id)
+                ]
+                remaining = deadline - time.monotonic()
+                if matching or remaining <= 0:
+                    return matching
+                self._condition.wait(remaining)
+
+
+def from_environment(sqs=None, sns=None) -> Optional[StatusChannel]:
+    """Build a channel from STATUS_TOPIC_ARN or STATUS_CHANNEL_DIR (None if neither is set)"""
+    topic_arn = os.environ.get('STATUS_TOPIC_ARN')
+    directory = os.environ.get('STATUS_CHANNEL_DIR')
+    
+    if topic_arn and sqs is not None and sns is not None:
+        # Named after the topic, so leftover queues of killed processes are easy to find
+        return StatusChannel(SNSBackend(sns, sqs, topic_arn, f"{topic_arn.rsplit(':', 1)[-1]}-dashboard"))
+    if directory:
+        return StatusChannel(LocalBackend(directory))
+    return None
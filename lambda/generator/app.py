@@ -11,178 +11,274 @@ import os
 import logging
 import time
 import random
-from typing import Dict, Any
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from botocore.exceptions import ClientError
 
+from shared.status import publish_status
+from shared.prompts import build_prompt
+from shared.tiers import FINAL, PREVIEW, tier_settings, output_prefix, generation_quality
+from shared.workflow import WorkflowStore, RUNNING, SUCCEEDED, PENDING, product_task, record_product_outcome
+from shared.uploads import UploadManager
+from shared.manifest import ManifestStore
+from shared.costs import CostLedger, GENERATION_CENTS, PREVIEW_GENERATION_CENTS, to_cents, format_cents
+from shared.content_hash import CONTENT_HASH_METADATA, content_hash, source_identity
+from concurrency import ConcurrencyController
+from fallback import FallbackChain, GenerationPath, load_paths
+
 logger = logging.getLogger()
 logger.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
 
 s3_client = boto3.client("s3")
 lambda_client = boto3.client("lambda")
 bedrock_client = boto3.client("bedrock-runtime")
+sqs_client = boto3.client("sqs")
 
 S3_BUCKET = os.environ["S3_BUCKET_NAME"]
 VARIANTS_FUNCTION = os.environ["VARIANTS_FUNCTION"]
+# Variants work queue consumed by queue workers (container hosts); the variants Lambda is invoked when unset
+VARIANTS_QUEUE_URL = os.environ.get("VARIANTS_QUEUE_URL")
 BEDROCK_MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "amazon.titan-image-generator-v1")
 
-# Pricing for Amazon Titan Image Generator v1
-# Model: amazon.titan-image-generator-v1 (Premium Quality, 1024x1024, >51 steps)
-# Cost: $0.04 per image
-# Reference: https://umbrellacost.com/blog/aws-bedrock-pricing/
-COST_PER_IMAGE = 0.04
+workflow = WorkflowStore.from_environment()
+uploads = UploadManager(s3_client, S3_BUCKET)
+ledger = CostLedger(s3_client, S3_BUCKET)
+manifests = ManifestStore.from_environment(s3_client, S3_BUCKET)
+
+# Primary model followed by the configured fallback chain; hedging is off unless HEDGE_AFTER_SECONDS is set
+GENERATION_PATHS = load_paths(BEDROCK_MODEL_ID, bedrock_client.meta.region_name)
+fallback_chain = FallbackChain(GENERATION_PATHS, float(os.environ.get("HEDGE_AFTER_SECONDS", "0")))
+bedrock_clients = {bedrock_client.meta.region_name: bedrock_client}
+bedrock_clients_lock = threading.Lock()
+
+# With somewhere to fall back to, a throttled path is abandoned after fewer backoffs
+FALLBACK_MAX_RETRIES = int(os.environ.get("FALLBACK_MAX_RETRIES", "2"))
+
+# Adaptive (AIMD) limit on generations in flight, fed by every Bedrock call's throttles and latency
+concurrency = ConcurrencyController.from_environment(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+
+# Matches the generation queue's redrive policy: the last receive marks the product failed
+MAX_RECEIVE_COUNT = int(os.environ.get("GENERATION_MAX_RECEIVE_COUNT", "3"))
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     logger.info(f"Generator Lambda triggered")
-    logger.info(f"Event: {json.dumps(event, indent=2)}")
+    
+    # Generation work queue: one product per message, failed messages are retried and then dead-lettered
+    if "Records" in event:
+        return handle_queue(event["Records"])
     
     try:
-        campaign_id = event["campaign_id"]
-        product_name = event["product_name"]
-        product_description = event["product_description"]
-        product_index = event.get("product_index", 0)
-        campaign_message = event.get("campaign_message", "")
-        target_audience = event.get("target_audience", "")
-        target_region = event.get("target_region", "US")
-        brand_colors = event.get("brand_colors", [])
-        
-        logger.info(f"Generating image for: {product_name} (campaign: {campaign_id})")
-        
-        if product_index > 0:
-            stagger_delay = product_index * 3.0
-            logger.info(f"Staggering request by {stagger_delay}s (product index: {product_index})")
-            time.sleep(stagger_delay)
-        
-        prompt = build_prompt(
-            product_name, 
-            product_description, 
-            campaign_message, 
-            target_audience, 
-            target_region
-        )
-        logger.info(f"Prompt: {prompt[:200]}...")
-        
-        image_data = generate_image(prompt)
-        logger.info(f"Image generated: {len(image_data)} bytes")
-        
-        image_key = f"output/{campaign_id}/generated/{sanitize(product_name)}-{product_index}.png"
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=image_key,
-            Body=image_data,
-            ContentType="image/png",
-            Metadata={
-                "campaign-id": encode_metadata(campaign_id),
-                "product-name": encode_metadata(product_name),
-                "product-index": str(product_index),
-                "model": BEDROCK_MODEL_ID,
-                "cost": str(COST_PER_IMAGE)
-            }
-        )
-        logger.info(f"Saved image: s3://{S3_BUCKET}/{image_key}")
-        
-        update_manifest(campaign_id, product_name, product_index, image_key, COST_PER_IMAGE)
-        
-        variants_payload = {
-            "campaign_id": campaign_id,
-            "product_name": product_name,
-            "product_index": product_index,
-            "image_key": image_key,
-            "image_source": "generated",
-            "campaign_message": campaign_message,
-            "brand_colors": brand_colors
-        }
-        
-        lambda_client.invoke(
-            FunctionName=VARIANTS_FUNCTION,
-            InvocationType="Event",
-            Payload=json.dumps(variants_payload)
-        )
-        
-        logger.info(f"Invoked variants generator for {image_key}")
-        
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "campaign_id": campaign_id,
-                "product_name": product_name,
-                "image_key": image_key,
-                "cost": COST_PER_IMAGE
-            })
-        }
-        
+        return generate_product(event, stagger=True)
     except Exception as e:
         logger.error(f"Error processing image generation: {str(e)}", exc_info=True)
+        record_failure(event, e)
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
         }
 
-def build_prompt(product_name: str, product_description: str, campaign_message: str, target_audience: str, target_region: str) -> str:
-    MAX_PROMPT_LENGTH = 512
+
+def handle_queue(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    failures = []
     
-    base_style = "High-end commercial advertising, studio lighting, clean white background, photorealistic, 4K quality, centered composition."
+    for record in records:
+        job = json.loads(record["body"])
+        try:
+            generate_product(job)
+        except Exception as e:
+            attempt = int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+            logger.error(f"Generation failed for product {job.get('product_index')} of {job.get('campaign_id')} (attempt {attempt}/{MAX_RECEIVE_COUNT}): {str(e)}", exc_info=True)
+            
+            # Earlier attempts are retried after the visibility timeout; the last one goes to the DLQ
+            if attempt >= MAX_RECEIVE_COUNT:
+                record_failure(job, e)
+            failures.append({"itemIdentifier": record["messageId"]})
     
-    full_prompt = f"""Professional commercial product photography of {product_name}.
-
-Product Details: {product_description}
+    return {"batchItemFailures": failures}
 
-Target Audience: {target_audience}
-Target Market: {target_region}
-Campaign Message: {campaign_message}
 
-Style: {base_style}"""
+def generate_product(event: Dict[str, Any], stagger: bool = False) -> Dict[str, Any]:
+    logger.info(f"Event: {json.dumps(event, indent=2)}")
+    
+    campaign_id = event["campaign_id"]
+    product_name = event["product_name"]
+    product_description = event["product_description"]
+    product_index = event.get("product_index", 0)
+    campaign_message = event.get("campaign_message", "")
+    target_audience = event.get("target_audience", "")
+    target_region = event.get("target_region", "US")
+    brand_colors = event.get("brand_colors", [])
+    tier = event.get("tier", FINAL)
+    workflow_id = event.get("workflow_id", campaign_id)
     
-    if len(full_prompt) <= MAX_PROMPT_LENGTH:
-        return full_prompt
+    logger.info(f"Generating {tier} image for: {product_name} (campaign: {campaign_id})")
     
-    prompt_without_audience = f"""Professional commercial product photography of {product_name}.
+    # Direct invocations have no concurrency bound, so spread them out; queued work is bounded by the event source
+    if stagger and product_index > 0:
+        stagger_delay = product_index * 3.0
+        logger.info(f"Staggering request by {stagger_delay}s (product index: {product_index})")
+        time.sleep(stagger_delay)
+    
+    if workflow:
+        workflow.set_task_state(workflow_id, product_task("generate", product_index), RUNNING)
+    
+    # The parser compiles every product's prompt up front; build it here for payloads without one
+    prompt = event.get("prompt") or build_prompt(
+        product_name, 
+        product_description, 
+        campaign_message, 
+        target_audience, 
+        target_region
+    )
+    logger.info(f"Prompt: {prompt[:200]}...")
+    
+    # A losing hedge that still returns an image is billed by Bedrock, so it is ledgered too (presumed: still in flight)
+    def charge_discarded(discarded: GenerationPath, presumed: bool):
+        ledger.record(campaign_id, "hedge", product_index, generation_cents(tier, discarded), tier=tier, presumed=presumed, **discarded.describe())
+    
+    started = time.monotonic()
+    image_data, path, attempt = generate_image(prompt, tier, on_discarded=charge_discarded)
+    timings = {"generate_seconds": round(time.monotonic() - started, 3), **attempt.pop("timings")}
+    quality = generation_quality(tier, path.quality)
+    cents = generation_cents(tier, path)
+    ledger.record(campaign_id, "generate", product_index, cents, tier=tier, **path.describe())
+    logger.info(f"Image generated: {len(image_data)} bytes via {path.name}")
+    
+    image_key = f"{output_prefix(campaign_id, tier)}generated/{sanitize(product_name)}-{product_index}.png"
+    # Exact content hash: the variants stage keys its render cache on it without downloading the image
+    image_hash = content_hash(image_data)
+    uploads.submit(
+        image_key,
+        image_data,
+        "image/png",
+        {
+            "campaign-id": encode_metadata(campaign_id),
+            "product-name": encode_metadata(product_name),
+            "product-index": str(product_index),
+            "model": path.model,
+            "region": path.region,
+            "quality": quality,
+            "tier": tier,
+            "cost-cents": format_cents(cents),
+            CONTENT_HASH_METADATA: image_hash
+        }
+    )
+    uploads.drain()
+    logger.info(f"Saved image: s3://{S3_BUCKET}/{image_key}")
+    
+    update_manifest(campaign_id, product_name, product_index, image_key, {**path.describe(), "quality": quality, "tier": tier, **attempt, "timings": timings})
+    publish_status(campaign_id, "generated", product_index)
+    if workflow:
+        workflow.set_task_state(workflow_id, product_task("generate", product_index), SUCCEEDED, image_key=image_key)
+        workflow.set_task_state(workflow_id, product_task("variants", product_index), PENDING, image_key=image_key)
+    
+    variants_payload = {
+        "campaign_id": campaign_id,
+        "product_name": product_name,
+        "product_index": product_index,
+        "image_key": image_key,
+        "image_source": "generated",
+        "source_hash": source_identity(sha256=image_hash),
+        "campaign_message": campaign_message,
+        "brand_colors": brand_colors,
+        "tier": tier,
+        "workflow_id": workflow_id
+    }
+    
+    if VARIANTS_QUEUE_URL:
+        sqs_client.send_message(QueueUrl=VARIANTS_QUEUE_URL, MessageBody=json.dumps(variants_payload))
+    else:
+        lambda_client.invoke(
+            FunctionName=VARIANTS_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps(variants_payload)
+        )
+    
+    logger.info(f"Invoked variants generator for {image_key}")
+    
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "campaign_id": campaign_id,
+            "product_name": product_name,
+            "image_key": image_key,
+            "cost_cents": format_cents(cents),
+            "generation_path": path.name
+        })
+    }
 
-Product Details: {product_description}
 
-Target Market: {target_region}
-Campaign Message: {campaign_message}
+def record_failure(event: Dict[str, Any], error: Exception):
+    if "campaign_id" not in event:
+        return
+    product_index = event.get("product_index", 0)
+    mark_product_failed(event["campaign_id"], product_index, "generator", str(error))
+    if workflow:
+        # A failed product still counts towards the completion barrier
+        workflow_id = event.get("workflow_id", event["campaign_id"])
+        record_product_outcome(workflow, s3_client, S3_BUCKET, workflow_id, product_index, False)
 
-Style: {base_style}"""
-    
-    if len(prompt_without_audience) <= MAX_PROMPT_LENGTH:
-        logger.warning(f"Prompt too long ({len(full_prompt)} chars), removed target_audience")
-        return prompt_without_audience
-    
-    minimal_prompt = f"""Professional product photography of {product_name}.
 
-{product_description}
+def generation_cents(tier: str, path: GenerationPath) -> Decimal:
+    # Generation pricing lives in the cost ledger; fallback paths may override it (GENERATION_FALLBACK_PATHS cost, dollars)
+    if tier == PREVIEW:
+        return PREVIEW_GENERATION_CENTS
+    return to_cents(path.cost) if path.cost is not None else GENERATION_CENTS
 
-Style: {base_style}"""
+
+def generate_image(prompt: str, tier: str = FINAL, on_discarded: Optional[Callable[[GenerationPath, bool], None]] = None) -> Tuple[bytes, GenerationPath, Dict[str, Any]]:
+    max_retries = 6 if len(GENERATION_PATHS) == 1 else FALLBACK_MAX_RETRIES
+    
+    # Each path records its own throttles and latency: a hedge runs alongside the path it races
+    path_timings = {}
     
-    if len(minimal_prompt) <= MAX_PROMPT_LENGTH:
-        logger.warning(f"Prompt too long ({len(full_prompt)} chars), using minimal version")
-        return minimal_prompt
+    def invoke(path: GenerationPath) -> bytes:
+        timings = path_timings[path] = {"throttles": 0}
+        return invoke_path(prompt, path, max_retries, tier=tier, timings=timings)
     
-    truncated = minimal_prompt[:MAX_PROMPT_LENGTH]
-    logger.warning(f"Prompt too long ({len(minimal_prompt)} chars), truncated to {MAX_PROMPT_LENGTH}")
-    return truncated
+    image_data, path, attempt = fallback_chain.generate(invoke, on_discarded)
+    return image_data, path, {**attempt, "timings": path_timings[path]}
 
 
-def generate_image(prompt: str, max_retries: int = 6, base_delay: float = 5.0) -> bytes:
-    logger.info(f"Calling Bedrock Titan with model: {BEDROCK_MODEL_ID}")
+def get_bedrock_client(region: str):
+    # Queue workers generate on several threads, and creating clients is not thread-safe
+    with bedrock_clients_lock:
+        if region not in bedrock_clients:
+            bedrock_clients[region] = boto3.client("bedrock-runtime", region_name=region)
+        return bedrock_clients[region]
+
+
+def invoke_path(prompt: str, path: GenerationPath, max_retries: int = 6, base_delay: float = 5.0, tier: str = FINAL, timings: Optional[Dict[str, Any]] = None) -> bytes:
+    quality = generation_quality(tier, path.quality)
+    size = tier_settings(tier)["image_size"]
+    logger.info(f"Calling Bedrock Titan with model: {path.model} ({path.region}, {quality}, {size}x{size})")
     
     request_body = {
         "taskType": "TEXT_IMAGE",
         "textToImageParams": {"text": prompt},
         "imageGenerationConfig": {
             "numberOfImages": 1,
-            "quality": "premium",
-            "height": 1024,
-            "width": 1024,
+            "quality": quality,
+            "height": size,
+            "width": size,
             "cfgScale": 8.0,
             "seed": 0
         }
     }
     
+    # The adaptive concurrency limit tracks the primary path's quota, which hedges on the same model and region draw from too
+    primary = GENERATION_PATHS[0]
+    controller = concurrency if (path.model, path.region) == (primary.model, primary.region) else None
+    
+    throttles = 0
     for attempt in range(max_retries):
         try:
-            response = bedrock_client.invoke_model(
-                modelId=BEDROCK_MODEL_ID,
+            started = time.monotonic()
+            response = get_bedrock_client(path.region).invoke_model(
+                modelId=path.model,
                 body=json.dumps(request_body),
                 contentType="application/json",
                 accept="application/json"
@@ -192,19 +288,29 @@ def generate_image(prompt: str, max_retries: int = 6, base_delay: float = 5.0) -
             base64_image = response_body["images"][0]
             image_data = base64.b64decode(base64_image)
             
+            latency = time.monotonic() - started
             logger.info(f"Successfully generated image: {len(image_data)} bytes")
+            if controller:
+                controller.record(throttles, latency)
+            if timings is not None:
+                timings["bedrock_seconds"] = round(latency, 3)
             return image_data
             
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', '')
             
             if error_code == 'ThrottlingException':
+                throttles += 1
+                if timings is not None:
+                    timings["throttles"] += 1
                 if attempt < max_retries - 1:
                     delay = base_delay * (2 ** attempt) + random.uniform(0, 2)
                     logger.warning(f"Throttled by Bedrock (attempt {attempt + 1}/{max_retries}). Waiting {delay:.2f}s before retry...")
                     time.sleep(delay)
                 else:
                     logger.error(f"Max retries ({max_retries}) exhausted for Bedrock API")
+                    if controller:
+                        controller.record(throttles, None)
                     raise
             else:
                 logger.error(f"Bedrock API error: {error_code} - {str(e)}")
@@ -216,38 +322,38 @@ def generate_image(prompt: str, max_retries: int = 6, base_delay: float = 5.0) -
     
     raise Exception(f"Failed to generate image after {max_retries} attempts")
 
-def update_manifest(campaign_id: str, product_name: str, product_index: int, image_key: str, cost: float):
+def update_manifest(campaign_id: str, product_name: str, product_index: int, image_key: str, path_info: Dict[str, Any]):
     try:
-        manifest_key = f"output/{campaign_id}/manifest.json"
-        
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=manifest_key)
-        manifest = json.loads(response["Body"].read())
-        
-        product_entry = {
+        # Patch of the entry created by the parser, so each product has a single status
+        manifests.update_product(campaign_id, product_index, {
             "name": product_name,
             "index": product_index,
             "image_key": image_key,
             "image_source": "generated",
-            "cost": cost,
-            "model": BEDROCK_MODEL_ID
-        }
-        
-        manifest["products"].append(product_entry)
-        manifest["total_cost"] = manifest.get("total_cost", 0.0) + cost
-        
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=manifest_key,
-            Body=json.dumps(manifest, indent=2),
-            ContentType="application/json"
-        )
-        
-        logger.info(f"Updated manifest: {manifest_key}")
+            **path_info,
+            "status": "generated",
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        logger.info(f"Updated manifest for product {product_index} of {campaign_id}")
         
     except Exception as e:
         logger.error(f"Failed to update manifest: {str(e)}", exc_info=True)
 
 
+def mark_product_failed(campaign_id: str, product_index: int, stage: str, error: str):
+    try:
+        manifests.update_product(campaign_id, product_index, {
+            "status": "failed",
+            "failed_stage": stage,
+            "error": error[:500],
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+        publish_status(campaign_id, "failed", product_index, stage=stage)
+        
+    except Exception as e:
+        logger.error(f"Failed to record product failure: {str(e)}", exc_info=True)
+
+
 def sanitize(text: str) -> str:
     return text.lower().replace(" ", "-").replace("_", "-")[:30]
 
@@ -0,0 +1,224 @@
+"""
+Adaptive Bedrock Concurrency
+
+AIMD controller for the number of generations in flight. Every generator
+invocation reports its Bedrock throttles and latency; the shared state (in
+the workflow table) grows the limit additively while calls succeed within
+the latency target and cuts it multiplicatively on throttling. The limit is
+applied by resizing the generation queues' event source mappings and is
+published as a CloudWatch metric. The shares last applied successfully are
+stored next to the state, so a failed resize is retried by the next
+observation instead of leaving the mappings behind the target.
+"""
+
+import json
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# Smallest maximum concurrency an SQS event source mapping accepts
+MIN_CLASS_CONCURRENCY = 2
+
+INCREASE_STEP = 1.0
+DECREASE_FACTOR = 0.7
+DECREASE_COOLDOWN_SECONDS = 60
+LATENCY_EWMA_ALPHA = 0.2
+LATENCY_TARGET_SECONDS = float(os.environ.get("BEDROCK_LATENCY_TARGET_SECONDS", "30"))
+
+STATE_KEY = {"campaign_id": {"S": "#concurrency"}, "task": {"S": "bedrock"}}
+METRIC_NAMESPACE = "CreativeAutomation"
+MAX_UPDATE_ATTEMPTS = 5
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease of a concurrency limit"""
+
+    def __init__(self, min_limit: float, max_limit: float, state: Optional[Dict[str, float]] = None):
+        state = state or {}
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(state.get("limit", max_limit), min_limit), max_limit)
+        self.latency = state.get("latency")
+        self.decreased_at = state.get("decreased_at", 0.0)
+
+    def observe(self, throttles: int, latency: Optional[float], now: float):
+        if throttles:
+            # One cut per cooldown: a burst of throttles reported by concurrent calls is one congestion event
+            if now - self.decreased_at >= DECREASE_COOLDOWN_SECONDS:
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                self.decreased_at = now
+            return
+
+        if latency is None:
+            return
+        self.latency = latency if self.latency is None else (1 - LATENCY_EWMA_ALPHA) * self.latency + LATENCY_EWMA_ALPHA * latency
+
+        # Grows by about one slot per limit's worth of successful calls, and holds while latency is over target
+        if self.latency <= LATENCY_TARGET_SECONDS:
+            self.limit = min(self.max_limit, self.limit + INCREASE_STEP / self.limit)
+
+    def state(self) -> Dict[str, float]:
+        state = {"limit": self.limit, "decreased_at": self.decreased_at}
+        if self.latency is not None:
+            state["latency"] = self.latency
+        return state
+
+
+def class_shares(limit: float, ceilings: Dict[str, int]) -> Dict[str, int]:
+    """Split the total limit across priority classes in proportion to their configured ceilings"""
+    total = sum(ceilings.values())
+    return {
+        name: max(MIN_CLASS_CONCURRENCY, min(ceiling, int(limit * ceiling / total)))
+        for name, ceiling in ceilings.items()
+    }
+
+
+class ConcurrencyController:
+    """AIMD state shared by all generator invocations, applied to the generation event source mappings"""
+
+    def __init__(self, table: str, function_name: Optional[str], ceilings: Dict[str, int], dynamodb=None, lambda_client=None):
+        self.table = table
+        self.function_name = function_name
+        self.ceilings = ceilings
+        self.dynamodb = dynamodb or boto3.client("dynamodb")
+        self.lambda_client = lambda_client or boto3.client("lambda")
+        self._mappings = None
+
+    def record(self, throttles: int, latency: Optional[float]):
+        """Feed one Bedrock call's outcome into the shared controller (never raises)"""
+        try:
+            self._record(throttles, latency)
+        except Exception as e:
+            logger.warning(f"Concurrency controller update failed: {str(e)}")
+
+    def _record(self, throttles: int, latency: Optional[float]):
+        min_limit = MIN_CLASS_CONCURRENCY * len(self.ceilings)
+        max_limit = sum(self.ceilings.values())
+
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            item = self.dynamodb.get_item(TableName=self.table, Key=STATE_KEY, ConsistentRead=True).get("Item")
+            version = int(item["version"]["N"]) if item else 0
+            state = json.loads(item["state"]["S"]) if item else None
+
+            # Shares last applied to the mappings successfully, kept apart from the target they follow
+            applied = json.loads(item["applied"]["S"]) if item and "applied" in item else None
+
+            controller = AIMDController(min_limit, max_limit, state)
+            controller.observe(throttles, latency, time.time())
+            shares = class_shares(controller.limit, self.ceilings)
+
+            # Optimistic concurrency: only the writer that read the latest version wins
+            condition = {"ConditionExpression": "attribute_not_exists(version)"}
+            if item:
+                condition = {
+                    "ConditionExpression": "version = :version",
+                    "ExpressionAttributeValues": {":version": {"N": str(version)}}
+                }
+
+            try:
+                self.dynamodb.put_item(
+                    TableName=self.table,
+                    Item={
+                        **STATE_KEY,
+                        "state": {"S": json.dumps(controller.state())},
+                        "version": {"N": str(version + 1)},
+                        **({"applied": item["applied"]} if item and "applied" in item else {})
+                    },
+                    **condition
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                    continue
+                raise
+
+            # Also retries after a failed update: the mappings are resized until they match the target
+            if self.function_name and shares != applied:
+                self.apply(shares)
+                self.dynamodb.update_item(
+                    TableName=self.table,
+                    Key=STATE_KEY,
+                    UpdateExpression="SET applied = :applied",
+                    ExpressionAttributeValues={":applied": {"S": json.dumps(shares)}}
+                )
+            emit_metrics(controller, throttles, latency)
+            return
+
+        logger.warning("Concurrency controller state contended, observation dropped")
+
+    def shares(self) -> Optional[Dict[str, int]]:
+        """Current per-class shares of the shared limit (None before the first observation)"""
+        item = self.dynamodb.get_item(TableName=self.table, Key=STATE_KEY, ConsistentRead=True).get("Item")
+        if not item:
+            return None
+        min_limit = MIN_CLASS_CONCURRENCY * len(self.ceilings)
+        controller = AIMDController(min_limit, sum(self.ceilings.values()), json.loads(item["state"]["S"]))
+        return class_shares(controller.limit, self.ceilings)
+
+    def apply(self, shares: Dict[str, int]):
+        """Resize each priority class's event source mapping"""
+        for name, uuid in self.mappings().items():
+            if name in shares:
+                self.lambda_client.update_event_source_mapping(
+                    UUID=uuid,
+                    ScalingConfig={"MaximumConcurrency": shares[name]}
+                )
+        logger.info(f"Generation concurrency set to {shares}")
+
+    def mappings(self) -> Dict[str, str]:
+        """Priority class -> event source mapping UUID, discovered from the generation queue names"""
+        if self._mappings is None:
+            self._mappings = {}
+            paginator = self.lambda_client.get_paginator("list_event_source_mappings")
+            for page in paginator.paginate(FunctionName=self.function_name):
+                for mapping in page["EventSourceMappings"]:
+                    queue_name = mapping.get("EventSourceArn", "").rsplit(":", 1)[-1]
+                    if "-generation-" in queue_name:
+                        self._mappings[queue_name.rsplit("-generation-", 1)[1]] = mapping["UUID"]
+        return self._mappings
+
+    @staticmethod
+    def from_environment(function_name: Optional[str]) -> Optional["ConcurrencyController"]:
+        """
+        Controller over WORKFLOW_TABLE and GENERATION_PRIORITY_CLASSES (None if either is unset).
+
+        Without a function name (queue workers outside Lambda) observations still feed the shared
+        state, but no event source mappings are resized: workers size their own slots from shares().
+        """
+        table = os.environ.get("WORKFLOW_TABLE")
+        ceilings = json.loads(os.environ.get("GENERATION_PRIORITY_CLASSES") or "{}")
+        if not table or not ceilings:
+            return None
+        return ConcurrencyController(table, function_name, ceilings)
+
+
+def emit_metrics(controller: AIMDController, throttles: int, latency: Optional[float]):
+    """Publish the current limit, throttles and latency in CloudWatch embedded metric format"""
+    metrics = [
+        {"Name": "BedrockConcurrencyLimit", "Unit": "Count"},
+        {"Name": "BedrockThrottles", "Unit": "Count"}
+    ]
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRIC_NAMESPACE,
+                "Dimensions": [["Environment"]],
+                "Metrics": metrics
+            }]
+        },
+        "Environment": os.environ.get("ENVIRONMENT", "dev"),
+        "BedrockConcurrencyLimit": round(controller.limit, 2),
+        "BedrockThrottles": throttles
+    }
+    if latency is not None:
+        metrics.append({"Name": "BedrockLatency", "Unit": "Seconds"})
+        record["BedrockLatency"] = round(latency, 3)
+
+    # Lambda forwards stdout to CloudWatch Logs, which extracts EMF records as metrics
+    print(json.dumps(record))
@@ -0,0 +1,149 @@
+"""
+Generation Fallback Chain
+
+Ordered generation paths (model, region, quality) tried in turn when one is
+throttled or failing, with optional hedging: if the current path has not
+answered within HEDGE_AFTER_SECONDS, the next path is started in parallel
+and the first image back wins. The path that served each image is reported
+so it can be recorded on the manifest.
+
+A losing hedge cannot be cancelled once its Bedrock call is in flight, and
+Lambda freezes anything still running once the handler returns, so losers
+are settled before generate() returns: each gets up to SETTLE_SECONDS to
+finish, one that produced an image is reported to the caller's
+on_discarded callback so its charge reaches the ledger, and one still in
+flight after that is reported as presumed billed. Hedges are extra Bedrock
+calls on top of the event source mapping's bound, which is why hedging is
+off unless HEDGE_AFTER_SECONDS is set.
+"""
+
+import json
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# Errors caused by the request itself: another path would reject it too
+FATAL_ERROR_CODES = ("ValidationException",)
+
+# How long a losing path is waited for after the winner returns (seconds)
+SETTLE_SECONDS = 5
+
+
+class GenerationPath:
+    """One way to generate an image: a Titan-compatible model in a region at a quality tier"""
+
+    def __init__(self, model: str, region: str, quality: str = "premium", cost: Optional[float] = None):
+        self.model = model
+        self.region = region
+        self.quality = quality
+        self.cost = cost
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.region}/{self.quality}"
+
+    def describe(self) -> Dict[str, Any]:
+        return {"model": self.model, "region": self.region, "quality": self.quality}
+
+
+def load_paths(default_model: str, default_region: str) -> List[GenerationPath]:
+    """Primary path from BEDROCK_MODEL_ID, followed by the GENERATION_FALLBACK_PATHS chain (JSON list)"""
+    paths = [GenerationPath(default_model, default_region)]
+    for entry in json.loads(os.environ.get("GENERATION_FALLBACK_PATHS") or "[]"):
+        paths.append(GenerationPath(
+            entry.get("model", default_model),
+            entry.get("region", default_region),
+            entry.get("quality", "premium"),
+            entry.get("cost")
+        ))
+    return paths
+
+
+class FallbackChain:
+    """Runs a generation over the paths in order, falling back on failure and hedging on slowness"""
+
+    def __init__(self, paths: List[GenerationPath], hedge_after: Optional[float] = None, settle_seconds: float = SETTLE_SECONDS):
+        self.paths = paths
+        self.hedge_after = hedge_after or None
+        self.settle_seconds = settle_seconds
+
+    def generate(self, invoke: Callable[[GenerationPath], bytes], on_discarded: Optional[Callable[[GenerationPath, bool], None]] = None) -> Tuple[bytes, GenerationPath, Dict[str, Any]]:
+        """
+        Returns (image data, serving path, details of the attempt).
+
+        on_discarded(path, presumed) is called, before returning, for each losing path that produced an
+        image (presumed False) or was still in flight after settle_seconds (presumed True).
+        """
+        pending = list(self.paths)
+        running = {}
+        attempted = []
+        hedged = False
+        last_error = None
+
+        pool = ThreadPoolExecutor(max_workers=len(self.paths))
+
+        def launch():
+            path = pending.pop(0)
+            attempted.append(path.name)
+            running[pool.submit(invoke, path)] = path
+
+        try:
+            launch()
+            while running:
+                timeout = self.hedge_after if pending else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    logger.warning(f"No image after {self.hedge_after}s, hedging with {pending[0].name}")
+                    hedged = True
+                    launch()
+                    continue
+
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        image_data = future.result()
+                    except Exception as e:
+                        last_error = e
+                        if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in FATAL_ERROR_CODES:
+                            raise
+                        logger.warning(f"Generation path {path.name} failed: {str(e)}")
+                        if pending:
+                            launch()
+                        continue
+
+                    if path is not self.paths[0]:
+                        logger.info(f"Image served by fallback path {path.name}")
+                    return image_data, path, {"attempted_paths": attempted, "hedged": hedged}
+        finally:
+            self._settle(running, on_discarded)
+            pool.shutdown(wait=False)
+
+        raise last_error or Exception("No generation path available")
+
+    def _settle(self, running: Dict[Any, GenerationPath], on_discarded: Optional[Callable[[GenerationPath, bool], None]]):
+        """Account for the losing paths while this invocation still runs: their images are discarded but still paid for"""
+        if not running:
+            return
+        finished, unfinished = wait(running, timeout=self.settle_seconds)
+        for future in finished:
+            if future.exception() is None:
+                logger.info(f"Discarded image from losing path {running[future].name}")
+                self._report(on_discarded, running[future], False)
+        for future in unfinished:
+            # Frozen with the invocation, or finished unobserved: charged on the assumption it is billed
+            logger.warning(f"Losing path {running[future].name} still running after {self.settle_seconds}s, charged as presumed billed")
+            self._report(on_discarded, running[future], True)
+
+    @staticmethod
+    def _report(on_discarded: Optional[Callable[[GenerationPath, bool], None]], path: GenerationPath, presumed: bool):
+        if on_discarded:
+            try:
+                on_discarded(path, presumed)
+            except Exception as e:
+                logger.error(f"Failed to account for discarded image from {path.name}: {str(e)}")
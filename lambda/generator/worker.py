@@ -0,0 +1,179 @@
+"""
+Generator Queue Worker
+
+Runs the generator as a long-lived process on a container host. Generation
+is I/O-bound (Bedrock calls and uploads), so one process keeps many
+products in flight: an asyncio loop long-polls every priority-class queue
+in GENERATION_QUEUE_URLS and runs each message through the Lambda's queue
+handler on a worker thread. WORKER_CONCURRENCY generations run at once,
+split across the classes like the event source mappings' shares
+(GENERATION_PRIORITY_CLASSES), so bulk work cannot take urgent capacity.
+With a shared AIMD controller (WORKFLOW_TABLE), each class's slots are
+also capped by its current share of the adaptive limit, refreshed every
+LIMIT_REFRESH_SECONDS, so workers back off with the Lambdas on throttling.
+
+    python worker.py
+"""
+
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Set
+
+import boto3
+
+from shared.queue_worker import QueuePoller, MAX_BATCH, RECEIVE_ERROR_DELAY, configure_logging, stop_on_signals, succeeded
+from concurrency import class_shares
+
+logger = logging.getLogger()
+
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "16"))
+
+# How often the class slots follow the shared concurrency limit (seconds)
+LIMIT_REFRESH_SECONDS = int(os.environ.get("LIMIT_REFRESH_SECONDS", "15"))
+
+
+class Slots:
+    """Semaphore whose capacity can shrink or grow while permits are held"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters = deque()
+    
+    def locked(self) -> bool:
+        return self.in_use >= self.limit
+    
+    async def acquire(self):
+        while self.locked():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass a wake-up this waiter received on to the next one
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_use += 1
+    
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+    
+    def resize(self, limit: int):
+        """Takes effect as permits are acquired: held ones are never revoked"""
+        self.limit = limit
+        self._wake()
+    
+    def _wake(self):
+        free = self.limit - self.in_use
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+def class_limits(queue_urls: Dict[str, str]) -> Dict[str, int]:
+    """Generations in flight per priority class"""
+    ceilings = json.loads(os.environ.get("GENERATION_PRIORITY_CLASSES") or "{}")
+    if all(name in ceilings for name in queue_urls):
+        return class_shares(WORKER_CONCURRENCY, {name: ceilings[name] for name in queue_urls})
+    return {name: max(1, WORKER_CONCURRENCY // len(queue_urls)) for name in queue_urls}
+
+
+async def process(app, poller: QueuePoller, record: Dict[str, Any], slots: Slots):
+    try:
+        # The handler retries, records failures and dead-letters exactly as it does on Lambda
+        response = await asyncio.to_thread(app.handle_queue, [record])
+        await asyncio.to_thread(poller.delete, succeeded([record], response))
+    except Exception as e:
+        logger.error(f"Generation worker failed on message {record['messageId']}: {str(e)}", exc_info=True)
+    finally:
+        slots.release()
+
+
+async def consume(app, poller: QueuePoller, slots: Slots, stopping):
+    """Receive only as many messages as there are free slots, so none wait out their visibility timeout"""
+    in_flight: Set[asyncio.Task] = set()
+    
+    while not stopping.is_set():
+        await slots.acquire()
+        reserved = 1
+        while reserved < MAX_BATCH and not slots.locked():
+            await slots.acquire()
+            reserved += 1
+        
+        try:
+            records = await asyncio.to_thread(poller.receive, reserved)
+        except Exception as e:
+            logger.error(f"Failed to receive from {poller.queue_url}: {str(e)}")
+            records = []
+            await asyncio.sleep(RECEIVE_ERROR_DELAY)
+        
+        for _ in range(reserved - len(records)):
+            slots.release()
+        for record in records:
+            task = asyncio.create_task(process(app, poller, record, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def follow_limit(controller, limits: Dict[str, int], slots: Dict[str, Slots], stopping):
+    """Cap each class's slots at its share of the shared adaptive limit"""
+    while not stopping.is_set():
+        try:
+            shares = await asyncio.to_thread(controller.shares)
+        except Exception as e:
+            logger.warning(f"Failed to read the shared concurrency limit: {str(e)}")
+            shares = None
+        
+        if shares:
+            for name, class_slots in slots.items():
+                limit = max(1, min(limits[name], shares.get(name, limits[name])))
+                if limit != class_slots.limit:
+                    logger.info(f"Generation slots for {name}: {class_slots.limit} -> {limit}")
+                    class_slots.resize(limit)
+        
+        await asyncio.to_thread(stopping.wait, LIMIT_REFRESH_SECONDS)
+
+
+async def run(app, queue_urls: Dict[str, str], stopping):
+    limits = class_limits(queue_urls)
+    slots = {name: Slots(limits[name]) for name in queue_urls}
+    sqs = boto3.client("sqs")
+    
+    # Every generation and every long poll holds a thread while it waits on I/O
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=sum(limits.values()) + len(queue_urls) + 1))
+    logger.info(f"Generator worker consuming {len(queue_urls)} queues with limits {limits}")
+    
+    tasks = [consume(app, QueuePoller(sqs, url), slots[name], stopping) for name, url in queue_urls.items()]
+    if app.concurrency:
+        tasks.append(follow_limit(app.concurrency, limits, slots, stopping))
+    await asyncio.gather(*tasks)
+
+
+def main():
+    configure_logging()
+    import app  # After logging is configured: importing creates the warm clients and controllers
+    
+    queue_urls = json.loads(os.environ.get("GENERATION_QUEUE_URLS") or "{}")
+    if not queue_urls:
+        raise ValueError("GENERATION_QUEUE_URLS must list the generation queues to consume")
+    
+    stopping = stop_on_signals()
+    asyncio.run(run(app, queue_urls, stopping))
+    logger.info("Generator worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Campaign Analytics Export
+
+Periodic compaction of campaign history into Parquet for analytics: one
+row per product with its campaign attributes, generation path, stage
+timings, throttles and ledger cost, partitioned by campaign date under
+analytics/products/date=YYYY-MM-DD/. Only dates with manifests changed
+since the last run are rebuilt, and each date is one file, so queries over
+tens of thousands of campaigns read a handful of columnar objects instead
+of every manifest.
+
+Changed campaigns are found through the manifests' date index (one marker
+per campaign, rewritten with its full manifest at creation and whenever a
+round completes), and the rebuild runs one date at a time, reading only
+that date's manifests and ledger prefixes. The state object keeps each
+date's campaign, product and variant counts, which the dashboard sums for
+its all-time figures.
+"""
+
+import json
+import logging
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from shared.costs import CAMPAIGNS_PREFIX, parse_entry
+from shared.manifest import ManifestStore, INDEX_PREFIX, index_key
+
+logger = logging.getLogger()
+
+ANALYTICS_PREFIX = 'analytics/products/'
+STATE_KEY = 'analytics/_state.json'
+
+# Concurrent manifest downloads while rebuilding a date
+MAX_WORKERS = 16
+
+SCHEMA = pa.schema([
+    ('date', pa.string()),
+    ('campaign_id', pa.string()),
+    ('campaign_name', pa.string()),
+    ('campaign_status', pa.string()),
+    ('created_at', pa.string()),
+    ('completed_at', pa.string()),
+    ('priority', pa.string()),
+    ('tenant', pa.string()),
+    ('tier', pa.string()),
+    ('product_index', pa.int32()),
+    ('product_name', pa.string()),
+    ('status', pa.string()),
+    ('image_source', pa.string()),
+    ('model', pa.string()),
+    ('region', pa.string()),
+    ('quality', pa.string()),
+    ('hedged', pa.bool_()),
+    ('fallback_attempts', pa.int32()),
+    ('generate_seconds', pa.float64()),
+    ('bedrock_seconds', pa.float64()),
+    ('throttles', pa.int32()),
+    ('variants_seconds', pa.float64()),
+    ('variants_count', pa.int32()),
+    ('cost_cents', pa.float64())
+])
+
+
+def product_rows(manifest: Dict[str, Any], costs: Dict[int, Decimal], date: str) -> List[Dict[str, Any]]:
+    """Flatten a manifest into one row per product"""
+    rows = []
+    for product in manifest.get('products', []):
+        index = product.get('index', product.get('product_index'))
+        timings = product.get('timings', {})
+        rows.append({
+            'date': date,
+            'campaign_id': manifest.get('campaign_id'),
+            'campaign_name': manifest.get('campaign_name'),
+            'campaign_status': manifest.get('status'),
+            'created_at': manifest.get('created_at'),
+            'completed_at': manifest.get('completed_at'),
+            'priority': manifest.get('priority'),
+            'tenant': manifest.get('tenant'),
+            'tier': product.get('tier', manifest.get('tier')),
+            'product_index': index,
+            'product_name': product.get('product_name', product.get('name')),
+            'status': product.get('status'),
+            'image_source': product.get('image_source'),
+            'model': product.get('model'),
+            'region': product.get('region'),
+            'quality': product.get('quality'),
+            'hedged': product.get('hedged'),
+            'fallback_attempts': len(product['attempted_paths']) if 'attempted_paths' in product else None,
+            'generate_seconds': timings.get('generate_seconds'),
+            'bedrock_seconds': timings.get('bedrock_seconds'),
+            'throttles': timings.get('throttles'),
+            'variants_seconds': timings.get('variants_seconds'),
+            'variants_count': product.get('variants_count'),
+            'cost_cents': float(costs.get(index, 0))
+        })
+    return rows
+
+
+def ledger_costs(s3, bucket: str, campaign_id: str) -> Dict[int, Decimal]:
+    """Cents per product of one campaign, from a listing of its ledger prefix"""
+    costs: Dict[int, Decimal] = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{CAMPAIGNS_PREFIX}{campaign_id}/"):
+        for obj in page.get('Contents', []):
+            entry = parse_entry(obj['Key'])
+            if entry:
+                costs[entry['product_index']] = costs.get(entry['product_index'], Decimal(0)) + entry['cents']
+    return costs
+
+
+def indexed_dates(s3, bucket: str) -> List[str]:
+    """Campaign dates with at least one manifest (one listing entry per date)"""
+    dates = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=INDEX_PREFIX, Delimiter='/'):
+        for prefix in page.get('CommonPrefixes', []):
+            dates.append(prefix['Prefix'][len(INDEX_PREFIX):].rstrip('/'))
+    return sorted(dates)
+
+
+def indexed_campaigns(s3, bucket: str, date: str) -> Dict[str, datetime]:
+    """Campaign id -> time its manifest was last written in full, for the campaigns of a date"""
+    campaigns = {}
+    prefix = f"{INDEX_PREFIX}{date}/"
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            campaigns[obj['Key'][len(prefix):]] = obj['LastModified']
+    return campaigns
+
+
+def load_state(s3, bucket: str) -> Dict[str, Any]:
+    try:
+        response = s3.get_object(Bucket=bucket, Key=STATE_KEY)
+        return json.loads(response['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return {'compacted_at': None, 'dates': {}}
+        raise
+
+
+def index_campaigns(s3, bucket: str):
+    """Add a date index marker for every campaign under output/ (one listing entry per campaign)"""
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix='output/', Delimiter='/'):
+        for prefix in page.get('CommonPrefixes', []):
+            key = index_key(prefix['Prefix'].split('/')[1])
+            if key:
+                s3.put_object(Bucket=bucket, Key=key, Body=b'')
+
+
+def compact_analytics(s3, bucket: str, full: bool = False) -> Dict[str, Any]:
+    """Rebuild the Parquet partitions of every date with a manifest changed since the last run"""
+    state = load_state(s3, bucket)
+    since = None if full or not state.get('compacted_at') else datetime.fromisoformat(state['compacted_at'])
+    started = datetime.now(timezone.utc)
+    
+    # Per-date totals of the export, so counts across all history are one read of the state
+    totals = {} if since is None else state.get('dates', {})
+    
+    # A full rebuild also indexes campaigns written before the date index existed
+    if full:
+        index_campaigns(s3, bucket)
+    
+    dates_rebuilt = 0
+    rows_written = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        # One date in memory at a time: its index markers, manifests and ledger costs
+        for date in indexed_dates(s3, bucket):
+            campaigns = indexed_campaigns(s3, bucket, date)
+            if since is not None and not any(modified >= since for modified in campaigns.values()):
+                continue
+            
+            rows = []
+            for manifest, costs in pool.map(lambda c: (fetch_manifest(s3, bucket, c), ledger_costs(s3, bucket, c)), sorted(campaigns)):
+                if manifest:
+                    rows.extend(product_rows(manifest, costs, date))
+            write_partition(s3, bucket, date, rows)
+            totals[date] = {
+                'campaigns': len(campaigns),
+                'products': len(rows),
+                'variants': sum(row['variants_count'] or 0 for row in rows)
+            }
+            dates_rebuilt += 1
+            rows_written += len(rows)
+    
+    s3.put_object(Bucket=bucket, Key=STATE_KEY, Body=json.dumps({'compacted_at': started.isoformat(), 'dates': totals}), ContentType='application/json')
+    logger.info(f"Compacted analytics: {dates_rebuilt} dates, {rows_written} product rows")
+    return {'dates': dates_rebuilt, 'rows': rows_written}
+
+
+def fetch_manifest(s3, bucket: str, campaign_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return ManifestStore.from_environment(s3, bucket).load(campaign_id)
+    except Exception as e:
+        logger.warning(f"Skipping unreadable manifest for {campaign_id}: {e}")
+        return None
+
+
+def write_partition(s3, bucket: str, date: str, rows: List[Dict[str, Any]]):
+    """Replace a date's Parquet file"""
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+    buffer = BytesIO()
+    pq.write_table(table, buffer, compression='zstd')
+    buffer.seek(0)
+    
+    s3.upload_fileobj(buffer, bucket, f"{ANALYTICS_PREFIX}date={date}/products.parquet", ExtraArgs={'ContentType': 'application/vnd.apache.parquet'})
+
+
+def read_recent(s3, bucket: str, days: int, columns: List[str]) -> pa.Table:
+    """Selected columns of the product rows of campaigns from the last days days (empty without history)"""
+    first = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{ANALYTICS_PREFIX}date=", StartAfter=f"{ANALYTICS_PREFIX}date={first}"):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith('.parquet'))
+    if not keys:
+        return SCHEMA.empty_table().select(columns)
+    
+    def read(key: str) -> pa.Table:
+        return pq.read_table(BytesIO(s3.get_object(Bucket=bucket, Key=key)['Body'].read()), columns=columns)
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(keys))) as pool:
+        return pa.concat_tables(list(pool.map(read, keys)))
@@ -8,11 +8,23 @@ the image generation pipeline with content safety checks.
 import json
 import os
 import boto3
+import hashlib
 import logging
 from datetime import datetime
 from typing import Dict, Any, List
 from jsonschema import validate, ValidationError
 
+from shared.status import publish_status
+from shared.prompts import build_prompt
+from shared.manifest import ManifestStore, manifest_key
+from shared.workflow import WorkflowStore, SUCCEEDED, PENDING, product_task, round_id
+from shared.tiers import PREVIEW, FINAL, TIERS
+from shared.costs import CostLedger
+from asset_catalog import AssetCatalog, asset_fingerprint, rebuild_catalog
+from analytics import compact_analytics
+from preflight import preflight
+from scheduler import GenerationScheduler, PRIORITY_CLASSES, priority_class, tenant_id
+
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
@@ -24,6 +36,16 @@ S3_BUCKET = os.environ['S3_BUCKET_NAME']
 GENERATOR_FUNCTION = os.environ['GENERATOR_FUNCTION']
 VARIANTS_FUNCTION = os.environ['VARIANTS_FUNCTION']
 
+# Variants work queue consumed by queue workers (container hosts); the variants Lambda is invoked when unset
+VARIANTS_QUEUE_URL = os.environ.get('VARIANTS_QUEUE_URL')
+
+# Generation work queues per priority class (bounded concurrency, retries and DLQ); direct invoke when unset
+scheduler = GenerationScheduler.from_environment(sqs)
+
+# Task states and completion barrier (None: completion is counted from the manifest)
+workflow = WorkflowStore.from_environment()
+manifests = ManifestStore.from_environment(s3, S3_BUCKET)
+
 SCHEMA = {
     "type": "object",
     "required": ["campaign_name", "campaign_message", "products", "target_regions", "target_audience"],
@@ -31,6 +53,9 @@ SCHEMA = {
         "campaign_name": {"type": "string", "minLength": 1},
         "campaign_message": {"type": "string", "minLength": 1},
         "target_audience": {"type": "string", "minLength": 1},
+        "priority": {"type": "string", "enum": list(PRIORITY_CLASSES)},
+        "tier": {"type": "string", "enum": list(TIERS)},
+        "tenant": {"type": "string", "minLength": 1},
         "brand_colors": {
             "type": "array",
             "items": {"type": "string", "pattern": "^#[0-9A-Fa-f]{6}$"}
@@ -57,9 +82,44 @@ def handler(event, context):
     """Main Lambda handler"""
     logger.info(f"Received event: {json.dumps(event)}")
     
+    # Scheduled catalog rebuild (EventBridge)
+    if event.get('action') == 'rebuild_asset_catalog':
+        catalog = rebuild_catalog(s3, S3_BUCKET)
+        return {'statusCode': 200, 'body': f"Indexed {sum(len(a) for a in catalog['assets'].values())} assets"}
+    
+    # Scheduled analytics compaction (EventBridge)
+    if event.get('action') == 'compact_analytics':
+        result = compact_analytics(s3, S3_BUCKET, full=event.get('full', False))
+        # Finished days of the cost ledger are rolled up on the same schedule
+        days = CostLedger(s3, S3_BUCKET).roll_up()
+        return {'statusCode': 200, 'body': f"Compacted {result['rows']} products over {result['dates']} dates, rolled up {days} ledger days"}
+    
+    # Cost and duration estimate of a brief before it is launched (dashboard, schedulers)
+    if event.get('action') == 'preflight':
+        try:
+            validate_brief(event['brief'])
+        except ValueError as e:
+            return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+        return {'statusCode': 200, 'body': json.dumps(preflight(s3, sqs, S3_BUCKET, event['brief'], scheduler))}
+    
+    # Promotion of approved preview products (dashboard)
+    if event.get('action') == 'promote':
+        # Asynchronous retries keep the Lambda request id, so they resume the same round
+        request_id = event.get('request_id') or context.aws_request_id
+        try:
+            promoted = promote_products(event['campaign_id'], event['product_indexes'], request_id)
+        except Exception as e:
+            # Raised rather than returned, so the invocation is retried
+            logger.error(f"Promotion of {event['campaign_id']} failed: {str(e)}", exc_info=True)
+            raise
+        return {'statusCode': 200, 'body': f"Promoted {promoted} products"}
+    
     try:
+        # Loaded once per invocation and shared by every product
+        catalog = AssetCatalog.load(s3, S3_BUCKET)
+        
         for record in event['Records']:
-            process_record(record)
+            process_record(record, catalog)
         
         return {'statusCode': 200, 'body': 'Success'}
     
@@ -68,7 +128,7 @@ def handler(event, context):
         return {'statusCode': 500, 'body': str(e)}
 
 
-def process_record(record: Dict[str, Any]):
+def process_record(record: Dict[str, Any], catalog: AssetCatalog):
     """Process single SQS record"""
     message = json.loads(record['body'])
     s3_event = message['Records'][0]
@@ -85,9 +145,18 @@ def process_record(record: Dict[str, Any]):
     
     manifest = create_manifest(campaign_id, brief)
     save_manifest(campaign_id, manifest)
+    save_brief(campaign_id, brief)
+    if workflow:
+        workflow.start_campaign(campaign_id, manifest['expected_products'])
+    publish_status(campaign_id, 'processing', expected_products=manifest['expected_products'])
     
+    tier = brief.get('tier', FINAL)
     for idx, product in enumerate(brief['products']):
-        process_product(campaign_id, product, idx, brief)
+        add_product_to_manifest(campaign_id, product['name'], idx)
+        process_product(campaign_id, product, idx, brief, catalog, tier)
+    
+    if workflow:
+        workflow.set_task_state(campaign_id, 'parse', SUCCEEDED, brief_key=key)
 
 
 def download_brief(bucket: str, key: str) -> Dict[str, Any]:
@@ -112,48 +181,95 @@ def create_manifest(campaign_id: str, brief: Dict[str, Any]) -> Dict[str, Any]:
         "target_audience": brief['target_audience'],
         "brand_colors": brief.get('brand_colors', ['#000000', '#FFFFFF']),
         "target_regions": brief.get('target_regions', ['US']),
+        "priority": priority_class(brief),
+        "tier": brief.get('tier', FINAL),
+        "tenant": brief.get('tenant'),
         "status": "processing",
         "created_at": datetime.utcnow().isoformat(),
         "products": [],
-        "expected_products": len(brief['products']),
-        "total_cost": 0.0
+        "expected_products": len(brief['products'])
     }
 
 
 def save_manifest(campaign_id: str, manifest: Dict[str, Any]):
     """Save manifest to S3"""
-    key = f"output/{campaign_id}/manifest.json"
+    manifests.save(campaign_id, manifest)
+    logger.info(f"Saved manifest: s3://{S3_BUCKET}/{manifest_key(campaign_id)}")
+
+
+def save_brief(campaign_id: str, brief: Dict[str, Any]):
+    """Keep the validated brief with the outputs (needed to promote preview products later)"""
     s3.put_object(
         Bucket=S3_BUCKET,
-        Key=key,
-        Body=json.dumps(manifest, indent=2),
+        Key=f"output/{campaign_id}/brief.json",
+        Body=json.dumps(brief, indent=2),
         ContentType='application/json'
     )
-    logger.info(f"Saved manifest: s3://{S3_BUCKET}/{key}")
+
+
+def promotion_round(indexes: List[int], request_id: str) -> str:
+    """Round name of a promotion request: the same for every retry of that request"""
+    digest = hashlib.sha256(f"{request_id}:{sorted(set(indexes))}".encode('utf-8')).hexdigest()[:12]
+    return f"promote-{digest}"
+
+
+def promote_products(campaign_id: str, indexes: List[int], request_id: str) -> int:
+    """Regenerate approved preview products at the final tier, as a separate completion round"""
+    response = s3.get_object(Bucket=S3_BUCKET, Key=f"output/{campaign_id}/brief.json")
+    brief = json.loads(response['Body'].read())
+    
+    manifest = manifests.load(campaign_id)
+    round_name = promotion_round(indexes, request_id)
+    workflow_id = round_id(campaign_id, round_name)
+    
+    # Products with a completed preview, and products of this round an earlier attempt did not dispatch
+    def promotable(product: Dict[str, Any]) -> bool:
+        promotion = product.get('promotion', {})
+        if promotion.get('round') == round_name:
+            return 'dispatched_at' not in promotion
+        return product.get('tier', manifest.get('tier')) == PREVIEW and product.get('status') == 'completed'
+    
+    candidates = {p.get('product_index', p.get('index')) for p in manifest['products'] if promotable(p)}
+    indexes = sorted(set(indexes) & candidates)
+    if not indexes:
+        logger.info(f"No promotable products in {campaign_id} (round {round_name})")
+        return 0
+    
+    # A retry keeps the round's original product count (start_campaign is idempotent)
+    if workflow:
+        workflow.start_campaign(workflow_id, len(indexes))
+    manifests.update_campaign(campaign_id, {
+        'status': 'processing',
+        'promoted_products': sorted(set(manifest.get('promoted_products', [])) | set(indexes))
+    })
+    publish_status(campaign_id, 'processing', promoted_products=indexes)
+    
+    catalog = AssetCatalog.load(s3, S3_BUCKET)
+    for index in indexes:
+        # Marked before dispatch, so the stages' own updates sort after it; confirmed once dispatched.
+        # The preview variants stay listed, but no longer count as done until the final tier's arrive.
+        manifests.update_product(campaign_id, index, {
+            'status': 'processing',
+            'awaiting_tier': FINAL,
+            'promotion': {'round': round_name},
+            'updated_at': datetime.utcnow().isoformat()
+        })
+        process_product(campaign_id, brief['products'][index], index, brief, catalog, FINAL, workflow_id)
+        manifests.update_product(campaign_id, index, {'promotion': {'dispatched_at': datetime.utcnow().isoformat()}})
+    
+    logger.info(f"Promoted {len(indexes)} products of {campaign_id} to the final tier (round {round_name})")
+    return len(indexes)
 
 
 def add_product_to_manifest(campaign_id: str, product_name: str, index: int):
     """Add product entry to manifest"""
-    manifest_key = f"output/{campaign_id}/manifest.json"
-    
     try:
-        response = s3.get_object(Bucket=S3_BUCKET, Key=manifest_key)
-        manifest = json.loads(response['Body'].read())
-        
-        # Add product entry if not exists
-        product_entry = {
+        manifests.update_product(campaign_id, index, {
             'product_index': index,
             'product_name': product_name,
-            'status': 'processing'
-        }
-        manifest['products'].append(product_entry)
-        
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key=manifest_key,
-            Body=json.dumps(manifest, indent=2),
-            ContentType='application/json'
-        )
+            'status': 'processing',
+            'updated_at': datetime.utcnow().isoformat()
+        })
         logger.info(f"Added product to manifest: {product_name} (index: {index})")
     except Exception as e:
         logger.error(f"Failed to add product to manifest: {e}")
@@ -163,41 +279,41 @@ def process_product(
     campaign_id: str,
     product: Dict[str, Any],
     index: int,
-    brief: Dict[str, Any]
+    brief: Dict[str, Any],
+    catalog: AssetCatalog,
+    tier: str = FINAL,
+    workflow_id: str = None
 ):
     """Process individual product"""
-    # Add product entry to manifest
-    add_product_to_manifest(campaign_id, product['name'], index)
-    
+    workflow_id = workflow_id or campaign_id
     existing_assets = product.get('existing_assets')
     
     if existing_assets:
-        asset_key = f"existing-assets/{existing_assets}product.png"
-        if object_exists(S3_BUCKET, asset_key):
-            logger.info(f"Reusing existing asset: {asset_key}")
-            invoke_variants(campaign_id, product['name'], index, asset_key, brief, 'existing')
+        asset = catalog.best_asset(existing_assets)
+        if asset:
+            logger.info(f"Reusing existing asset: {asset['key']} ({asset.get('width')}x{asset.get('height')} {asset['format']})")
+            source_hash = asset_fingerprint(asset)
+            if workflow:
+                workflow.set_task_state(workflow_id, product_task('variants', index), PENDING, image_key=asset['key'])
+            invoke_variants(campaign_id, product['name'], index, asset['key'], brief, 'existing', source_hash, tier, workflow_id)
             return
+        logger.info(f"No existing asset found under: {existing_assets}")
     
     logger.info(f"Generating new image for: {product['name']}")
-    invoke_generator(campaign_id, product, index, brief)
-
-
-def object_exists(bucket: str, key: str) -> bool:
-    """Check if S3 object exists"""
-    try:
-        s3.head_object(Bucket=bucket, Key=key)
-        return True
-    except:
-        return False
+    if workflow:
+        workflow.set_task_state(workflow_id, product_task('generate', index), PENDING)
+    invoke_generator(campaign_id, product, index, brief, tier, workflow_id)
 
 
 def invoke_generator(
     campaign_id: str,
     product: Dict[str, Any],
     index: int,
-    brief: Dict[str, Any]
+    brief: Dict[str, Any],
+    tier: str = FINAL,
+    workflow_id: str = None
 ):
-    """Invoke AI image generator Lambda"""
+    """Enqueue (or directly invoke) AI image generation for a product"""
     payload = {
         'campaign_id': campaign_id,
         'product_name': product['name'],
@@ -206,8 +322,22 @@ def invoke_generator(
         'campaign_message': brief['campaign_message'],
         'target_audience': brief['target_audience'],
         'target_region': brief['target_regions'][0] if brief.get('target_regions') else 'US',
-        'brand_colors': brief.get('brand_colors', ['#000000'])
+        'brand_colors': brief.get('brand_colors', ['#000000']),
+        'tier': tier,
+        'workflow_id': workflow_id or campaign_id
     }
+    # Compiled with the campaign's shared sections, which are rendered once per brief
+    payload['prompt'] = build_prompt(
+        payload['product_name'],
+        payload['product_description'],
+        payload['campaign_message'],
+        payload['target_audience'],
+        payload['target_region']
+    )
+    
+    if scheduler:
+        scheduler.submit(payload, priority_class(brief), tenant_id(brief, campaign_id))
+        return
     
     lambda_client.invoke(
         FunctionName=GENERATOR_FUNCTION,
@@ -222,9 +352,12 @@ def invoke_variants(
     index: int,
     image_key: str,
     brief: Dict[str, Any],
-    source: str
+    source: str,
+    source_hash: str = None,
+    tier: str = FINAL,
+    workflow_id: str = None
 ):
-    """Invoke variants generator Lambda"""
+    """Queue (or directly invoke) variant generation for a product"""
     payload = {
         'campaign_id': campaign_id,
         'product_name': product_name,
@@ -232,8 +365,16 @@ def invoke_variants(
         'image_key': image_key,
         'image_source': source,
         'campaign_message': brief['campaign_message'],
-        'brand_colors': brief.get('brand_colors', ['#000000', '#FFFFFF'])
+        'brand_colors': brief.get('brand_colors', ['#000000', '#FFFFFF']),
+        'tier': tier,
+        'workflow_id': workflow_id or campaign_id
     }
+    if source_hash:
+        payload['source_hash'] = source_hash
+    
+    if VARIANTS_QUEUE_URL:
+        sqs.send_message(QueueUrl=VARIANTS_QUEUE_URL, MessageBody=json.dumps(payload))
+        return
     
     lambda_client.invoke(
         FunctionName=VARIANTS_FUNCTION,
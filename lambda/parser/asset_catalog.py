@@ -0,0 +1,169 @@
+"""
+Existing Asset Catalog
+
+Index of existing-assets/ (format, dimensions and content hash of every
+image), rebuilt periodically and loaded once per parser invocation so that
+products resolve their existing asset with a dictionary lookup instead of
+a HEAD request each.
+"""
+
+import json
+import logging
+from io import BytesIO
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from PIL import Image
+from botocore.exceptions import ClientError
+
+from shared.content_hash import source_identity
+
+logger = logging.getLogger()
+
+ASSET_PREFIX = 'existing-assets/'
+CATALOG_KEY = 'indexes/asset-catalog.json'
+
+SUPPORTED_EXTENSIONS = {
+    '.png': 'PNG',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.webp': 'WEBP'
+}
+
+# Image headers (and therefore dimensions) fit in the first bytes of the file
+HEADER_BYTES = 64 * 1024
+
+
+def asset_directory(key: str) -> str:
+    """Directory of an asset key relative to existing-assets/ (with trailing slash)"""
+    relative = key[len(ASSET_PREFIX):]
+    return relative.rsplit('/', 1)[0] + '/' if '/' in relative else ''
+
+
+def asset_format(key: str) -> Optional[str]:
+    """Image format implied by the key's extension (None if unsupported)"""
+    extension = '.' + key.rsplit('.', 1)[-1].lower() if '.' in key else ''
+    return SUPPORTED_EXTENSIONS.get(extension)
+
+
+def normalize_prefix(prefix: str) -> str:
+    """Normalize a brief's existing_assets value to a catalog directory"""
+    prefix = prefix.strip().lstrip('/')
+    if prefix.startswith(ASSET_PREFIX):
+        prefix = prefix[len(ASSET_PREFIX):]
+    return prefix if not prefix or prefix.endswith('/') else prefix + '/'
+
+
+def probe_dimensions(s3, bucket: str, key: str) -> Tuple[Optional[int], Optional[int]]:
+    """Read image dimensions from the file header (ranged GET, full GET as fallback)"""
+    response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{HEADER_BYTES - 1}")
+    try:
+        with Image.open(BytesIO(response['Body'].read())) as image:
+            return image.size
+    except Exception:
+        pass
+    
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+        with Image.open(BytesIO(response['Body'].read())) as image:
+            return image.size
+    except Exception as e:
+        logger.warning(f"Could not read dimensions of {key}: {e}")
+        return None, None
+
+
+def select_best(assets: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Pick the highest-resolution asset (file size breaks ties and covers unknown dimensions)"""
+    if not assets:
+        return None
+    return max(assets, key=lambda a: ((a.get('width') or 0) * (a.get('height') or 0), a.get('size', 0)))
+
+
+def asset_fingerprint(asset: Dict[str, Any]) -> Optional[str]:
+    """Render cache identity of an asset: its exact content (ETag)"""
+    return source_identity(etag=asset['etag']) if asset.get('etag') else None
+
+
+class AssetCatalog:
+    """In-memory view of the asset catalog"""
+    
+    def __init__(self, s3, bucket: str, data: Optional[Dict[str, Any]] = None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.data = data or {'built_at': None, 'assets': {}}
+    
+    @classmethod
+    def load(cls, s3, bucket: str) -> 'AssetCatalog':
+        """Load the catalog from S3 (empty catalog if it has not been built yet)"""
+        try:
+            response = s3.get_object(Bucket=bucket, Key=CATALOG_KEY)
+            return cls(s3, bucket, json.loads(response['Body'].read()))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'NoSuchKey':
+                raise
+            logger.warning(f"Asset catalog not found: s3://{bucket}/{CATALOG_KEY}")
+            return cls(s3, bucket)
+    
+    def assets(self, prefix: str) -> List[Dict[str, Any]]:
+        """All catalogued assets in a directory"""
+        return self.data['assets'].get(normalize_prefix(prefix), [])
+    
+    def best_asset(self, prefix: str) -> Optional[Dict[str, Any]]:
+        """Best asset for a product's existing_assets prefix, or None if there is none"""
+        directory = normalize_prefix(prefix)
+        best = select_best(self.assets(directory))
+        if best:
+            return best
+        
+        # Assets uploaded since the last rebuild: one LIST instead of per-filename HEADs
+        listed = []
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{ASSET_PREFIX}{directory}", Delimiter='/'):
+            for obj in page.get('Contents', []):
+                fmt = asset_format(obj['Key'])
+                if fmt:
+                    listed.append({'key': obj['Key'], 'format': fmt, 'size': obj['Size'], 'etag': obj['ETag'].strip('"')})
+        
+        if listed:
+            self.data['assets'][directory] = listed
+        return select_best(listed)
+
+
+def rebuild_catalog(s3, bucket: str) -> Dict[str, Any]:
+    """Rebuild the catalog from a listing of existing-assets/, re-probing only changed objects"""
+    previous = AssetCatalog.load(s3, bucket).data
+    known = {a['key']: a for assets in previous['assets'].values() for a in assets}
+    
+    catalog: Dict[str, Any] = {
+        'built_at': datetime.now(timezone.utc).isoformat(),
+        'assets': {}
+    }
+    probed = 0
+    
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=ASSET_PREFIX):
+        for obj in page.get('Contents', []):
+            fmt = asset_format(obj['Key'])
+            if not fmt:
+                continue
+            
+            etag = obj['ETag'].strip('"')
+            entry = known.get(obj['Key'])
+            if not entry or entry.get('etag') != etag or entry.get('width') is None:
+                width, height = probe_dimensions(s3, bucket, obj['Key'])
+                entry = {'key': obj['Key'], 'format': fmt, 'width': width, 'height': height}
+                probed += 1
+            
+            entry.update({'size': obj['Size'], 'etag': etag})
+            catalog['assets'].setdefault(asset_directory(obj['Key']), []).append(entry)
+    
+    s3.put_object(
+        Bucket=bucket,
+        Key=CATALOG_KEY,
+        Body=json.dumps(catalog),
+        ContentType='application/json'
+    )
+    
+    total = sum(len(a) for a in catalog['assets'].values())
+    logger.info(f"Rebuilt asset catalog: {total} assets ({probed} probed)")
+    return catalog
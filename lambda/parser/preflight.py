@@ -0,0 +1,199 @@
+"""
+Campaign Pre-flight
+
+Estimates a brief before it is launched, for the dashboard and for
+schedulers planning large campaigns: which products reuse an existing
+asset (resolved through the asset catalog, each directory once however many
+products share it), how many of those products' variants are already in
+the render cache, how much generation work is queued ahead in the brief's
+priority class, and from these the Bedrock calls, cost and expected
+completion time. Stage durations are percentiles of the latencies recorded
+in the analytics export over the last PREFLIGHT_HISTORY_DAYS days, cached
+for LATENCY_TTL seconds, with defaults until there is history.
+"""
+
+import json
+import math
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+import pyarrow.compute as pc
+
+from shared.costs import GENERATION_CENTS, PREVIEW_GENERATION_CENTS, VARIANTS_CENTS
+from shared.render_cache import RenderCache, variant_cache_key
+from shared.tiers import FINAL, PREVIEW, tier_variants
+from asset_catalog import AssetCatalog, asset_fingerprint, normalize_prefix
+from analytics import read_recent
+from scheduler import GenerationScheduler, priority_class
+
+logger = logging.getLogger()
+
+PREFLIGHT_HISTORY_DAYS = int(os.environ.get('PREFLIGHT_HISTORY_DAYS', '7'))
+LATENCY_TTL = 300
+
+# Stage durations (seconds) assumed until the analytics export has recorded some
+DEFAULT_LATENCIES = {
+    'generate_p50': 20.0,
+    'generate_p95': 60.0,
+    'variants_p50': 8.0,
+    'variants_p95': 20.0,
+    'throttles_mean': 0.0
+}
+
+# Matches the generator's spacing of directly invoked products (no generation queues)
+DIRECT_STAGGER_SECONDS = 3.0
+
+# Concurrent catalog listings and render cache reads
+MAX_WORKERS = 16
+
+_latencies: Dict[str, Any] = {}
+
+
+def stage_latencies(s3, bucket: str, tier: str) -> Dict[str, float]:
+    """Median and 95th percentile generation and variants durations, and mean throttles, for a tier"""
+    cached = _latencies.get(tier)
+    if cached and time.monotonic() - cached['loaded_at'] < LATENCY_TTL:
+        return cached['latencies']
+    
+    latencies = dict(DEFAULT_LATENCIES, samples=0)
+    try:
+        table = read_recent(s3, bucket, PREFLIGHT_HISTORY_DAYS, ['tier', 'generate_seconds', 'variants_seconds', 'throttles'])
+        table = table.filter(pc.equal(table['tier'], tier))
+        latencies['samples'] = table.num_rows
+        for stage in ('generate', 'variants'):
+            column = table[f"{stage}_seconds"]
+            if column.null_count < len(column):
+                latencies[f"{stage}_p50"], latencies[f"{stage}_p95"] = pc.quantile(column, q=[0.5, 0.95]).to_pylist()
+        if table['throttles'].null_count < table.num_rows:
+            latencies['throttles_mean'] = pc.mean(table['throttles']).as_py()
+    except Exception as e:
+        logger.warning(f"Stage latency history unavailable, using defaults: {str(e)}")
+    
+    _latencies[tier] = {'loaded_at': time.monotonic(), 'latencies': latencies}
+    return latencies
+
+
+def resolve_assets(catalog: AssetCatalog, products: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Best asset of every distinct existing_assets directory in the brief, resolved concurrently"""
+    directories = sorted({normalize_prefix(p['existing_assets']) for p in products if p.get('existing_assets')})
+    if not directories:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(directories))) as pool:
+        return dict(zip(directories, pool.map(catalog.best_asset, directories)))
+
+
+def cached_variants(s3, bucket: str, fingerprints: List[str], brief: Dict[str, Any], tier: str) -> Dict[str, int]:
+    """Variants of each source fingerprint already in the render cache for this brief's message and colours"""
+    # Same defaults the parser sends to the variants stage
+    message = brief['campaign_message']
+    colors = brief.get('brand_colors', ['#000000', '#FFFFFF'])
+    keys = [variant_cache_key(name, size, message, colors) for name, size in tier_variants(tier).items()]
+    
+    def hits(fingerprint: str) -> int:
+        entries = RenderCache(s3, bucket, fingerprint).entries
+        return sum(1 for key in keys if key in entries)
+    
+    if not fingerprints:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(fingerprints))) as pool:
+        return dict(zip(fingerprints, pool.map(hits, fingerprints)))
+
+
+def queue_depth(sqs, queue_url: str) -> int:
+    """Generation jobs waiting or in flight on a queue"""
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
+    )['Attributes']
+    return int(attributes['ApproximateNumberOfMessages']) + int(attributes['ApproximateNumberOfMessagesNotVisible'])
+
+
+def class_slots(priority: str) -> Optional[int]:
+    """Configured generation concurrency of a priority class (None if unknown)"""
+    ceilings = json.loads(os.environ.get('GENERATION_PRIORITY_CLASSES') or '{}')
+    return ceilings.get(priority) or ceilings.get('standard')
+
+
+def preflight(s3, sqs, bucket: str, brief: Dict[str, Any], scheduler: Optional[GenerationScheduler]) -> Dict[str, Any]:
+    """Estimate of a (validated) brief's Bedrock calls, cost and completion time"""
+    tier = brief.get('tier', FINAL)
+    products = brief['products']
+    
+    # Existing assets and their render cache hits
+    catalog = AssetCatalog.load(s3, bucket)
+    assets = resolve_assets(catalog, products)
+    reused = {}
+    missing = []
+    for index, product in enumerate(products):
+        if product.get('existing_assets'):
+            asset = assets.get(normalize_prefix(product['existing_assets']))
+            if asset:
+                reused[index] = asset_fingerprint(asset)
+            else:
+                missing.append(product['name'])
+    hits = cached_variants(s3, bucket, sorted({f for f in reused.values() if f}), brief, tier)
+    cached = sum(hits.get(fingerprint, 0) for fingerprint in reused.values() if fingerprint)
+    
+    generated = len(products) - len(reused)
+    latencies = stage_latencies(s3, bucket, tier)
+    
+    # Throttled attempts are Bedrock calls too
+    bedrock_calls = math.ceil(generated * (1 + latencies['throttles_mean']))
+    generation_cents = PREVIEW_GENERATION_CENTS if tier == PREVIEW else GENERATION_CENTS
+    cents = generation_cents * generated + VARIANTS_CENTS * len(products)
+    
+    # Generation runs in waves of the class's concurrency, behind the jobs already queued in it
+    priority = priority_class(brief)
+    depth = 0
+    slots = None
+    if scheduler:
+        depth = queue_depth(sqs, scheduler.queue_url(priority))
+        slots = class_slots(priority)
+    
+    def duration(quantile: str) -> float:
+        generate = latencies[f"generate_{quantile}"]
+        variants = latencies[f"variants_{quantile}"]
+        if not generated:
+            return variants
+        if slots:
+            return (math.ceil(depth / slots) + math.ceil(generated / slots)) * generate + variants
+        # Direct invocations all start at once, spaced out by the generator's stagger
+        return DIRECT_STAGGER_SECONDS * (generated - 1) + generate + variants
+    
+    now = datetime.now(timezone.utc)
+    expected, worst = duration('p50'), duration('p95')
+    return {
+        'products': len(products),
+        'tier': tier,
+        'priority': priority,
+        'existing_assets': {
+            'requested': len(reused) + len(missing),
+            'available': len(reused),
+            'missing': missing
+        },
+        'render_cache': {
+            'variants': len(tier_variants(tier)) * len(reused),
+            'cached': cached
+        },
+        'generation': {
+            'products': generated,
+            'bedrock_calls': bedrock_calls,
+            'queue_depth': depth,
+            'concurrency': slots
+        },
+        'cost': {
+            'cents': float(cents),
+            'dollars': float(cents / 100)
+        },
+        'duration': {
+            'expected_seconds': round(expected, 1),
+            'p95_seconds': round(worst, 1),
+            'expected_completion': (now + timedelta(seconds=expected)).isoformat(),
+            'p95_completion': (now + timedelta(seconds=worst)).isoformat(),
+            'latency_samples': latencies['samples']
+        }
+    }
@@ -0,0 +1,74 @@
+"""
+Generation Scheduler
+
+Routes per-product generation work onto one queue per priority class, each
+consumed with its own concurrency share, so a large campaign cannot occupy
+the generator capacity reserved for small or urgent ones. Within a class,
+messages carry the tenant as their message group, letting SQS fair queues
+keep one tenant's backlog from delaying the others.
+"""
+
+import json
+import os
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger()
+
+PRIORITY_CLASSES = ('urgent', 'standard', 'bulk')
+DEFAULT_CLASS = 'standard'
+
+# Campaigns with more products than this are scheduled as bulk unless they ask for urgent
+BULK_PRODUCT_THRESHOLD = int(os.environ.get('BULK_PRODUCT_THRESHOLD', '20'))
+
+
+def priority_class(brief: Dict[str, Any]) -> str:
+    """Priority class of a brief: explicit urgent wins, large campaigns are demoted to bulk"""
+    requested = brief.get('priority', DEFAULT_CLASS)
+    if requested == 'urgent':
+        return 'urgent'
+    if requested == 'bulk' or len(brief['products']) > BULK_PRODUCT_THRESHOLD:
+        return 'bulk'
+    return DEFAULT_CLASS
+
+
+def tenant_id(brief: Dict[str, Any], campaign_id: str) -> str:
+    """Fairness key: the brief's tenant, or the campaign itself when none is given"""
+    return brief.get('tenant') or campaign_id
+
+
+class GenerationScheduler:
+    """Submits generation jobs to the queue of their priority class"""
+
+    def __init__(self, sqs, queue_urls: Dict[str, str]):
+        self.sqs = sqs
+        self.queue_urls = queue_urls
+
+    def queue_url(self, priority: str) -> str:
+        """Queue of a class (classes without their own queue share the standard one)"""
+        return self.queue_urls.get(priority) or self.queue_urls[DEFAULT_CLASS]
+
+    def submit(self, payload: Dict[str, Any], priority: str, tenant: str):
+        """Enqueue one product's generation job"""
+        self.sqs.send_message(
+            QueueUrl=self.queue_url(priority),
+            MessageBody=json.dumps(payload),
+            # Message group on a standard queue enables SQS fair queuing per tenant
+            MessageGroupId=tenant[:128],
+            MessageAttributes={
+                'campaign_id': {'DataType': 'String', 'StringValue': payload['campaign_id']},
+                'product_index': {'DataType': 'Number', 'StringValue': str(payload['product_index'])},
+                'priority': {'DataType': 'String', 'StringValue': priority}
+            }
+        )
+        logger.info(f"Scheduled generation: {payload['product_name']} (index: {payload['product_index']}, {priority}, tenant: {tenant})")
+
+    @staticmethod
+    def from_environment(sqs) -> Optional['GenerationScheduler']:
+        """Scheduler over GENERATION_QUEUE_URLS (JSON map of class -> queue URL), None if unset"""
+        queue_urls = json.loads(os.environ.get('GENERATION_QUEUE_URLS') or '{}')
+        if not queue_urls:
+            return None
+        if DEFAULT_CLASS not in queue_urls:
+            raise ValueError(f"GENERATION_QUEUE_URLS must define a '{DEFAULT_CLASS}' queue")
+        return GenerationScheduler(sqs, queue_urls)
@@ -0,0 +1,51 @@
+"""
+Parser Queue Worker
+
+Runs the parser as a long-lived process on a container host, consuming
+brief notifications from CAMPAIGN_QUEUE_URL one message at a time (the
+batch size of the Lambda's event source mapping). Scheduled actions
+(catalog rebuild, analytics compaction) stay on the Lambda.
+
+    python worker.py
+"""
+
+import os
+import logging
+
+import boto3
+
+from shared.queue_worker import QueuePoller, RECEIVE_ERROR_DELAY, configure_logging, stop_on_signals, succeeded
+
+logger = logging.getLogger()
+
+
+def main():
+    configure_logging()
+    import app  # After logging is configured: importing creates the warm clients and stores
+    
+    poller = QueuePoller(boto3.client('sqs'), os.environ['CAMPAIGN_QUEUE_URL'])
+    stopping = stop_on_signals()
+    logger.info(f"Parser worker consuming {poller.queue_url}")
+    
+    while not stopping.is_set():
+        try:
+            records = poller.receive(1)
+        except Exception as e:
+            logger.error(f"Failed to receive from {poller.queue_url}: {str(e)}")
+            stopping.wait(RECEIVE_ERROR_DELAY)
+            continue
+        if not records:
+            continue
+        
+        try:
+            response = app.handler({'Records': records}, None)
+        except Exception as e:
+            logger.error(f"Parser failed: {str(e)}", exc_info=True)
+            continue
+        poller.delete(succeeded(records, response))
+    
+    logger.info("Parser worker stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""
+Shared Lambda Modules
+
+Code used by more than one pipeline stage. Copied into every Lambda image
+alongside the stage's app.py.
+"""
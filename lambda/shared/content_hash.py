@@ -0,0 +1,31 @@
+"""
+Source Content Identity
+
+Exact identity of a stored source image, known without downloading or
+decoding it: the SHA-256 of its bytes, which the generator stores in the
+object metadata, or the S3 ETag of objects uploaded without one (existing
+assets). Used as the render cache key of a source.
+"""
+
+import hashlib
+from typing import Optional
+
+# Object metadata field holding the SHA-256 of a stored source's bytes
+CONTENT_HASH_METADATA = 'content-sha256'
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def source_identity(sha256: Optional[str] = None, etag: Optional[str] = None) -> str:
+    """Identity of a source from its content hash, or its ETag when it has none"""
+    if sha256:
+        return f"sha256-{sha256}"
+    return 'etag-' + etag.strip('"')
+
+
+def object_identity(s3, bucket: str, key: str) -> str:
+    """Identity of a stored source, from a HEAD request"""
+    response = s3.head_object(Bucket=bucket, Key=key)
+    return source_identity(response.get('Metadata', {}).get(CONTENT_HASH_METADATA), response['ETag'])
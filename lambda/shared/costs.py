@@ -0,0 +1,221 @@
+"""
+Cost Ledger
+
+Append-only record of what each campaign spends. Every charge (a Bedrock
+generation, a product's variant processing) is written once as its own
+immutable object, so concurrent stages never read-modify-write a shared
+total. Amounts are Decimal cents and are part of the object key, so totals
+are aggregated from listings alone: per campaign under
+ledger/campaigns/<campaign_id>/ and per day under ledger/days/<date>/.
+
+Finished days are rolled up (ledger/rollups/days/<date>.json) with the day's
+totals and the running totals through that day, so overall spend is one
+rollup plus the listings of the days since, not a listing of every entry.
+"""
+
+import re
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Any, Iterable, Optional, Union
+
+logger = logging.getLogger()
+
+LEDGER_PREFIX = 'ledger/'
+CAMPAIGNS_PREFIX = f"{LEDGER_PREFIX}campaigns/"
+DAYS_PREFIX = f"{LEDGER_PREFIX}days/"
+ROLLUPS_PREFIX = f"{LEDGER_PREFIX}rollups/days/"
+
+# A day is rolled up this long after it ends, once no in-flight charge can still land on it (seconds)
+ROLLUP_DELAY = 3600
+
+# Amounts are kept to a hundredth of a cent
+CENT_PRECISION = Decimal('0.01')
+
+# Charges (cents)
+# Amazon Titan Image Generator v1: $0.04 per premium 1024x1024 image, $0.008 per standard 512x512 image
+# Reference: https://umbrellacost.com/blog/aws-bedrock-pricing/
+GENERATION_CENTS = Decimal('4')
+PREVIEW_GENERATION_CENTS = Decimal('0.8')
+# Variant processing (Lambda compute and S3 requests for one product's variants)
+VARIANTS_CENTS = Decimal('1')
+
+_ENTRY = re.compile(r'(?P<stage>[a-z]+)-(?P<index>\d+)-(?P<cents>\d+(?:\.\d+)?)c-(?P<entry_id>[0-9a-f]+)\.json$')
+
+
+def to_cents(dollars: Union[str, float, Decimal]) -> Decimal:
+    """Dollar amount as Decimal cents"""
+    return (Decimal(str(dollars)) * 100).quantize(CENT_PRECISION)
+
+
+def format_cents(cents: Decimal) -> str:
+    """Shortest exact decimal form of an amount (4, 0.8, 12.5)"""
+    return format(cents.quantize(CENT_PRECISION).normalize(), 'f')
+
+
+def parse_entry(key: str) -> Optional[Dict[str, Any]]:
+    """Campaign, stage, product index and amount of a ledger entry key (None for other keys)"""
+    parent, _, name = key.rpartition('/')
+    match = _ENTRY.match(name)
+    if not match:
+        return None
+    return {
+        'campaign_id': parent.rsplit('/', 1)[-1],
+        'stage': match['stage'],
+        'product_index': int(match['index']),
+        'cents': Decimal(match['cents'])
+    }
+
+
+def aggregate(keys: Iterable[str]) -> Dict[str, Any]:
+    """Totals of the ledger entries among keys, overall and by campaign, stage and product"""
+    total = Decimal(0)
+    by_campaign: Dict[str, Decimal] = {}
+    by_stage: Dict[str, Decimal] = {}
+    by_product: Dict[int, Decimal] = {}
+    entries = 0
+
+    for key in keys:
+        entry = parse_entry(key)
+        if entry is None:
+            continue
+        cents = entry['cents']
+        total += cents
+        by_campaign[entry['campaign_id']] = by_campaign.get(entry['campaign_id'], Decimal(0)) + cents
+        by_stage[entry['stage']] = by_stage.get(entry['stage'], Decimal(0)) + cents
+        by_product[entry['product_index']] = by_product.get(entry['product_index'], Decimal(0)) + cents
+        entries += 1
+
+    return {
+        'total_cents': total,
+        'by_campaign': by_campaign,
+        'by_stage': by_stage,
+        'by_product': by_product,
+        'entries': entries
+    }
+
+
+def combine(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum of two aggregates' overall and per-stage totals"""
+    by_stage = dict(first['by_stage'])
+    for stage, cents in second['by_stage'].items():
+        by_stage[stage] = by_stage.get(stage, Decimal(0)) + cents
+    return {
+        'total_cents': first['total_cents'] + second['total_cents'],
+        'by_stage': by_stage,
+        'entries': first['entries'] + second['entries']
+    }
+
+
+def encode_totals(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'total_cents': format_cents(totals['total_cents']),
+        'by_stage': {stage: format_cents(cents) for stage, cents in totals['by_stage'].items()},
+        'entries': totals['entries']
+    }
+
+
+def decode_totals(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'total_cents': Decimal(data['total_cents']),
+        'by_stage': {stage: Decimal(cents) for stage, cents in data['by_stage'].items()},
+        'entries': data['entries']
+    }
+
+
+EMPTY_TOTALS = {'total_cents': Decimal(0), 'by_stage': {}, 'entries': 0}
+
+
+class CostLedger:
+    """Appends and aggregates cost entries in the campaign bucket"""
+
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def record(self, campaign_id: str, stage: str, product_index: int, cents: Decimal, **details: Any) -> Optional[str]:
+        """Append one charge, returning its key. Never raises: a lost entry is logged, not retried."""
+        now = datetime.now(timezone.utc)
+        amount = format_cents(cents)
+        name = f"{stage}-{product_index}-{amount}c-{uuid.uuid4().hex[:16]}.json"
+        key = f"{CAMPAIGNS_PREFIX}{campaign_id}/{name}"
+
+        entry = {
+            'campaign_id': campaign_id,
+            'stage': stage,
+            'product_index': product_index,
+            'amount_cents': amount,
+            'recorded_at': now.isoformat(),
+            **details
+        }
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=json.dumps(entry), ContentType='application/json')
+
+            # Day index: an empty marker under the same name, so a day's spend is one listing away
+            self.s3.put_object(Bucket=self.bucket, Key=f"{DAYS_PREFIX}{now.strftime('%Y-%m-%d')}/{campaign_id}/{name}", Body=b'')
+        except Exception as e:
+            logger.error(f"Failed to record {amount}c for {stage} of product {product_index} (campaign: {campaign_id}): {str(e)}")
+            return None
+
+        logger.info(f"Recorded {amount}c for {stage} of product {product_index} (campaign: {campaign_id})")
+        return key
+
+    def campaign_costs(self, campaign_id: str) -> Dict[str, Any]:
+        return aggregate(self._keys(f"{CAMPAIGNS_PREFIX}{campaign_id}/"))
+
+    def daily_costs(self, day: str) -> Dict[str, Any]:
+        """Spend on one day (YYYY-MM-DD), across all campaigns"""
+        return aggregate(self._keys(f"{DAYS_PREFIX}{day}/"))
+
+    def total_costs(self) -> Dict[str, Any]:
+        """Spend across every campaign: the latest rollup's running totals plus the days after it"""
+        rollup = self.latest_rollup()
+        totals = decode_totals(rollup['cumulative']) if rollup else dict(EMPTY_TOTALS)
+        for day in self._days():
+            if rollup is None or day > rollup['day']:
+                totals = combine(totals, self.daily_costs(day))
+        return totals
+
+    def roll_up(self, now: Optional[datetime] = None) -> int:
+        """Roll up every finished day after the latest rollup, in order; returns the number of days written"""
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(seconds=ROLLUP_DELAY)).strftime('%Y-%m-%d')
+        rollup = self.latest_rollup()
+        cumulative = decode_totals(rollup['cumulative']) if rollup else dict(EMPTY_TOTALS)
+
+        written = 0
+        for day in self._days():
+            if day >= cutoff or (rollup and day <= rollup['day']):
+                continue
+            totals = self.daily_costs(day)
+            cumulative = combine(cumulative, totals)
+            document = {'day': day, 'totals': encode_totals(totals), 'cumulative': encode_totals(cumulative)}
+            self.s3.put_object(Bucket=self.bucket, Key=f"{ROLLUPS_PREFIX}{day}.json", Body=json.dumps(document), ContentType='application/json')
+            written += 1
+
+        if written:
+            logger.info(f"Rolled up {written} days of ledger entries")
+        return written
+
+    def latest_rollup(self) -> Optional[Dict[str, Any]]:
+        keys = sorted(self._keys(ROLLUPS_PREFIX))
+        if not keys:
+            return None
+        return json.loads(self.s3.get_object(Bucket=self.bucket, Key=keys[-1])['Body'].read())
+
+    def _days(self):
+        """Days with ledger entries, in order (one listing entry per day)"""
+        days = []
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=DAYS_PREFIX, Delimiter='/'):
+            for prefix in page.get('CommonPrefixes', []):
+                days.append(prefix['Prefix'][len(DAYS_PREFIX):].rstrip('/'))
+        return sorted(days)
+
+    def _keys(self, prefix: str):
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key']
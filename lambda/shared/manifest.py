@@ -0,0 +1,515 @@
+"""
+Campaign Manifests
+
+Compact manifest storage with an append-only delta log. The full manifest
+(output/<campaign>/manifest.json) is written without indentation, and
+gzip-compressed when MANIFEST_GZIP is set. Stage updates do not rewrite
+it: each is a small patch of one product or of the campaign fields,
+appended under output/<campaign>/manifest-log/ and applied in sequence
+order on read. The log is folded into the full manifest when a campaign
+(or a promotion round) completes.
+
+Log entries are numbered by a per-campaign counter (an atomic increment in
+the workflow table, WORKFLOW_TABLE), not by the writers' clocks, so a stage
+always sorts after the stage that triggered it. Without a workflow table
+the next number is the one after the highest already used (listed or
+folded). Either way an entry is written only if its key is still free
+(If-None-Match), and a writer that loses the key takes the next number,
+so no update ever overwrites another. The full manifest records which
+sequence numbers it has folded: entries that land after a compaction
+with a lower number than ones already folded are still applied, and folded
+entries a reader lists before they are deleted are never applied twice.
+
+Every full write also touches an empty marker under
+manifests/by-date/<campaign date>/<campaign>, so jobs that need the
+campaigns of a date, or those rewritten since a point in time, list one
+small key per campaign instead of every output object.
+
+Rewrites of the full manifest are compare-and-swap: the document is
+written with If-Match on the ETag it was read at, and a conflicting
+writer re-reads and retries with jittered backoff. LocalObjects is a
+directory-backed stand-in for the S3 calls used here (MANIFEST_STORE_DIR)
+that enforces the same conditional-write semantics.
+"""
+
+import os
+import gzip
+import json
+import time
+import uuid
+import fcntl
+import random
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+MANIFEST_GZIP = os.environ.get('MANIFEST_GZIP', '').lower() in ('1', 'true', 'yes')
+
+# Concurrent delta downloads when reading a manifest
+MAX_LOG_WORKERS = 16
+
+# S3 DeleteObjects accepts at most this many keys per request
+DELETE_BATCH = 1000
+
+# Compare-and-swap retries: attempts, and the backoff cap doubling from the base (seconds)
+MAX_CAS_ATTEMPTS = 8
+CAS_BASE_DELAY = 0.05
+CAS_MAX_DELAY = 2.0
+
+# S3 answers a failed If-Match with 412, and a concurrent conditional write with 409
+CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+# Log entry keys are the zero-padded sequence number
+SEQUENCE_DIGITS = 12
+
+# Manifest field recording the folded log: the highest sequence number and any lower ones not yet seen
+LOG_FIELD = 'manifest_log'
+
+# A number skipped by a compaction is waited for this long, then given up (seconds): an entry
+# is written right after its number is taken, and no writer outlives the Lambda timeout
+UNFOLDED_TTL = 900
+
+# Date index of campaigns: an empty marker per campaign, rewritten with its full manifest
+INDEX_PREFIX = 'manifests/by-date/'
+
+# Workflow table item holding a campaign's log counter, expiring with the campaign's other records (seconds)
+SEQUENCE_ITEM = '#manifest-log'
+SEQUENCE_TTL = 90 * 24 * 3600
+
+
+def manifest_key(campaign_id: str) -> str:
+    return f"output/{campaign_id}/manifest.json"
+
+
+def campaign_date(campaign_id: str) -> Optional[str]:
+    """Date of a campaign from its -YYYYmmdd-HHMMSS suffix (None if it has none)"""
+    try:
+        return datetime.strptime(campaign_id[-15:], '%Y%m%d-%H%M%S').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def index_key(campaign_id: str) -> Optional[str]:
+    """Date index marker of a campaign (None for ids without a date)"""
+    date = campaign_date(campaign_id)
+    return f"{INDEX_PREFIX}{date}/{campaign_id}" if date else None
+
+
+def log_prefix(campaign_id: str) -> str:
+    return f"output/{campaign_id}/manifest-log/"
+
+
+def log_key(campaign_id: str, sequence: int) -> str:
+    return f"{log_prefix(campaign_id)}{sequence:0{SEQUENCE_DIGITS}d}.json"
+
+
+def log_sequence(key: str) -> Optional[int]:
+    """Sequence number of a log entry key (None for other keys)"""
+    stem = key.rsplit('/', 1)[-1].split('.', 1)[0]
+    return int(stem) if len(stem) == SEQUENCE_DIGITS and stem.isdigit() else None
+
+
+def encode(document: Dict[str, Any], compress: bool = False) -> bytes:
+    """Compact JSON, optionally gzip-compressed"""
+    body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(body) if compress else body
+
+
+def decode(body: bytes) -> Dict[str, Any]:
+    """Parse a manifest or delta, compressed or not"""
+    if body[:2] == _GZIP_MAGIC:
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def merge(target: Dict[str, Any], patch: Dict[str, Any]):
+    """Deep-merge patch into target: nested objects merge, everything else replaces"""
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def find_product(manifest: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+    for product in manifest.get('products', []):
+        if product.get('index', product.get('product_index')) == index:
+            return product
+    return None
+
+
+def apply_delta(manifest: Dict[str, Any], delta: Dict[str, Any]):
+    """Apply one log entry: a patch of a product (created if missing) or of the campaign"""
+    if 'product' in delta:
+        product = find_product(manifest, delta['product'])
+        if product is None:
+            product = {'product_index': delta['product']}
+            manifest.setdefault('products', []).append(product)
+        merge(product, delta['set'])
+    else:
+        merge(manifest, delta['set'])
+
+
+def is_product_done(product: Dict[str, Any]) -> bool:
+    """Whether a product has its variants; a promoted product only once its final-round variants are in"""
+    return 'variants' in product and product.get('awaiting_tier') in (None, product.get('tier'))
+
+
+def all_products_done(manifest: Dict[str, Any]) -> bool:
+    """Whether every expected product has its variants (at the tier a promotion is waiting for, if any)"""
+    products_with_variants = sum(1 for p in manifest.get('products', []) if is_product_done(p))
+    return products_with_variants >= manifest.get('expected_products', len(manifest.get('products', [])))
+
+
+def is_folded(manifest: Dict[str, Any], sequence: int) -> bool:
+    """Whether a log entry is already part of the full manifest"""
+    log = manifest.get(LOG_FIELD, {})
+    return sequence <= log.get('sequence', 0) and str(sequence) not in log.get('unfolded', {})
+
+
+def mark_folded(manifest: Dict[str, Any], sequences: List[int], now: Optional[float] = None):
+    """Record log entries as folded into the manifest"""
+    now = time.time() if now is None else now
+    log = manifest.get(LOG_FIELD, {})
+    folded = set(sequences)
+    highest = log.get('sequence', 0)
+    top = max(folded | {highest})
+    # Numbers below the new high-water mark that were not folded belong to entries still being written,
+    # or to writers that failed after taking a number: those are dropped once UNFOLDED_TTL has passed
+    unfolded = {
+        number: skipped_at for number, skipped_at in log.get('unfolded', {}).items()
+        if int(number) not in folded and now - skipped_at < UNFOLDED_TTL
+    }
+    unfolded.update({str(s): now for s in range(highest + 1, top + 1) if s not in folded})
+    manifest[LOG_FIELD] = {'sequence': top, 'unfolded': unfolded}
+
+
+class DynamoLogSequence:
+    """Log counters in the workflow table: one atomic increment per entry"""
+
+    def __init__(self, table_name: str, client=None):
+        self.table = table_name
+        self.dynamodb = client or boto3.client('dynamodb')
+
+    def next(self, campaign_id: str) -> int:
+        response = self.dynamodb.update_item(
+            TableName=self.table,
+            Key={'campaign_id': {'S': campaign_id}, 'task': {'S': SEQUENCE_ITEM}},
+            UpdateExpression='ADD #sequence :one SET expires_at = :expires_at',
+            ExpressionAttributeNames={'#sequence': 'sequence'},
+            ExpressionAttributeValues={':one': {'N': '1'}, ':expires_at': {'N': str(int(time.time()) + SEQUENCE_TTL)}},
+            ReturnValues='UPDATED_NEW'
+        )
+        return int(response['Attributes']['sequence']['N'])
+
+
+class LocalLogSequence:
+    """Log counters in a directory, one locked file per campaign (development on a single host)"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def next(self, campaign_id: str) -> int:
+        with open(os.path.join(self.root, f"{campaign_id}.sequence"), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            sequence = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(sequence))
+        return sequence
+
+
+class ObjectLogSequence:
+    """Log counters read from the bucket itself: one past the highest number listed or folded (no shared counter)"""
+
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def next(self, campaign_id: str) -> int:
+        # Listed before the manifest is read: an entry deleted by a compaction in between is in the manifest's count
+        highest = 0
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=log_prefix(campaign_id)):
+            for obj in page.get('Contents', []):
+                highest = max(highest, log_sequence(obj['Key']) or 0)
+
+        try:
+            manifest = decode(self.s3.get_object(Bucket=self.bucket, Key=manifest_key(campaign_id))['Body'].read())
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            manifest = {}
+        log = manifest.get(LOG_FIELD, {})
+        return max([highest, log.get('sequence', 0)] + [int(s) for s in log.get('unfolded', {})]) + 1
+
+
+class ManifestStore:
+    """Reads and updates campaign manifests in the campaign bucket (read-only without a log sequence)"""
+
+    def __init__(self, s3, bucket: str, sequence=None, compress: bool = MANIFEST_GZIP):
+        self.s3 = s3
+        self.bucket = bucket
+        self.sequence = sequence
+        self.compress = compress
+
+    def save(self, campaign_id: str, manifest: Dict[str, Any], if_match: Optional[str] = None):
+        """Write the full manifest (only over the version with ETag if_match, when given)"""
+        extra = {'ContentEncoding': 'gzip'} if self.compress else {}
+        if if_match:
+            extra['IfMatch'] = if_match
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=manifest_key(campaign_id),
+            Body=encode(manifest, self.compress),
+            ContentType='application/json',
+            **extra
+        )
+        self._touch_index(campaign_id)
+
+    def load(self, campaign_id: str) -> Dict[str, Any]:
+        """Current manifest: the full document with the delta log applied"""
+        return self._load(campaign_id)[0]
+
+    def update_product(self, campaign_id: str, index: int, patch: Dict[str, Any]):
+        self._append(campaign_id, {'product': index, 'set': patch})
+
+    def update_campaign(self, campaign_id: str, patch: Dict[str, Any]):
+        self._append(campaign_id, {'set': patch})
+
+    def modify(self, campaign_id: str, change: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Fold the delta log and change into the full manifest with compare-and-swap, retrying on conflict"""
+        for attempt in range(MAX_CAS_ATTEMPTS):
+            manifest, etag, applied = self._load(campaign_id)
+            if change:
+                change(manifest)
+            elif not applied:
+                return manifest
+            mark_folded(manifest, [sequence for sequence, _ in applied])
+
+            try:
+                self.save(campaign_id, manifest, if_match=etag)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in CONFLICT_CODES or attempt == MAX_CAS_ATTEMPTS - 1:
+                    raise
+                # Full jitter: concurrent writers spread out instead of colliding again
+                delay = random.uniform(0, min(CAS_MAX_DELAY, CAS_BASE_DELAY * (2 ** attempt)))
+                logger.info(f"Manifest {campaign_id} changed concurrently, retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            # The saved manifest records these entries as folded, so readers that still list them skip them
+            self._delete([key for _, key in applied])
+            if applied:
+                logger.info(f"Compacted {len(applied)} manifest updates into {manifest_key(campaign_id)}")
+            return manifest
+
+    def complete_if_done(self, campaign_id: str) -> bool:
+        """
+        Mark the campaign completed once every product has its variants (used without a workflow store).
+
+        Reads first, and rewrites the manifest only once the count is reached; the compare-and-swap
+        lets exactly one of several concurrent last products complete it. True only for that caller.
+        """
+        manifest = self.load(campaign_id)
+        if manifest.get('status') == 'completed' or not all_products_done(manifest):
+            return False
+
+        completed_here = []
+
+        def complete(manifest: Dict[str, Any]):
+            completed_here.clear()
+            if manifest.get('status') != 'completed' and all_products_done(manifest):
+                manifest['status'] = 'completed'
+                manifest['completed_at'] = datetime.now(timezone.utc).isoformat()
+                completed_here.append(True)
+
+        self.modify(campaign_id, complete)
+        return bool(completed_here)
+
+    def compact(self, campaign_id: str) -> Dict[str, Any]:
+        """Fold the delta log into the full manifest and drop the folded entries"""
+        return self.modify(campaign_id)
+
+    def log_entries(self, campaign_id: str) -> List[Tuple[int, str]]:
+        """(sequence, key) of every log entry, in sequence order"""
+        entries = []
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=log_prefix(campaign_id)):
+            for obj in page.get('Contents', []):
+                sequence = log_sequence(obj['Key'])
+                if sequence is not None:
+                    entries.append((sequence, obj['Key']))
+        return sorted(entries)
+
+    def read_deltas(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Log entries, downloaded concurrently (None for any deleted by a compaction meanwhile)"""
+        if not keys:
+            return []
+        with ThreadPoolExecutor(max_workers=min(MAX_LOG_WORKERS, len(keys))) as pool:
+            return list(pool.map(self._read_delta, keys))
+
+    def _append(self, campaign_id: str, delta: Dict[str, Any]):
+        if self.sequence is None:
+            raise RuntimeError('Manifest store is read-only: no log sequence configured')
+        body = encode(delta)
+        for attempt in range(MAX_CAS_ATTEMPTS):
+            key = log_key(campaign_id, self.sequence.next(campaign_id))
+            try:
+                self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType='application/json', IfNoneMatch='*')
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] not in CONFLICT_CODES or attempt == MAX_CAS_ATTEMPTS - 1:
+                    raise
+                logger.info(f"Manifest log entry {key} already written, taking the next number")
+
+    def _load(self, campaign_id: str) -> Tuple[Dict[str, Any], str, List[Tuple[int, str]]]:
+        """Manifest with its unfolded log applied, its ETag, and the (sequence, key) of the entries applied"""
+        response = self.s3.get_object(Bucket=self.bucket, Key=manifest_key(campaign_id))
+        manifest = decode(response['Body'].read())
+
+        pending = [(sequence, key) for sequence, key in self.log_entries(campaign_id) if not is_folded(manifest, sequence)]
+        applied = []
+        for entry, delta in zip(pending, self.read_deltas([key for _, key in pending])):
+            if delta is not None:
+                apply_delta(manifest, delta)
+                applied.append(entry)
+        return manifest, response['ETag'], applied
+
+    def _read_delta(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return decode(self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read())
+        except ClientError as e:
+            # Deleted by a concurrent compaction, which folded it into the full manifest
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def _touch_index(self, campaign_id: str):
+        key = index_key(campaign_id)
+        if not key:
+            return
+        # The manifest is already written: a lost marker only delays the campaign's next analytics rebuild
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=b'')
+        except Exception as e:
+            logger.warning(f"Failed to index manifest of {campaign_id}: {str(e)}")
+
+    def _delete(self, keys: List[str]):
+        for start in range(0, len(keys), DELETE_BATCH):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + DELETE_BATCH]], 'Quiet': True}
+            )
+
+    @staticmethod
+    def from_environment(s3, bucket: str) -> 'ManifestStore':
+        """Store in the campaign bucket, or in MANIFEST_STORE_DIR (local development) when set"""
+        local_dir = os.environ.get('MANIFEST_STORE_DIR')
+        if local_dir:
+            return ManifestStore(LocalObjects(local_dir), bucket, LocalLogSequence(os.path.join(local_dir, '.sequences')))
+        if os.environ.get('WORKFLOW_TABLE'):
+            return ManifestStore(s3, bucket, DynamoLogSequence(os.environ['WORKFLOW_TABLE']))
+        # No shared counter: numbered from the bucket, so writers on different hosts never share a key
+        return ManifestStore(s3, bucket, ObjectLogSequence(s3, bucket))
+
+
+class _LocalBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class _LocalPaginator:
+    def __init__(self, objects: 'LocalObjects'):
+        self.objects = objects
+
+    def paginate(self, Bucket: str, Prefix: str = '', StartAfter: str = '', **kwargs):
+        yield {'Contents': [{'Key': key} for key in self.objects.keys(Bucket, Prefix) if key > StartAfter]}
+
+
+class LocalObjects:
+    """Directory-backed stand-in for the S3 client calls of ManifestStore, with the same conditional writes"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.staging = os.path.join(root, '.staging')
+        os.makedirs(self.staging, exist_ok=True)
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _locked(self, bucket: str):
+        # One lock per bucket: conditional writes check and replace atomically across threads and processes
+        lock = open(os.path.join(self.root, f".{bucket}.lock"), 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    @staticmethod
+    def _etag(data: bytes) -> str:
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    @staticmethod
+    def _error(code: str, operation: str) -> ClientError:
+        return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        try:
+            with open(self._path(Bucket, Key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise self._error('NoSuchKey', 'GetObject')
+        return {'Body': _LocalBody(data), 'ETag': self._etag(data)}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        data = Body.encode('utf-8') if isinstance(Body, str) else Body
+        path = self._path(Bucket, Key)
+        with self._locked(Bucket):
+            current = None
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    current = self._etag(f.read())
+            if (IfMatch and IfMatch != current) or (IfNoneMatch == '*' and current):
+                raise self._error('PreconditionFailed', 'PutObject')
+
+            # Written aside and renamed into place, so readers never see a partial object
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staging = os.path.join(self.staging, uuid.uuid4().hex)
+            with open(staging, 'wb') as f:
+                f.write(data)
+            os.replace(staging, path)
+        return {'ETag': self._etag(data)}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any]) -> Dict[str, Any]:
+        for obj in Delete['Objects']:
+            try:
+                os.remove(self._path(Bucket, obj['Key']))
+            except FileNotFoundError:
+                pass
+        return {}
+
+    def keys(self, bucket: str, prefix: str) -> List[str]:
+        base = os.path.join(self.root, bucket)
+        found = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    found.append(key)
+        return sorted(found)
+
+    def get_paginator(self, operation: str) -> _LocalPaginator:
+        return _LocalPaginator(self)
@@ -0,0 +1,129 @@
+"""
+Prompt Compiler
+
+Builds Titan text-to-image prompts within the 512 character budget. The
+campaign-level sections (message and style, in full and compact forms) are
+rendered once per campaign; each product only adds its own sections.
+Over-budget prompts are compacted deterministically, least important
+section first, and the product name is always kept. Compiled prompts are
+memoized per (product, region, audience).
+"""
+
+import re
+import functools
+import logging
+
+logger = logging.getLogger()
+
+MAX_PROMPT_LENGTH = 512
+
+BASE_STYLE = "High-end commercial advertising, studio lighting, clean white background, photorealistic, 4K quality, centered composition."
+COMPACT_STYLE = "Commercial product photo, studio lighting, white background, photorealistic."
+
+# Descriptions compacted below this many characters are dropped rather than kept as a stub
+MIN_DETAILS_LENGTH = 40
+
+_PARENTHETICAL = re.compile(r'\s*\([^)]*\)')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace"""
+    return ' '.join((text or '').split())
+
+
+def compact_text(text: str, budget: int) -> str:
+    """Shorten text to at most budget characters: drop asides, then cut at a sentence or word boundary"""
+    text = normalize(text)
+    if len(text) <= budget:
+        return text
+
+    if '(' in text:
+        text = normalize(_PARENTHETICAL.sub('', text))
+        if len(text) <= budget:
+            return text
+
+    # Sentences past the budget can never be kept: split only its first budget + 1 characters,
+    # whose last piece is cut short (or, whole, one character over budget) and is dropped
+    sentences = _SENTENCE_END.split(text[:budget + 1])[:-1]
+    kept = ''
+    for sentence in sentences:
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > budget:
+            break
+        kept = candidate
+    if kept:
+        return kept
+
+    cut = text[:budget].rsplit(' ', 1)[0] if ' ' in text[:budget] else text[:budget]
+    return cut.rstrip(',;:-')
+
+
+class PromptCompiler:
+    """Compiles product prompts for one campaign"""
+
+    def __init__(self, campaign_message: str, max_length: int = MAX_PROMPT_LENGTH):
+        self.max_length = max_length
+
+        # Campaign-level sections, rendered once and shared by every product
+        message = normalize(campaign_message)
+        self.message = f"Campaign Message: {message}" if message else ''
+        self.style = f"Style: {BASE_STYLE}"
+        self.compact_style = f"Style: {COMPACT_STYLE}"
+
+        self.compile = functools.lru_cache(maxsize=1024)(self._compile)
+
+    def _compile(self, product_name: str, description: str, region: str, audience: str) -> str:
+        name = normalize(product_name)
+        details = normalize(description)
+        audience = normalize(audience)
+        region = normalize(region)
+        audience_line = f"Target Audience: {audience}" if audience else ''
+        market_line = f"Target Market: {region}" if region else ''
+
+        subject = f"Professional commercial product photography of {name}."
+        details_block = f"Product Details: {details}" if details else ''
+
+        # Compaction steps, least important first; each keeps the full description, so none can fit when it alone overflows
+        candidates = [
+            (audience_line, market_line, self.message, self.style),
+            ('', market_line, self.message, self.style),
+            ('', market_line, '', self.style),
+            ('', '', '', self.style),
+            ('', '', '', self.compact_style)
+        ] if len(subject) + len(details_block) + 2 <= self.max_length else []
+        for step, (audience_part, market_part, message_part, style_part) in enumerate(candidates):
+            context = '\n'.join(part for part in (audience_part, market_part, message_part) if part)
+            prompt = self._assemble(subject, details_block, context, style_part)
+            if len(prompt) <= self.max_length:
+                if step:
+                    logger.info(f"Prompt for {name} compacted (step {step}, {len(prompt)} chars)")
+                return prompt
+
+        # Fit the description into whatever the subject and compact style leave
+        fixed = len(self._assemble(subject, 'Product Details: ', '', self.compact_style))
+        budget = self.max_length - fixed
+        compacted = compact_text(details, budget) if budget >= MIN_DETAILS_LENGTH else ''
+        prompt = self._assemble(subject, f"Product Details: {compacted}" if compacted else '', '', self.compact_style)
+        if len(prompt) <= self.max_length:
+            logger.info(f"Prompt for {name} compacted to {len(prompt)} chars (description {len(details)} -> {len(compacted)})")
+            return prompt
+
+        # Only an extreme product name gets here: keep as much of the name as fits, drop everything else
+        logger.warning(f"Product name alone exceeds the prompt budget, truncating: {name[:60]}")
+        return subject[:self.max_length]
+
+    @staticmethod
+    def _assemble(*blocks: str) -> str:
+        return '\n\n'.join(block for block in blocks if block)
+
+
+@functools.lru_cache(maxsize=32)
+def campaign_compiler(campaign_message: str) -> PromptCompiler:
+    """Compiler for a campaign message, reused across invocations in a warm container"""
+    return PromptCompiler(campaign_message)
+
+
+def build_prompt(product_name: str, product_description: str, campaign_message: str, target_audience: str, target_region: str) -> str:
+    """Compile one product's prompt"""
+    return campaign_compiler(campaign_message).compile(product_name, product_description, target_region, target_audience)
@@ -0,0 +1,99 @@
+"""
+Queue Workers
+
+Long-lived alternative to the Lambda entry points, for container hosts that
+run high sustained volume. A worker long-polls its stage's SQS queues and
+hands each message to the same handler code the Lambda runs, as a record
+in the shape Lambda delivers, so module-level clients, caches and
+connections stay warm across messages. Messages the handler reports as
+failed (batchItemFailures) or raised on are left on the queue to be
+redelivered after the visibility timeout, as with an event source mapping;
+the rest are deleted. SQS errors (throttling, timeouts, expired
+credentials) never stop a worker: a failed receive is retried after
+RECEIVE_ERROR_DELAY, and a failed delete only means redelivery.
+"""
+
+import os
+import signal
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger()
+
+# SQS limits: long-poll wait (seconds) and messages per receive or delete batch
+POLL_WAIT_SECONDS = 20
+MAX_BATCH = 10
+
+# Pause after a failed receive before polling again (seconds)
+RECEIVE_ERROR_DELAY = 5
+
+
+def configure_logging():
+    """Log to stderr as Lambda would (the Lambda runtime installs its own handler)"""
+    logging.basicConfig(format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+    logging.getLogger().setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+
+def stop_on_signals() -> threading.Event:
+    """Event set on SIGTERM or SIGINT: workers stop receiving and finish the messages in hand"""
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, draining in-flight messages")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    return stopping
+
+
+def to_record(message: Dict[str, Any]) -> Dict[str, Any]:
+    """SQS message as a Lambda event record"""
+    return {
+        'messageId': message['MessageId'],
+        'receiptHandle': message['ReceiptHandle'],
+        'body': message['Body'],
+        'attributes': message.get('Attributes', {}),
+        'messageAttributes': message.get('MessageAttributes', {})
+    }
+
+
+def succeeded(records: List[Dict[str, Any]], response: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Records a handler response did not report as failed"""
+    failed = {item['itemIdentifier'] for item in (response or {}).get('batchItemFailures', [])}
+    return [record for record in records if record['messageId'] not in failed]
+
+
+class QueuePoller:
+    """Receives and acknowledges the messages of one queue"""
+
+    def __init__(self, sqs, queue_url: str):
+        self.sqs = sqs
+        self.queue_url = queue_url
+
+    def receive(self, max_messages: int = MAX_BATCH, wait_seconds: int = POLL_WAIT_SECONDS) -> List[Dict[str, Any]]:
+        """Long-poll for up to max_messages records (empty after the wait if the queue is idle)"""
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=max(1, min(MAX_BATCH, max_messages)),
+            WaitTimeSeconds=wait_seconds,
+            AttributeNames=['All'],
+            MessageAttributeNames=['All']
+        )
+        return [to_record(message) for message in response.get('Messages', [])]
+
+    def delete(self, records: List[Dict[str, Any]]):
+        """Acknowledge processed records (a failed delete only means the message is redelivered)"""
+        for start in range(0, len(records), MAX_BATCH):
+            batch = records[start:start + MAX_BATCH]
+            try:
+                response = self.sqs.delete_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[{'Id': str(i), 'ReceiptHandle': record['receiptHandle']} for i, record in enumerate(batch)]
+                )
+            except Exception as e:
+                logger.warning(f"Failed to delete {len(batch)} messages from {self.queue_url}: {str(e)}")
+                continue
+            for failure in response.get('Failed', []):
+                logger.warning(f"Failed to delete message from {self.queue_url}: {failure.get('Message')}")
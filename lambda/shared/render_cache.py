@@ -0,0 +1,128 @@
+"""
+Variant Render Cache
+
+Maps (source content, variant spec, message, brand colors, font version)
+to outputs that were already rendered, so a repeat render becomes a
+server-side copy_object instead of decode, resize, encode and upload.
+Sources are identified by their exact content (shared.content_hash), so
+an image that merely looks the same is a different source.
+Entries for one source are stored together in a single small object.
+The output spec below is shared with the parser, whose pre-flight
+estimates look up the same keys.
+"""
+
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+import PIL
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+CACHE_PREFIX = 'indexes/render-cache/'
+
+# Text is drawn with Pillow's default font, so the Pillow version is the font version
+FONT_VERSION = f"pil-default-{PIL.__version__}"
+
+# Variant output spec: compositor version (bump when its output changes), JPEG quality, thumbnail box
+ENGINE_VERSION = 'numpy-v1'
+VARIANT_QUALITY = 90
+THUMBNAIL_SIZE = (320, 320)
+
+
+def cache_key(variant_name: str, size: tuple, message: str, colors: list, **spec: Any) -> str:
+    """Cache key for one rendered output of a source"""
+    payload = json.dumps({
+        'variant': variant_name,
+        'size': list(size),
+        'message': message,
+        'colors': colors,
+        'font': FONT_VERSION,
+        **spec
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+def variant_cache_key(variant_name: str, size: tuple, message: str, colors: list) -> str:
+    """Cache key of a rendered variant (and its thumbnail)"""
+    return cache_key(variant_name, size, message, colors, quality=VARIANT_QUALITY, thumbnail=THUMBNAIL_SIZE, engine=ENGINE_VERSION)
+
+
+def source_thumbnail_cache_key() -> str:
+    return cache_key('source-thumbnail', THUMBNAIL_SIZE, '', [])
+
+
+class RenderCache:
+    """Render cache entries for a single source"""
+    
+    def __init__(self, s3, bucket: str, source: str):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = f"{CACHE_PREFIX}{source}.json"
+        self._entries: Optional[Dict[str, Dict[str, str]]] = None
+        self._pending: Dict[str, Dict[str, str]] = {}
+    
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+            return json.loads(response['Body'].read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return {}
+            raise
+    
+    @property
+    def entries(self) -> Dict[str, Dict[str, str]]:
+        if self._entries is None:
+            try:
+                self._entries = self._load()
+            except Exception as e:
+                logger.warning(f"Render cache unavailable: {e}")
+                self._entries = {}
+        return self._entries
+    
+    def copy(self, key: str, destination: Dict[str, str]) -> bool:
+        """Copy a cached render to the destination keys; False on a miss"""
+        cached = self.entries.get(key)
+        if not cached or set(cached) != set(destination):
+            return False
+        
+        try:
+            for field, dest_key in destination.items():
+                if cached[field] != dest_key:
+                    self.s3.copy_object(
+                        Bucket=self.bucket,
+                        Key=dest_key,
+                        CopySource={'Bucket': self.bucket, 'Key': cached[field]}
+                    )
+        except ClientError as e:
+            # Earlier outputs may have expired with their campaign
+            logger.info(f"Cached render unavailable, re-rendering: {e}")
+            self.entries.pop(key, None)
+            return False
+        
+        return True
+    
+    def put(self, key: str, outputs: Dict[str, str]):
+        """Record a freshly rendered output (written on flush)"""
+        self.entries[key] = outputs
+        self._pending[key] = outputs
+    
+    def flush(self):
+        """Persist new entries, merged into the latest stored copy (best effort)"""
+        if not self._pending:
+            return
+        try:
+            entries = self._load()
+            entries.update(self._pending)
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=json.dumps(entries),
+                ContentType='application/json'
+            )
+            self._pending = {}
+        except Exception as e:
+            logger.warning(f"Failed to update render cache {self.key}: {e}")
@@ -0,0 +1,65 @@
+"""
+Status Events
+
+Publishes campaign and product status changes to the dashboard status
+channel: an SNS topic in AWS (STATUS_TOPIC_ARN), which every dashboard
+process subscribes its own queue to, or, in local development, a spool
+directory of JSON files (STATUS_CHANNEL_DIR) that readers do not consume.
+"""
+
+import json
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+import boto3
+
+logger = logging.getLogger()
+
+STATUS_TOPIC_ARN = os.environ.get('STATUS_TOPIC_ARN')
+STATUS_CHANNEL_DIR = os.environ.get('STATUS_CHANNEL_DIR')
+
+_sns = None
+_sns_lock = threading.Lock()
+
+
+def _sns_client():
+    """Lazily create the SNS client (only needed when a topic is configured)"""
+    global _sns
+    with _sns_lock:  # Worker threads may publish concurrently; client creation is not thread-safe
+        if _sns is None:
+            _sns = boto3.client('sns')
+    return _sns
+
+
+def publish_status(campaign_id: str, status: str, product_index: Optional[int] = None, **details: Any):
+    """Publish a status event. Best effort: failures are logged, never raised."""
+    event: Dict[str, Any] = {
+        'campaign_id': campaign_id,
+        'status': status,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+    if product_index is not None:
+        event['product_index'] = product_index
+    event.update(details)
+    
+    try:
+        if STATUS_TOPIC_ARN:
+            _sns_client().publish(TopicArn=STATUS_TOPIC_ARN, Message=json.dumps(event))
+        elif STATUS_CHANNEL_DIR:
+            _write_local(event)
+    except Exception as e:
+        logger.warning(f"Failed to publish status event: {e}")
+
+
+def _write_local(event: Dict[str, Any]):
+    """Write an event to the local spool directory (atomic rename)"""
+    os.makedirs(STATUS_CHANNEL_DIR, exist_ok=True)
+    name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.json"
+    tmp_path = os.path.join(STATUS_CHANNEL_DIR, f".{name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(event, f)
+    os.replace(tmp_path, os.path.join(STATUS_CHANNEL_DIR, name))
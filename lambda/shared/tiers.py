@@ -0,0 +1,65 @@
+"""
+Generation Tiers
+
+A campaign brief runs either as a fast, low-cost preview (standard quality,
+512x512 generation, a reduced set of half-resolution variants) or as the
+final tier. Approved preview products are promoted by regenerating them at
+the final tier; both tiers' outputs are kept side by side.
+"""
+
+from typing import Dict, Any, Optional, Tuple
+
+PREVIEW = 'preview'
+FINAL = 'final'
+
+# Variant sizes (social media platforms) at the final tier
+VARIANT_SIZES: Dict[str, Tuple[int, int]] = {
+    'instagram-square': (1080, 1080),
+    'instagram-story': (1080, 1920),
+    'facebook-feed': (1200, 630),
+    'twitter-card': (1200, 675),
+    'linkedin-post': (1200, 627)
+}
+
+TIERS: Dict[str, Dict[str, Any]] = {
+    PREVIEW: {
+        'quality': 'standard',
+        'image_size': 512,
+        'variants': ('instagram-square', 'facebook-feed'),
+        'variant_scale': 0.5,
+        'prefix': 'preview/'
+    },
+    FINAL: {
+        'quality': None,  # Quality of the serving generation path
+        'image_size': 1024,
+        'variants': None,  # All variants
+        'variant_scale': 1.0,
+        'prefix': ''
+    }
+}
+
+
+def tier_settings(tier: Optional[str]) -> Dict[str, Any]:
+    """Settings of a tier (unknown or missing tiers are final)"""
+    return TIERS.get(tier or FINAL, TIERS[FINAL])
+
+
+def tier_variants(tier: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    """Variants a tier renders, with their render sizes"""
+    settings = tier_settings(tier)
+    scale = settings['variant_scale']
+    return {
+        name: (int(width * scale), int(height * scale))
+        for name, (width, height) in VARIANT_SIZES.items()
+        if not settings['variants'] or name in settings['variants']
+    }
+
+
+def output_prefix(campaign_id: str, tier: Optional[str]) -> str:
+    """S3 prefix of a campaign's outputs for a tier"""
+    return f"output/{campaign_id}/{tier_settings(tier)['prefix']}"
+
+
+def generation_quality(tier: Optional[str], path_quality: str) -> str:
+    """Bedrock quality used for a tier on a generation path"""
+    return tier_settings(tier)['quality'] or path_quality
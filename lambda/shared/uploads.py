@@ -0,0 +1,124 @@
+"""
+Upload Manager
+
+Background S3 uploads for stage outputs. Bodies are streamed from the
+caller's BytesIO (or wrapped bytes) by the S3 transfer manager, so encoded
+images are never copied into a second bytes object; objects above
+UPLOAD_MULTIPART_THRESHOLD are sent as concurrent multipart uploads. At
+most UPLOAD_MAX_IN_FLIGHT uploads run at once (submitting blocks until a
+slot frees up), and draining a batch logs its aggregate throughput.
+Batches are per thread, so concurrent callers sharing a manager (the
+generator's queue worker) each drain only their own uploads.
+"""
+
+import os
+import time
+import logging
+import threading
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Union
+
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from s3transfer.subscribers import BaseSubscriber
+
+logger = logging.getLogger()
+
+MAX_IN_FLIGHT = int(os.environ.get('UPLOAD_MAX_IN_FLIGHT', '8'))
+MULTIPART_THRESHOLD = int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+
+
+class _Window(BaseSubscriber):
+    """Counts transferred bytes and frees the upload's in-flight slot when it finishes"""
+
+    def __init__(self, manager: 'UploadManager', batch: '_Batch'):
+        self.manager = manager
+        self.batch = batch
+
+    def on_progress(self, future, bytes_transferred, **kwargs):
+        self.manager._transferred(self.batch, bytes_transferred)
+
+    def on_done(self, future, **kwargs):
+        self.manager._slots.release()
+
+
+class _Batch:
+    """One caller thread's uploads since its last drain"""
+
+    def __init__(self):
+        self.futures: List[Any] = []
+        self.bytes = 0
+        self.started: Optional[float] = None
+
+
+class UploadManager:
+    """Concurrent uploads to one bucket, drained per batch"""
+
+    def __init__(self, s3, bucket: str, max_in_flight: int = MAX_IN_FLIGHT, multipart_threshold: int = MULTIPART_THRESHOLD):
+        self.bucket = bucket
+        self.transfer = create_transfer_manager(s3, TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=max(multipart_threshold, 5 * 1024 * 1024),
+            max_concurrency=max_in_flight
+        ))
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _batch(self) -> _Batch:
+        if not hasattr(self._local, 'batch'):
+            self._local.batch = _Batch()
+        return self._local.batch
+
+    def submit(self, key: str, body: Union[bytes, BytesIO], content_type: str, metadata: Optional[Dict[str, str]] = None):
+        """Start uploading body to key; blocks while the in-flight window is full"""
+        if isinstance(body, bytes):
+            body = BytesIO(body)  # Shares the bytes object rather than copying it
+        body.seek(0)
+
+        extra_args = {'ContentType': content_type}
+        if metadata:
+            extra_args['Metadata'] = metadata
+
+        batch = self._batch()
+        self._slots.acquire()
+        if batch.started is None:
+            batch.started = time.monotonic()
+        try:
+            future = self.transfer.upload(body, self.bucket, key, extra_args=extra_args, subscribers=[_Window(self, batch)])
+        except Exception:
+            self._slots.release()
+            raise
+        batch.futures.append(future)
+        return future
+
+    def drain(self, raise_errors: bool = True) -> Dict[str, Any]:
+        """Wait for every upload this thread submitted, raising the first failure, and report the batch's throughput"""
+        batch = self._batch()
+        futures, batch.futures = batch.futures, []
+        error = None
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                error = error or e
+
+        elapsed = time.monotonic() - batch.started if batch.started is not None else 0.0
+        with self._lock:
+            stats = {
+                'objects': len(futures),
+                'bytes': batch.bytes,
+                'seconds': round(elapsed, 3),
+                'mb_per_second': round(batch.bytes / elapsed / 1e6, 2) if elapsed > 0 else 0.0
+            }
+            batch.bytes = 0
+        batch.started = None
+
+        if error and raise_errors:
+            raise error
+        if futures:
+            logger.info(f"Uploaded {stats['objects']} objects, {stats['bytes'] / 1e6:.2f} MB in {stats['seconds']}s ({stats['mb_per_second']} MB/s)")
+        return stats
+
+    def _transferred(self, batch: _Batch, amount: int):
+        with self._lock:
+            batch.bytes += amount
@@ -0,0 +1,332 @@
+"""
+Campaign Workflow
+
+Durable task state for the parser -> generator -> variants DAG of each
+campaign, with an atomic per-campaign completion counter so finalization
+happens exactly once no matter how many products finish concurrently.
+
+Two interchangeable stores:
+- DynamoWorkflowStore: DynamoDB table (WORKFLOW_TABLE), used in AWS
+- SQLiteWorkflowStore: local SQLite file (WORKFLOW_DB_PATH), used in development
+
+The DAG itself runs across the stages (parser, generation queues, variants),
+whose concurrency is bounded by their event sources and queue workers.
+"""
+
+import json
+import os
+import time
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from shared.status import publish_status
+from shared.manifest import ManifestStore
+
+logger = logging.getLogger()
+
+# Task states
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+TERMINAL_STATES = (SUCCEEDED, FAILED, SKIPPED)
+
+CAMPAIGN_ITEM = '#campaign'
+
+# Workflow records expire with campaign outputs (seconds)
+RECORD_TTL = 90 * 24 * 3600
+
+
+# Workflow ids of later rounds of a campaign (e.g. promotion) are "<campaign_id>:<round>"
+ROUND_SEPARATOR = ':'
+
+
+def round_id(campaign_id: str, round_name: Optional[str] = None) -> str:
+    """Workflow id of a campaign round (the campaign id itself for the initial round)"""
+    return f"{campaign_id}{ROUND_SEPARATOR}{round_name}" if round_name else campaign_id
+
+
+def campaign_of(workflow_id: str) -> str:
+    """Campaign id of a workflow id"""
+    return workflow_id.split(ROUND_SEPARATOR, 1)[0]
+
+
+def product_task(stage: str, index: int) -> str:
+    """Task name of a product stage, e.g. generate#0"""
+    return f"{stage}#{index}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class WorkflowStore(ABC):
+    """Task state and completion barrier for campaign workflows"""
+
+    @abstractmethod
+    def start_campaign(self, campaign_id: str, expected_products: int):
+        pass
+
+    @abstractmethod
+    def set_task_state(self, campaign_id: str, task: str, state: str, **details: Any):
+        pass
+
+    @abstractmethod
+    def complete_product(self, campaign_id: str, index: int, succeeded: bool) -> Optional[Dict[str, int]]:
+        """
+        Mark a product terminal and count it towards the campaign.
+
+        Idempotent per product. Returns the campaign totals only to the single
+        caller whose completion finished the campaign, None to everyone else.
+        """
+
+    @abstractmethod
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @staticmethod
+    def from_environment() -> Optional['WorkflowStore']:
+        """Store configured by WORKFLOW_DB_PATH or WORKFLOW_TABLE (None if neither is set)"""
+        if os.environ.get('WORKFLOW_DB_PATH'):
+            return SQLiteWorkflowStore(os.environ['WORKFLOW_DB_PATH'])
+        if os.environ.get('WORKFLOW_TABLE'):
+            return DynamoWorkflowStore(os.environ['WORKFLOW_TABLE'])
+        return None
+
+
+class DynamoWorkflowStore(WorkflowStore):
+    """DynamoDB-backed store: one item per task plus a campaign item holding the counters"""
+
+    def __init__(self, table_name: str, client=None):
+        self.table = table_name
+        self.dynamodb = client or boto3.client('dynamodb')
+
+    def _expires_at(self) -> Dict[str, str]:
+        return {'N': str(int(time.time()) + RECORD_TTL)}
+
+    def start_campaign(self, campaign_id: str, expected_products: int):
+        try:
+            self.dynamodb.put_item(
+                TableName=self.table,
+                Item={
+                    'campaign_id': {'S': campaign_id},
+                    'task': {'S': CAMPAIGN_ITEM},
+                    'expected': {'N': str(expected_products)},
+                    'completed': {'N': '0'},
+                    'failed': {'N': '0'},
+                    'created_at': {'S': _now()},
+                    'expires_at': self._expires_at()
+                },
+                ConditionExpression='attribute_not_exists(campaign_id)'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            logger.info(f"Workflow already started: {campaign_id}")
+
+    def set_task_state(self, campaign_id: str, task: str, state: str, **details: Any):
+        self.dynamodb.put_item(
+            TableName=self.table,
+            Item={
+                'campaign_id': {'S': campaign_id},
+                'task': {'S': task},
+                'state': {'S': state},
+                'details': {'S': json.dumps(details)},
+                'updated_at': {'S': _now()},
+                'expires_at': self._expires_at()
+            }
+        )
+
+    def complete_product(self, campaign_id: str, index: int, succeeded: bool) -> Optional[Dict[str, int]]:
+        key = {'campaign_id': {'S': campaign_id}}
+
+        # Terminal transition and counter increment commit together, or not at all
+        try:
+            self.dynamodb.transact_write_items(TransactItems=[
+                {
+                    'Put': {
+                        'TableName': self.table,
+                        'Item': {
+                            **key,
+                            'task': {'S': product_task('product', index)},
+                            'state': {'S': SUCCEEDED if succeeded else FAILED},
+                            'updated_at': {'S': _now()},
+                            'expires_at': self._expires_at()
+                        },
+                        'ConditionExpression': 'attribute_not_exists(campaign_id)'
+                    }
+                },
+                {
+                    'Update': {
+                        'TableName': self.table,
+                        'Key': {**key, 'task': {'S': CAMPAIGN_ITEM}},
+                        'UpdateExpression': 'ADD completed :one' + ('' if succeeded else ', failed :one'),
+                        'ExpressionAttributeValues': {':one': {'N': '1'}}
+                    }
+                }
+            ])
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TransactionCanceledException':
+                logger.info(f"Product {index} of {campaign_id} already completed")
+                return None
+            raise
+
+        campaign = self.get_campaign(campaign_id)
+        if not campaign or campaign['completed'] < campaign['expected']:
+            return None
+
+        # Exactly one caller wins the finalization claim
+        try:
+            self.dynamodb.update_item(
+                TableName=self.table,
+                Key={**key, 'task': {'S': CAMPAIGN_ITEM}},
+                UpdateExpression='SET finalized_at = :now',
+                ConditionExpression='attribute_not_exists(finalized_at)',
+                ExpressionAttributeValues={':now': {'S': _now()}}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+
+        return {k: campaign[k] for k in ('expected', 'completed', 'failed')}
+
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        response = self.dynamodb.get_item(
+            TableName=self.table,
+            Key={'campaign_id': {'S': campaign_id}, 'task': {'S': CAMPAIGN_ITEM}},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        if not item:
+            return None
+        return {
+            'expected': int(item['expected']['N']),
+            'completed': int(item['completed']['N']),
+            'failed': int(item['failed']['N']),
+            'finalized': 'finalized_at' in item
+        }
+
+
+class SQLiteWorkflowStore(WorkflowStore):
+    """SQLite-backed local stand-in with the same semantics (serialized write transactions)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    campaign_id TEXT PRIMARY KEY,
+                    expected INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    finalized_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS tasks (
+                    campaign_id TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    details TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (campaign_id, task)
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; write sections take the database lock with BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def start_campaign(self, campaign_id: str, expected_products: int):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO campaigns (campaign_id, expected, created_at) VALUES (?, ?, ?)",
+                (campaign_id, expected_products, _now())
+            )
+
+    def set_task_state(self, campaign_id: str, task: str, state: str, **details: Any):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (campaign_id, task, state, details, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (campaign_id, task, state, json.dumps(details), _now())
+            )
+
+    def complete_product(self, campaign_id: str, index: int, succeeded: bool) -> Optional[Dict[str, int]]:
+        with closing(self._connect()) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (campaign_id, task, state, details, updated_at) VALUES (?, ?, ?, '{}', ?)",
+                    (campaign_id, product_task('product', index), SUCCEEDED if succeeded else FAILED, _now())
+                ).rowcount
+                if not inserted:
+                    conn.execute("ROLLBACK")
+                    return None
+
+                conn.execute(
+                    "UPDATE campaigns SET completed = completed + 1, failed = failed + ? WHERE campaign_id = ?",
+                    (0 if succeeded else 1, campaign_id)
+                )
+                expected, completed, failed = conn.execute(
+                    "SELECT expected, completed, failed FROM campaigns WHERE campaign_id = ?",
+                    (campaign_id,)
+                ).fetchone()
+
+                claimed = completed >= expected and conn.execute(
+                    "UPDATE campaigns SET finalized_at = ? WHERE campaign_id = ? AND finalized_at IS NULL",
+                    (_now(), campaign_id)
+                ).rowcount == 1
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        return {'expected': expected, 'completed': completed, 'failed': failed} if claimed else None
+
+    def get_campaign(self, campaign_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT expected, completed, failed, finalized_at FROM campaigns WHERE campaign_id = ?",
+                (campaign_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'expected': row[0], 'completed': row[1], 'failed': row[2], 'finalized': row[3] is not None}
+
+
+def finalize_campaign(s3, bucket: str, workflow_id: str, summary: Dict[str, int]):
+    """Mark the campaign manifest completed (called once per round, by the winner of the completion barrier)"""
+    campaign_id = campaign_of(workflow_id)
+    manifests = ManifestStore.from_environment(s3, bucket)
+
+    patch = {'status': 'completed'}
+    if workflow_id == campaign_id:
+        patch.update({'completed_at': _now(), 'failed_products': summary['failed']})
+    else:
+        round_name = workflow_id.split(ROUND_SEPARATOR, 1)[1]
+        patch['rounds'] = {round_name: {'completed_at': _now(), **summary}}
+    manifests.update_campaign(campaign_id, patch)
+
+    # The round is complete: fold its updates into the full manifest
+    manifests.compact(campaign_id)
+    logger.info(f"Campaign {workflow_id} completed ({summary['completed'] - summary['failed']}/{summary['expected']} products succeeded)")
+    publish_status(campaign_id, 'campaign_completed', failed_products=summary['failed'])
+
+
+def record_product_outcome(store: WorkflowStore, s3, bucket: str, workflow_id: str, index: int, succeeded: bool) -> bool:
+    """Count a terminal product towards the barrier; finalizes the campaign if it was the last one"""
+    summary = store.complete_product(workflow_id, index, succeeded)
+    if not summary:
+        return False
+    finalize_campaign(s3, bucket, workflow_id, summary)
+    return True
+
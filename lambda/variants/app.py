@@ -7,31 +7,55 @@ Creates multiple size/format variants from product images.
 import json
 import os
 import boto3
+import functools
 import logging
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
+import tempfile
+import time
+from PIL import Image
 from datetime import datetime, timezone
 
+from shared.status import publish_status
+from shared.workflow import WorkflowStore, record_product_outcome
+from shared.tiers import FINAL, VARIANT_SIZES, tier_settings, tier_variants, output_prefix
+from shared.uploads import UploadManager
+from shared.costs import CostLedger, VARIANTS_CENTS
+from shared.manifest import ManifestStore
+from shared.render_cache import RenderCache, THUMBNAIL_SIZE, variant_cache_key, source_thumbnail_cache_key
+from shared.content_hash import object_identity
+from compositor import Compositor, required_source_edge
+from renderer import renderer, encode_thumbnail
+
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 s3 = boto3.client('s3')
 S3_BUCKET = os.environ['S3_BUCKET_NAME']
 
-# Variant sizes (social media platforms)
-VARIANTS = {
-    'instagram-square': (1080, 1080),
-    'instagram-story': (1080, 1920),
-    'facebook-feed': (1200, 630),
-    'twitter-card': (1200, 675),
-    'linkedin-post': (1200, 627)
-}
+# Completion barrier: decides exactly once when a campaign is finished
+workflow = WorkflowStore.from_environment()
+uploads = UploadManager(s3, S3_BUCKET)
+ledger = CostLedger(s3, S3_BUCKET)
+manifests = ManifestStore.from_environment(s3, S3_BUCKET)
+
+# Source decoding: downloads are spooled to disk, and sources are decoded no larger than the
+# variants need; anything that would still decode above the pixel budget is rejected
+SPOOL_DIR = os.environ.get('SPOOL_DIR', '/tmp')
+MAX_SOURCE_PIXELS = int(os.environ.get('MAX_SOURCE_PIXELS', str(25_000_000)))
+
+# Only JPEG can be scaled by the decoder itself. PNG, WebP and the rest decode at full resolution
+# before being reduced, so they are held to a lower budget that bounds that peak
+DRAFT_FORMATS = ('JPEG',)
+MAX_FULL_DECODE_PIXELS = int(os.environ.get('MAX_FULL_DECODE_PIXELS', str(12_000_000)))
+
+# Thumbnails for dashboard previews (their size is part of the render cache's output spec)
+THUMBNAIL_QUALITY = 80
 
 
 def handler(event, context):
     """Main Lambda handler"""
     logger.info(f"Received event: {json.dumps(event)}")
     
+    started = time.monotonic()
     try:
         campaign_id = event['campaign_id']
         product_name = event['product_name']
@@ -40,155 +64,199 @@ def handler(event, context):
         source = event['image_source']
         message = event['campaign_message']
         colors = event['brand_colors']
+        tier = event.get('tier', FINAL)
+        workflow_id = event.get('workflow_id', campaign_id)
+        settings = tier_settings(tier)
+        
+        # Decoded at most once, and only if some output is not in the render cache
+        scale = settings['variant_scale']
+        min_edge = required_source_edge([(w * scale, h * scale) for w, h in VARIANT_SIZES.values()])
+        get_image = functools.lru_cache(maxsize=1)(lambda: load_image(image_key, min_edge))
         
-        # Download source image
-        image_data = download_image(image_key)
-        image = Image.open(BytesIO(image_data))
+        # Identify the source by its exact content (sent by the generator and parser, else read from its metadata)
+        source_hash = event.get('source_hash') or object_identity(s3, S3_BUCKET, image_key)
+        cache = RenderCache(s3, S3_BUCKET, source_hash)
         
-        # Generate all variants
-        variant_keys = []
-        for variant_name, size in VARIANTS.items():
-            key = generate_variant(campaign_id, product_name, product_index, image, variant_name, size, message, colors)
-            variant_keys.append({'platform': variant_name, 'key': key})
+        # Thumbnail of the source image for dashboard previews
+        sanitized = product_name.lower().replace(' ', '-')[:30]
+        source_thumbnail_key = f"{output_prefix(campaign_id, tier)}{sanitized}/thumbnails/original.jpg"
+        thumbnail_cache_key = source_thumbnail_cache_key()
+        if not cache.copy(thumbnail_cache_key, {'key': source_thumbnail_key}):
+            save_thumbnail(get_image(), source_thumbnail_key)
+            cache.put(thumbnail_cache_key, {'key': source_thumbnail_key})
         
-        # Update manifest with processing cost
-        # AI generation: $0.04 (Titan Image Generator) + $0.01 (variant processing) = $0.05
-        # Existing assets: $0.01 (variant processing only)
-        # Reference: https://umbrellacost.com/blog/aws-bedrock-pricing/
-        cost = 0.01 if source == 'existing' else 0.05
-        update_manifest(campaign_id, product_name, product_index, variant_keys, source, cost)
+        # The tier's variants (previews render fewer, at reduced resolution), copied from the render cache where possible
+        variants = [
+            plan_variant(campaign_id, product_name, variant_name, render_size, message, colors, cache, tier, scale)
+            for variant_name, render_size in tier_variants(tier).items()
+        ]
+        
+        # The rest render in process, or across the render pool when RENDER_PROCESSES is set
+        get_compositor = functools.lru_cache(maxsize=1)(lambda: Compositor(get_image()))
+        misses = [variant for variant in variants if 'job' in variant]
+        if misses:
+            variant_renderer = renderer(get_image, get_compositor, len(misses))
+            try:
+                renders = [variant_renderer.submit(variant['job']) for variant in misses]
+                # Each render uploads in the background while the next one is composited
+                for variant, render in zip(misses, renders):
+                    save_variant(variant, render.result(), cache)
+            finally:
+                variant_renderer.close()
+        variant_keys = [{'platform': v['platform'], 'key': v['key'], 'thumbnail_key': v['thumbnail_key']} for v in variants]
+        
+        uploads.drain()
+        cache.flush()
+        
+        # Variant processing is this stage's only charge (the generator records its own)
+        ledger.record(campaign_id, 'variants', product_index, VARIANTS_CENTS, tier=tier, variants=len(variant_keys))
+        update_manifest(campaign_id, product_name, product_index, variant_keys, source, image_key, source_thumbnail_key, tier, time.monotonic() - started)
+        if workflow:
+            record_product_outcome(workflow, s3, S3_BUCKET, workflow_id, product_index, True)
         
         logger.info(f"Generated {len(variant_keys)} variants")
         return {'statusCode': 200, 'variants': len(variant_keys)}
     
     except Exception as e:
         logger.error(f"Error: {str(e)}", exc_info=True)
+        uploads.drain(raise_errors=False)  # Settle this invocation's uploads so the next batch starts clean
+        if 'campaign_id' in event and 'product_index' in event:
+            mark_product_failed(event['campaign_id'], event['product_index'], str(e))
+            if workflow:
+                workflow_id = event.get('workflow_id', event['campaign_id'])
+                record_product_outcome(workflow, s3, S3_BUCKET, workflow_id, event['product_index'], False)
         return {'statusCode': 500, 'error': str(e)}
 
 
-def download_image(key: str) -> bytes:
-    """Download image from S3"""
-    response = s3.get_object(Bucket=S3_BUCKET, Key=key)
-    return response['Body'].read()
+def load_image(key: str, min_edge: int) -> Image.Image:
+    """Download the source to disk and decode it at the smallest resolution with both edges >= min_edge"""
+    with tempfile.TemporaryFile(dir=SPOOL_DIR) as spool:
+        s3.download_fileobj(S3_BUCKET, key, spool)
+        spool.seek(0)
+        
+        image = Image.open(spool)
+        original_size = image.size
+        
+        # JPEG: let the decoder scale by 1/2, 1/4 or 1/8 (DCT scaling) instead of decoding full size
+        if image.format in DRAFT_FORMATS:
+            image.draft('RGB', (min_edge, min_edge))
+            budget = MAX_SOURCE_PIXELS
+        else:
+            budget = MAX_FULL_DECODE_PIXELS
+        
+        if image.width * image.height > budget:
+            raise ValueError(
+                f"Source image {key} ({image.format}) is {original_size[0]}x{original_size[1]} and would decode at "
+                f"{image.width}x{image.height}, over the {budget} pixel budget"
+            )
+        image.load()
+    
+    # Other formats: cheap integer box reduction down to what the variants need
+    factor = min(image.width, image.height) // min_edge
+    if factor >= 2:
+        if image.mode not in ('L', 'LA', 'RGB', 'RGBA', 'CMYK'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode == 'PA' else 'RGB')
+        image = image.reduce(factor)
+    
+    if image.size != original_size:
+        logger.info(f"Decoded {key} at {image.width}x{image.height} (original {original_size[0]}x{original_size[1]})")
+    return image
 
 
-def generate_variant(
+def plan_variant(
     campaign_id: str,
     product_name: str,
-    index: int,
-    image: Image.Image,
     variant_name: str,
     size: tuple,
     message: str,
-    colors: list
-) -> str:
-    """Generate single variant"""
-    
-    # Create canvas
-    canvas = Image.new('RGB', size, color=colors[0] if colors else '#FFFFFF')
-    
-    # Calculate image placement (centered)
-    img_ratio = image.width / image.height
-    canvas_ratio = size[0] / size[1]
-    
-    if img_ratio > canvas_ratio:
-        # Image wider than canvas - fit width
-        new_width = int(size[0] * 0.8)
-        new_height = int(new_width / img_ratio)
-    else:
-        # Image taller than canvas - fit height
-        new_height = int(size[1] * 0.7)
-        new_width = int(new_height * img_ratio)
-    
-    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    
-    # Center image
-    x = (size[0] - new_width) // 2
-    y = (size[1] - new_height) // 2 - 50  # Slightly above center
-    
-    canvas.paste(resized, (x, y))
-    
-    # Add text overlay (simplified - in production use proper fonts)
-    draw = ImageDraw.Draw(canvas)
-    text = message[:50]  # Truncate long messages
-    
-    # Draw text at bottom (simplified - use ImageFont for better rendering)
-    text_y = size[1] - 100
-    bbox = draw.textbbox((0, 0), text)
-    text_width = bbox[2] - bbox[0]
-    text_x = (size[0] - text_width) // 2
-    
-    # Simple text shadow
-    shadow_color = '#000000' if colors and colors[0] != '#000000' else '#FFFFFF'
-    draw.text((text_x + 2, text_y + 2), text, fill=shadow_color)
-    draw.text((text_x, text_y), text, fill='#FFFFFF')
-    
+    colors: list,
+    cache: RenderCache,
+    tier: str = FINAL,
+    scale: float = 1.0
+) -> dict:
+    """Output keys of a variant, copied from the render cache if possible, with the render job otherwise"""
     sanitized = product_name.lower().replace(' ', '-')[:30]
     aspect_ratio = f"{size[0]}x{size[1]}"
-    key = f"output/{campaign_id}/{sanitized}/aspect-ratios/{aspect_ratio}/{variant_name}.jpg"
+    prefix = output_prefix(campaign_id, tier)
+    variant = {
+        'platform': variant_name,
+        'key': f"{prefix}{sanitized}/aspect-ratios/{aspect_ratio}/{variant_name}.jpg",
+        'thumbnail_key': f"{prefix}{sanitized}/thumbnails/{variant_name}.jpg"
+    }
     
-    buffer = BytesIO()
-    canvas.save(buffer, format='JPEG', quality=90)
+    # Same source, spec, message, colors and font: copy the earlier output server-side
+    variant['cache_key'] = variant_cache_key(variant_name, size, message, colors)
+    if cache.copy(variant['cache_key'], {'key': variant['key'], 'thumbnail_key': variant['thumbnail_key']}):
+        logger.info(f"Reused cached render: {variant_name} -> s3://{S3_BUCKET}/{variant['key']}")
+        return variant
     
-    s3.put_object(
-        Bucket=S3_BUCKET,
-        Key=key,
-        Body=buffer.getvalue(),
-        ContentType='image/jpeg'
-    )
-    
-    logger.info(f"Saved variant: {variant_name} -> s3://{S3_BUCKET}/{key}")
+    variant['job'] = {
+        'size': size,
+        'message': message,
+        'colors': colors,
+        'scale': scale,
+        'thumbnail_size': THUMBNAIL_SIZE,
+        'thumbnail_quality': THUMBNAIL_QUALITY
+    }
+    return variant
+
+
+def save_variant(variant: dict, render: tuple, cache: RenderCache):
+    """Upload a rendered variant and its thumbnail (encoded JPEGs, buffers or bytes), and record them in the render cache"""
+    image_jpeg, thumbnail_jpeg = render
+    uploads.submit(variant['key'], image_jpeg, 'image/jpeg')
+    uploads.submit(variant['thumbnail_key'], thumbnail_jpeg, 'image/jpeg')
+    cache.put(variant['cache_key'], {'key': variant['key'], 'thumbnail_key': variant['thumbnail_key']})
+    logger.info(f"Saved variant: {variant['platform']} -> s3://{S3_BUCKET}/{variant['key']}")
+
+
+def save_thumbnail(image: Image.Image, key: str) -> str:
+    """Save a small JPEG preview of an image"""
+    uploads.submit(key, encode_thumbnail(image, THUMBNAIL_SIZE, THUMBNAIL_QUALITY), 'image/jpeg')
     return key
 
 
-def update_manifest(campaign_id: str, product_name: str, index: int, variants: list, source: str, cost: float):
+def update_manifest(campaign_id: str, product_name: str, index: int, variants: list, source: str, image_key: str = None, thumbnail_key: str = None, tier: str = FINAL, seconds: float = None):
     """Update campaign manifest with variants"""
-    manifest_key = f"output/{campaign_id}/manifest.json"
-    
     try:
-        response = s3.get_object(Bucket=S3_BUCKET, Key=manifest_key)
-        manifest = json.loads(response['Body'].read())
-        
-        logger.info(f"Manifest has {len(manifest['products'])} products")
+        completed_at = datetime.now(timezone.utc).isoformat()
+        patch = {
+            'variants': variants,
+            'variants_count': len(variants),
+            'completed_at': completed_at,
+            'updated_at': completed_at,
+            'status': 'completed',
+            # Latest tier on the entry itself; every tier's outputs kept under 'tiers'
+            'tier': tier,
+            'tiers': {tier: {'image_key': image_key, 'thumbnail_key': thumbnail_key, 'variants': variants, 'completed_at': completed_at}}
+        }
+        if image_key:
+            patch['image_key'] = image_key
+        if thumbnail_key:
+            patch['thumbnail_key'] = thumbnail_key
+        if seconds is not None:
+            patch['timings'] = {'variants_seconds': round(seconds, 3)}
+        manifests.update_product(campaign_id, index, patch)
+        logger.info(f"Updated product at index {index} with {len(variants)} variants")
+        publish_status(campaign_id, 'completed', index)
         
-        # Find product entry
-        product_found = False
-        for product in manifest['products']:
-            logger.info(f"Checking product: index={product.get('index', product.get('product_index'))}, name={product.get('product_name')}")
-            if product.get('index') == index or product.get('product_index') == index:
-                product['variants'] = variants
-                product['variants_count'] = len(variants)
-                product['processing_cost'] = cost
-                product['completed_at'] = datetime.now(timezone.utc).isoformat()
-                product['status'] = 'completed'
-                product_found = True
-                logger.info(f"Updated product at index {index} with {len(variants)} variants")
-                break
-        
-        if not product_found:
-            logger.error(f"Product not found in manifest: index={index}, name={product_name}")
-            logger.error(f"Available products: {manifest['products']}")
-            return
-        
-        manifest['total_cost'] += cost
-        
-        # Check if all products complete (each product should have variants)
-        products_with_variants = sum(1 for p in manifest['products'] if 'variants' in p)
-        expected_products = manifest.get('expected_products', len(manifest['products']))
-        
-        logger.info(f"Products with variants: {products_with_variants}/{expected_products}")
-        
-        if products_with_variants == expected_products:
-            manifest['status'] = 'completed'
-            manifest['completed_at'] = datetime.now(timezone.utc).isoformat()
+        # Without a workflow store, fall back to counting products in the manifest
+        if workflow is None and manifests.complete_if_done(campaign_id):
             logger.info(f"Campaign {campaign_id} completed!")
-        
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key=manifest_key,
-            Body=json.dumps(manifest, indent=2),
-            ContentType='application/json'
-        )
-        logger.info(f"Manifest updated successfully")
+            publish_status(campaign_id, 'campaign_completed')
     except Exception as e:
         logger.error(f"Failed to update manifest: {e}", exc_info=True)
+
+
+def mark_product_failed(campaign_id: str, index: int, error: str):
+    """Record a variants failure on the product's manifest entry"""
+    try:
+        manifests.update_product(campaign_id, index, {
+            'status': 'failed',
+            'failed_stage': 'variants',
+            'error': error[:500],
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        })
+        publish_status(campaign_id, 'failed', index, stage='variants')
+    except Exception as e:
+        logger.error(f"Failed to record product failure: {e}", exc_info=True)
@@ -0,0 +1,95 @@
+"""
+Variant Compositor
+
+Composites every variant of a product from one decoded source. Work that
+does not depend on a single canvas is done once and shared: resized fits
+(variants that need the same fit share the resize), the message's coverage
+mask, and the gradient scrim mask of each canvas size. Each canvas is then
+a few Pillow C operations: a colour-filled canvas, the product pasted
+through its own alpha, and the scrim and the shadowed message pasted as
+solid colours through their masks.
+"""
+
+import functools
+from typing import Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Bottom band darkened behind the message (fraction of canvas height) and its strongest opacity
+SCRIM_HEIGHT = 0.22
+SCRIM_OPACITY = 0.45
+
+# Product fit: share of the canvas width (wide images) or height (tall images)
+FIT_WIDTH = 0.8
+FIT_HEIGHT = 0.7
+
+
+def required_source_edge(sizes) -> int:
+    """Shortest source edge that still renders every canvas size without upscaling"""
+    return int(max(max(width * FIT_WIDTH, height * FIT_HEIGHT) for width, height in sizes)) + 1
+
+
+@functools.lru_cache(maxsize=32)
+def scrim_mask(width: int, band: int) -> Image.Image:
+    """Opacity of the scrim over a band: a linear ramp, transparent at its top edge"""
+    ramp = np.linspace(0, SCRIM_OPACITY * 255, band, dtype=np.float32).astype(np.uint8)
+    return Image.fromarray(np.repeat(ramp[:, None], width, axis=1), 'L')
+
+
+@functools.lru_cache(maxsize=16)
+def text_mask(text: str) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Coverage mask of the default font's rendering of text, and its offset from the drawing origin"""
+    left, top, right, bottom = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), text)
+    mask = Image.new('L', (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255)
+    return mask, (left, top)
+
+
+class Compositor:
+    """Renders variants of one source image"""
+
+    def __init__(self, image: Image.Image):
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        self.image = image
+        self._fitted_cache = {}
+
+    def _fitted(self, width: int, height: int) -> Image.Image:
+        """Source resized to (width, height) (variants sharing a fit share the resize)"""
+        if (width, height) not in self._fitted_cache:
+            self._fitted_cache[(width, height)] = self.image.resize((width, height), Image.Resampling.LANCZOS)
+        return self._fitted_cache[(width, height)]
+
+    def render(self, size: Tuple[int, int], message: str, colors: list, scale: float = 1.0) -> Image.Image:
+        width, height = size
+        canvas = Image.new('RGB', size, color=colors[0] if colors else '#FFFFFF')
+
+        # Fit the product: 80% of the width for wide images, 70% of the height otherwise
+        img_ratio = self.image.width / self.image.height
+        # At least one pixel each way: tiny canvases still get a (clipped) product
+        if img_ratio > width / height:
+            new_width = max(1, int(width * FIT_WIDTH))
+            new_height = max(1, int(new_width / img_ratio))
+        else:
+            new_height = max(1, int(height * FIT_HEIGHT))
+            new_width = max(1, int(new_height * img_ratio))
+        x = (width - new_width) // 2
+        y = (height - new_height) // 2 - int(50 * scale)  # Slightly above center
+        fitted = self._fitted(new_width, new_height)
+        canvas.paste(fitted, (x, y), fitted if fitted.mode == 'RGBA' else None)
+
+        band = int(height * SCRIM_HEIGHT)
+        if band > 0:
+            canvas.paste((0, 0, 0), (0, height - band), scrim_mask(width, band))
+
+        # Message with a drop shadow, both pasted through one cached coverage mask
+        text = message[:50]
+        shadow_color = '#000000' if colors and colors[0] != '#000000' else '#FFFFFF'
+        mask, (left, top) = text_mask(text)
+        text_x = (width - mask.width) // 2
+        text_y = height - int(100 * scale)
+        canvas.paste(shadow_color, (text_x + left + 2, text_y + top + 2), mask)
+        canvas.paste('#FFFFFF', (text_x + left, text_y + top), mask)
+
+        return canvas
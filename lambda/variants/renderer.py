@@ -0,0 +1,181 @@
+"""
+Variant Renderers
+
+Turn one decoded source into encoded variant and thumbnail JPEGs. The local
+renderer composites in this process, deferred until each result is needed,
+so a render overlaps the uploads of the one before it. The pooled renderer
+spreads a product's specs over a process pool (RENDER_PROCESSES): the
+decoded source is copied once into a multiprocessing.shared_memory block
+that every pool process maps, instead of pickling image bytes into each
+task, and each process keeps a compositor per source so resized fits are
+shared by the specs it renders.
+
+Shared memory and the pool's semaphores need /dev/shm, which Lambda does
+not provide; where they are unavailable the local renderer is used.
+"""
+
+import os
+import logging
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from shared.render_cache import VARIANT_QUALITY
+from compositor import Compositor
+
+logger = logging.getLogger()
+
+# Pool processes rendering one product's specs in parallel (0: render in the handler's process)
+RENDER_PROCESSES = int(os.environ.get('RENDER_PROCESSES', '0'))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_disabled = False
+
+
+def encode_jpeg(image: Image.Image, quality: int) -> BytesIO:
+    """JPEG in a buffer rewound for reading (uploaded as is, without a bytes copy)"""
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    buffer.seek(0)
+    return buffer
+
+
+def encode_thumbnail(image: Image.Image, size: Tuple[int, int], quality: int) -> BytesIO:
+    thumbnail = image.convert('RGB')
+    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+    return encode_jpeg(thumbnail, quality)
+
+
+def render_jpegs(compositor: Compositor, job: Dict[str, Any]) -> Tuple[BytesIO, BytesIO]:
+    """One variant and its thumbnail, encoded"""
+    canvas = compositor.render(job['size'], job['message'], job['colors'], job['scale'])
+    return encode_jpeg(canvas, VARIANT_QUALITY), encode_thumbnail(canvas, job['thumbnail_size'], job['thumbnail_quality'])
+
+
+class _Deferred(Future):
+    """Future computed by the first caller of result()"""
+
+    def __init__(self, compute: Callable[[], Tuple[BytesIO, BytesIO]]):
+        super().__init__()
+        self.compute = compute
+
+    def result(self, timeout=None):
+        if not self.done():
+            try:
+                self.set_result(self.compute())
+            except Exception as e:
+                self.set_exception(e)
+        return super().result(timeout)
+
+
+class LocalRenderer:
+    """Renders in this process, from a compositor built on first use"""
+
+    def __init__(self, get_compositor: Callable[[], Compositor]):
+        self.get_compositor = get_compositor
+
+    def submit(self, job: Dict[str, Any]) -> Future:
+        return _Deferred(lambda: render_jpegs(self.get_compositor(), job))
+
+    def close(self):
+        pass
+
+
+class PooledRenderer:
+    """Renders in the process pool, from a shared-memory copy of the source"""
+
+    def __init__(self, pool: ProcessPoolExecutor, image: Image.Image):
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        array = np.asarray(image)
+
+        self.pool = pool
+        self.futures = []
+        self.memory = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        np.ndarray(array.shape, dtype=np.uint8, buffer=self.memory.buf)[...] = array
+        self.source = {'name': self.memory.name, 'shape': array.shape, 'mode': image.mode}
+
+    def submit(self, job: Dict[str, Any]) -> Future:
+        future = self.pool.submit(_render_shared, self.source, job)
+        self.futures.append(future)
+        return future
+
+    def close(self):
+        """Release the source once every render has finished (pool processes keep their mapping until the next source)"""
+        for future in self.futures:
+            future.cancel()
+        self.memory.close()
+        self.memory.unlink()
+
+        # A pool process died (out of memory, say): the pool is unusable, so the next product starts a new one
+        if any(future.done() and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) for future in self.futures):
+            _discard_pool(self.pool)
+
+
+def renderer(get_image: Callable[[], Image.Image], get_compositor: Callable[[], Compositor], renders: int):
+    """Pooled renderer when there are several renders and a pool is available, local otherwise"""
+    pool = _get_pool() if renders > 1 else None
+    if pool:
+        try:
+            return PooledRenderer(pool, get_image())
+        except OSError as e:
+            _disable(e)
+    return LocalRenderer(get_compositor)
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by every invocation of this process, created on first use"""
+    global _pool
+    if _pool is None and RENDER_PROCESSES > 0 and not _pool_disabled:
+        try:
+            # Spawned rather than forked: the handler's process runs upload threads, which forking would copy mid-flight
+            _pool = ProcessPoolExecutor(max_workers=RENDER_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        except OSError as e:
+            _disable(e)
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _disable(error: Exception):
+    global _pool_disabled
+    logger.warning(f"Process-pool rendering unavailable, rendering in process: {str(error)}")
+    _pool_disabled = True
+
+
+# Pool process state: the mapped source and its compositor (one source at a time)
+_attached: Dict[str, Any] = {}
+
+
+def _render_shared(source: Dict[str, Any], job: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Render in a pool process; the JPEGs go back to the handler's process as bytes"""
+    if _attached.get('name') != source['name']:
+        _detach()
+        # Spawned pool processes share the handler's resource tracker, which the creator's unlink settles
+        memory = shared_memory.SharedMemory(name=source['name'])
+        array = np.ndarray(source['shape'], dtype=np.uint8, buffer=memory.buf)
+        _attached.update(name=source['name'], memory=memory, compositor=Compositor(Image.fromarray(array, source['mode'])))
+    image_jpeg, thumbnail_jpeg = render_jpegs(_attached['compositor'], job)
+    return image_jpeg.getvalue(), thumbnail_jpeg.getvalue()
+
+
+def _detach():
+    memory = _attached.pop('memory', None)
+    _attached.clear()
+    if memory is not None:
+        try:
+            memory.close()
+        except BufferError:
+            # Still viewed by a lingering image; the mapping goes when that is collected
+            pass
@@ -0,0 +1,119 @@
+"""
+Variants Queue Worker
+
+Runs variant rendering as a long-lived process on a container host,
+consuming the jobs the parser and generator send to VARIANTS_QUEUE_URL.
+Compositing is CPU-bound, so products render in a pool of WORKER_PROCESSES
+processes (one per core by default); each imports the handler once and
+keeps its clients, fonts and caches warm. A render process that dies
+(out of memory, say) breaks the pool; its jobs are redelivered and the
+pool is replaced. Every process decodes sources
+within MAX_SOURCE_PIXELS, so size the host's memory for that many at once.
+A product's specs can additionally be spread over RENDER_PROCESSES render
+processes (see renderer.py); keep the product of the two near the core count.
+
+    python worker.py
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Tuple
+
+import boto3
+
+from shared.queue_worker import QueuePoller, POLL_WAIT_SECONDS, RECEIVE_ERROR_DELAY, configure_logging, stop_on_signals
+
+logger = logging.getLogger()
+
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES') or os.cpu_count() or 1)
+
+
+def warm():
+    """Pool process initializer: load the handler (and its clients) before the first job"""
+    configure_logging()
+    import app  # noqa: F401
+
+
+def render(body: str) -> Dict[str, Any]:
+    import app
+    return app.handler(json.loads(body), None)
+
+
+def start_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=WORKER_PROCESSES, initializer=warm)
+
+
+def collect(done, pending: Dict[Any, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Records of the finished renders to acknowledge, and whether the pool broke"""
+    processed, broken = [], False
+    for future in done:
+        record = pending.pop(future)
+        try:
+            # Failures are recorded by the handler (like the Lambda's async invocation, not retried)
+            future.result()
+            processed.append(record)
+        except BrokenProcessPool:
+            broken = True
+            logger.error(f"Render process pool broke on message {record['messageId']}, which will be redelivered")
+        except Exception as e:
+            # The message is redelivered after its visibility timeout
+            logger.error(f"Variants worker failed on message {record['messageId']}: {str(e)}", exc_info=True)
+    return processed, broken
+
+
+def main():
+    configure_logging()
+    poller = QueuePoller(boto3.client('sqs'), os.environ['VARIANTS_QUEUE_URL'])
+    stopping = stop_on_signals()
+    logger.info(f"Variants worker consuming {poller.queue_url} with {WORKER_PROCESSES} processes")
+    
+    pending = {}
+    pool = start_pool()
+    try:
+        while pending or not stopping.is_set():
+            room = WORKER_PROCESSES - len(pending)
+            receive_failed = broken = False
+            if room and not stopping.is_set():
+                # Only take what can start now; poll briefly while renders are running so their results are collected
+                try:
+                    records = poller.receive(room, 1 if pending else POLL_WAIT_SECONDS)
+                except Exception as e:
+                    logger.error(f"Failed to receive from {poller.queue_url}: {str(e)}")
+                    records, receive_failed = [], True
+                for record in records:
+                    try:
+                        pending[pool.submit(render, record['body'])] = record
+                    except BrokenProcessPool:
+                        # Left on the queue: redelivered after its visibility timeout, to the new pool
+                        broken = True
+                room = WORKER_PROCESSES - len(pending)
+            if not pending and not broken:
+                if receive_failed:
+                    stopping.wait(RECEIVE_ERROR_DELAY)
+                continue
+            
+            # After a failed receive, back off while collecting the renders that finish meanwhile
+            timeout = RECEIVE_ERROR_DELAY if receive_failed else 0
+            done, _ = wait(pending, timeout=timeout if room and not stopping.is_set() else None, return_when=FIRST_COMPLETED)
+            processed, pool_failed = collect(done, pending)
+            
+            if broken or pool_failed:
+                # A render process died (out of memory, say) and took the pool with it: the jobs still in it
+                # fail too and are redelivered, and later jobs go to a new pool
+                finished, _ = collect(wait(pending).done, pending)
+                processed.extend(finished)
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = start_pool()
+                logger.warning("Restarted the render process pool")
+            poller.delete(processed)
+    finally:
+        pool.shutdown()
+    
+    logger.info("Variants worker stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,7 @@ echo ""
 if [ -f "terraform/terraform.tfstate" ]; then
     export S3_BUCKET_NAME=$(cd terraform && terraform output -raw campaign_bucket_name 2>/dev/null)
     echo "✅ S3 Bucket: $S3_BUCKET_NAME"
+    export STATUS_TOPIC_ARN=$(cd terraform && terraform output -raw sns_status_topic_arn 2>/dev/null)
 fi
 
 # Set defaults if not found
@@ -82,13 +82,14 @@ for LAMBDA in "${LAMBDAS[@]}"; do
             --tags Key=Environment,Value=$ENVIRONMENT Key=Project,Value=$PROJECT_NAME
     }
     
-    # Build Docker image
+    # Build Docker image (context is lambda/ so images can include lambda/shared/)
     echo "Building Docker image..."
     docker build \
         --build-arg BUILD_DATE=$(date -u +'%Y-%m-%dT%H:%M:%SZ') \
         --build-arg VERSION=$VERSION \
+        -f lambda/$LAMBDA/Dockerfile \
         -t $REPO_NAME \
-        lambda/$LAMBDA
+        lambda
     
     if [ $? -ne 0 ]; then
         echo "ERROR: Docker build failed for $LAMBDA"
@@ -0,0 +1,29 @@
+# Campaign workflow state: task states and the per-campaign completion counter
+resource "aws_dynamodb_table" "workflow" {
+  name         = "${var.environment}-${var.project_name}-workflow"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "campaign_id"
+  range_key    = "task"
+
+  attribute {
+    name = "campaign_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "task"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = merge(
+    var.tags,
+    {
+      Name = "${var.environment}-workflow"
+    }
+  )
+}
@@ -48,6 +48,7 @@ resource "aws_iam_policy" "lambda_policy" {
           "s3:GetObject",
           "s3:PutObject",
           "s3:DeleteObject",
+          "s3:AbortMultipartUpload",
           "s3:ListBucket"
         ]
         Resource = [
@@ -64,9 +65,45 @@ resource "aws_iam_policy" "lambda_policy" {
           "sqs:GetQueueAttributes",
           "sqs:ChangeMessageVisibility"
         ]
-        Resource = [
+        Resource = concat([
           aws_sqs_queue.campaign_queue.arn,
-          aws_sqs_queue.campaign_dlq.arn
+          aws_sqs_queue.campaign_dlq.arn,
+          aws_sqs_queue.generation_dlq.arn,
+          aws_sqs_queue.variants_queue.arn,
+          aws_sqs_queue.variants_dlq.arn
+        ], [for queue in aws_sqs_queue.generation_queue : queue.arn])
+      },
+      # Generation and variants work
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = concat([
+          aws_sqs_queue.variants_queue.arn
+        ], [for queue in aws_sqs_queue.generation_queue : queue.arn])
+      },
+      # Status events for the dashboard
+      {
+        Effect = "Allow"
+        Action = [
+          "sns:Publish"
+        ]
+        Resource = [
+          aws_sns_topic.status.arn
+        ]
+      },
+      # Campaign workflow state
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:ConditionCheckItem"
+        ]
+        Resource = [
+          aws_dynamodb_table.workflow.arn
         ]
       },
       # Lambda Invocation (for Lambda calling Lambda)
@@ -79,15 +116,32 @@ resource "aws_iam_policy" "lambda_policy" {
           "arn:aws:lambda:${var.aws_region}:${var.aws_account_id}:function:${var.environment}-${var.project_name}-*"
         ]
       },
+      # Adaptive generation concurrency (resizes the generation queue event sources)
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:ListEventSourceMappings"
+        ]
+        Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:UpdateEventSourceMapping"
+        ]
+        Resource = [
+          "arn:aws:lambda:${var.aws_region}:${var.aws_account_id}:event-source-mapping:*"
+        ]
+      },
       # Amazon Bedrock (for Titan Image Generator)
       {
         Effect = "Allow"
         Action = [
           "bedrock:InvokeModel"
         ]
-        Resource = [
+        Resource = concat([
           "arn:aws:bedrock:${var.aws_region}::foundation-model/${var.bedrock_model_id}"
-        ]
+        ], [for path in var.generation_fallback_paths : "arn:aws:bedrock:${path.region}::foundation-model/${path.model}"])
       }
     ]
   })
@@ -15,6 +15,12 @@ resource "aws_lambda_function" "parser" {
       S3_BUCKET_NAME       = aws_s3_bucket.campaign_bucket.id
       GENERATOR_FUNCTION   = "${var.environment}-${var.project_name}-generator"
       VARIANTS_FUNCTION    = "${var.environment}-${var.project_name}-variants"
+      VARIANTS_QUEUE_URL   = var.worker_mode ? aws_sqs_queue.variants_queue.url : ""
+      GENERATION_QUEUE_URLS = jsonencode({ for name, queue in aws_sqs_queue.generation_queue : name => queue.url })
+      GENERATION_PRIORITY_CLASSES = jsonencode(var.generation_priority_classes)
+      STATUS_TOPIC_ARN     = aws_sns_topic.status.arn
+      WORKFLOW_TABLE       = aws_dynamodb_table.workflow.name
+      MANIFEST_GZIP        = var.manifest_gzip
       LOG_LEVEL            = "INFO"
     }
   }
@@ -45,11 +51,20 @@ resource "aws_lambda_function" "generator" {
   
   environment {
     variables = {
-      ENVIRONMENT        = var.environment
-      S3_BUCKET_NAME     = aws_s3_bucket.campaign_bucket.id
-      VARIANTS_FUNCTION  = "${var.environment}-${var.project_name}-variants"
-      BEDROCK_MODEL_ID   = var.bedrock_model_id
-      LOG_LEVEL          = "INFO"
+      ENVIRONMENT                    = var.environment
+      S3_BUCKET_NAME                 = aws_s3_bucket.campaign_bucket.id
+      VARIANTS_FUNCTION              = "${var.environment}-${var.project_name}-variants"
+      VARIANTS_QUEUE_URL             = var.worker_mode ? aws_sqs_queue.variants_queue.url : ""
+      BEDROCK_MODEL_ID               = var.bedrock_model_id
+      GENERATION_MAX_RECEIVE_COUNT   = var.generation_max_receive_count
+      GENERATION_PRIORITY_CLASSES    = jsonencode(var.generation_priority_classes)
+      BEDROCK_LATENCY_TARGET_SECONDS = var.bedrock_latency_target_seconds
+      GENERATION_FALLBACK_PATHS      = jsonencode(var.generation_fallback_paths)
+      HEDGE_AFTER_SECONDS            = var.hedge_after_seconds
+      STATUS_TOPIC_ARN               = aws_sns_topic.status.arn
+      WORKFLOW_TABLE                 = aws_dynamodb_table.workflow.name
+      MANIFEST_GZIP                  = var.manifest_gzip
+      LOG_LEVEL                      = "INFO"
     }
   }
 
@@ -79,9 +94,14 @@ resource "aws_lambda_function" "variants" {
   
   environment {
     variables = {
-      ENVIRONMENT    = var.environment
-      S3_BUCKET_NAME = aws_s3_bucket.campaign_bucket.id
-      LOG_LEVEL      = "INFO"
+      ENVIRONMENT            = var.environment
+      S3_BUCKET_NAME         = aws_s3_bucket.campaign_bucket.id
+      STATUS_TOPIC_ARN       = aws_sns_topic.status.arn
+      WORKFLOW_TABLE         = aws_dynamodb_table.workflow.name
+      MANIFEST_GZIP          = var.manifest_gzip
+      MAX_SOURCE_PIXELS      = var.variants_max_source_pixels
+      MAX_FULL_DECODE_PIXELS = var.variants_max_full_decode_pixels
+      LOG_LEVEL              = "INFO"
     }
   }
 
@@ -103,6 +123,9 @@ resource "aws_lambda_event_source_mapping" "sqs_trigger" {
   event_source_arn = aws_sqs_queue.campaign_queue.arn
   function_name    = aws_lambda_function.parser.arn
   
+  # Paused while queue workers consume the queue
+  enabled = !var.worker_mode
+  
   batch_size                         = 1
   maximum_batching_window_in_seconds = 0
   
@@ -113,3 +136,80 @@ resource "aws_lambda_event_source_mapping" "sqs_trigger" {
     aws_sqs_queue.campaign_queue
   ]
 }
+
+# SQS Event Source Mappings (generation work queues -> generator Lambda)
+resource "aws_lambda_event_source_mapping" "generation_trigger" {
+  for_each = var.generation_priority_classes
+
+  event_source_arn = aws_sqs_queue.generation_queue[each.key].arn
+  function_name    = aws_lambda_function.generator.arn
+  
+  # Paused while queue workers consume the queues
+  enabled = !var.worker_mode
+  
+  batch_size                         = 1
+  maximum_batching_window_in_seconds = 0
+  
+  # Each class gets its own share of Bedrock concurrency; the sum must fit the account's quota
+  scaling_config {
+    maximum_concurrency = each.value
+  }
+  
+  function_response_types = ["ReportBatchItemFailures"]
+  
+  # The generator's adaptive concurrency controller resizes these at runtime
+  lifecycle {
+    ignore_changes = [scaling_config]
+  }
+  
+  depends_on = [
+    aws_lambda_function.generator,
+    aws_sqs_queue.generation_queue
+  ]
+}
+
+# Scheduled rebuild of the existing-asset catalog (parser Lambda)
+resource "aws_cloudwatch_event_rule" "asset_catalog_rebuild" {
+  name                = "${var.environment}-${var.project_name}-asset-catalog"
+  description         = "Rebuild the existing-assets catalog"
+  schedule_expression = var.asset_catalog_schedule
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "asset_catalog_rebuild" {
+  rule  = aws_cloudwatch_event_rule.asset_catalog_rebuild.name
+  arn   = aws_lambda_function.parser.arn
+  input = jsonencode({ action = "rebuild_asset_catalog" })
+}
+
+resource "aws_lambda_permission" "asset_catalog_rebuild" {
+  statement_id  = "AllowAssetCatalogSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.parser.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.asset_catalog_rebuild.arn
+}
+
+# Scheduled compaction of campaign history into Parquet (parser Lambda)
+resource "aws_cloudwatch_event_rule" "analytics_compaction" {
+  name                = "${var.environment}-${var.project_name}-analytics"
+  description         = "Compact campaign manifests into Parquet analytics partitions"
+  schedule_expression = var.analytics_compaction_schedule
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "analytics_compaction" {
+  rule  = aws_cloudwatch_event_rule.analytics_compaction.name
+  arn   = aws_lambda_function.parser.arn
+  input = jsonencode({ action = "compact_analytics" })
+}
+
+resource "aws_lambda_permission" "analytics_compaction" {
+  statement_id  = "AllowAnalyticsCompactionSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.parser.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.analytics_compaction.arn
+}
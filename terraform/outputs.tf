@@ -20,6 +20,32 @@ output "sqs_dlq_url" {
   value       = aws_sqs_queue.campaign_dlq.url
 }
 
+output "sns_status_topic_arn" {
+  description = "ARN of the campaign status topic the dashboard subscribes to"
+  value       = aws_sns_topic.status.arn
+}
+
+output "sqs_generation_queue_urls" {
+  description = "URLs of the per-product generation work queues by priority class"
+  value       = { for name, queue in aws_sqs_queue.generation_queue : name => queue.url }
+}
+
+output "sqs_generation_dlq_url" {
+  description = "URL of the generation Dead Letter Queue (failed products)"
+  value       = aws_sqs_queue.generation_dlq.url
+}
+
+output "sqs_variants_queue_url" {
+  description = "URL of the variants work queue (consumed by queue workers in worker mode)"
+  value       = aws_sqs_queue.variants_queue.url
+}
+
+# DynamoDB
+output "workflow_table_name" {
+  description = "Name of the campaign workflow state table"
+  value       = aws_dynamodb_table.workflow.name
+}
+
 # ECR
 output "ecr_parser_repository_url" {
   description = "ECR repository URL for parser Lambda"
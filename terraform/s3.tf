@@ -67,4 +67,38 @@ resource "aws_s3_bucket_lifecycle_configuration" "campaign_bucket" {
       noncurrent_days = 30
     }
   }
+
+  rule {
+    id     = "cleanup-manifest-index"
+    status = "Enabled"
+
+    filter {
+      prefix = "manifests/by-date/"
+    }
+
+    expiration {
+      days = 90
+    }
+
+    noncurrent_version_expiration {
+      noncurrent_days = 1
+    }
+  }
+
+  rule {
+    id     = "cleanup-campaign-bundles"
+    status = "Enabled"
+
+    filter {
+      prefix = "bundles/"
+    }
+
+    expiration {
+      days = 7
+    }
+
+    noncurrent_version_expiration {
+      noncurrent_days = 1
+    }
+  }
 }
@@ -56,3 +56,89 @@ resource "aws_sqs_queue_policy" "allow_s3" {
     ]
   })
 }
+
+# Campaign Status Topic (status events fanned out to every dashboard process)
+# Each dashboard process subscribes a queue of its own, so sessions on different hosts all see every event
+resource "aws_sns_topic" "status" {
+  name = "${var.environment}-${var.project_name}-status"
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "${var.environment}-status-topic"
+      Description = "Campaign status events consumed by the dashboard"
+    }
+  )
+}
+
+# Generation Dead Letter Queue (products that exhausted their retries)
+resource "aws_sqs_queue" "generation_dlq" {
+  name                      = "${var.environment}-${var.project_name}-generation-dlq"
+  message_retention_seconds = 1209600 # 14 days
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "${var.environment}-generation-dlq"
+      Description = "Dead letter queue for failed product generations"
+    }
+  )
+}
+
+# Generation Work Queues (one per priority class, one message per product)
+resource "aws_sqs_queue" "generation_queue" {
+  for_each = var.generation_priority_classes
+
+  name                       = "${var.environment}-${var.project_name}-generation-${each.key}"
+  visibility_timeout_seconds = var.lambda_generator_timeout * 6 # AWS guidance for Lambda event sources
+  message_retention_seconds  = 345600                           # 4 days
+  receive_wait_time_seconds  = 20                               # Enable long polling
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.generation_dlq.arn
+    maxReceiveCount     = var.generation_max_receive_count
+  })
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "${var.environment}-generation-${each.key}-queue"
+      Description = "Per-product image generation work queue (${each.key} priority)"
+    }
+  )
+}
+
+# Variants Dead Letter Queue (jobs whose worker process crashed repeatedly)
+resource "aws_sqs_queue" "variants_dlq" {
+  name                      = "${var.environment}-${var.project_name}-variants-dlq"
+  message_retention_seconds = 1209600 # 14 days
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "${var.environment}-variants-dlq"
+      Description = "Dead letter queue for failed variant jobs"
+    }
+  )
+}
+
+# Variants Work Queue (consumed by variants queue workers in worker mode)
+resource "aws_sqs_queue" "variants_queue" {
+  name                       = "${var.environment}-${var.project_name}-variants"
+  visibility_timeout_seconds = var.lambda_variants_timeout * 6
+  message_retention_seconds  = 345600 # 4 days
+  receive_wait_time_seconds  = 20     # Enable long polling
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.variants_dlq.arn
+    maxReceiveCount     = var.generation_max_receive_count
+  })
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "${var.environment}-variants-queue"
+      Description = "Per-product variant rendering work queue (worker mode)"
+    }
+  )
+}
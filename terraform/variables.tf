@@ -77,6 +77,63 @@ variable "lambda_variants_timeout" {
   default     = 180
 }
 
+variable "variants_max_source_pixels" {
+  description = "Largest decoded source image (pixels) the variants Lambda accepts; JPEGs are decoded at reduced scale first"
+  type        = number
+  default     = 25000000
+}
+
+variable "variants_max_full_decode_pixels" {
+  description = "Largest PNG, WebP or other non-JPEG source (pixels) the variants Lambda accepts; these decode at full resolution before being reduced"
+  type        = number
+  default     = 12000000
+}
+
+# Generation Work Queue
+variable "generation_priority_classes" {
+  description = "Generation priority classes and the maximum concurrent generator invocations of each (minimum 2; must include standard)"
+  type        = map(number)
+  default = {
+    urgent   = 2
+    standard = 4
+    bulk     = 2
+  }
+}
+
+variable "generation_max_receive_count" {
+  description = "Generation attempts per product before the message moves to the DLQ"
+  type        = number
+  default     = 3
+}
+
+# Existing Asset Catalog
+variable "asset_catalog_schedule" {
+  description = "Schedule for rebuilding the existing-assets catalog"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+# Campaign Manifests
+variable "manifest_gzip" {
+  description = "Store campaign manifests gzip-compressed (Content-Encoding: gzip)"
+  type        = bool
+  default     = false
+}
+
+# Analytics Export
+variable "analytics_compaction_schedule" {
+  description = "Schedule for compacting campaign history into Parquet analytics partitions"
+  type        = string
+  default     = "rate(6 hours)"
+}
+
+# Queue Workers (container hosts)
+variable "worker_mode" {
+  description = "Run the stages as long-lived queue workers on container hosts: pauses the Lambda queue triggers and routes variants work through the variants queue"
+  type        = bool
+  default     = false
+}
+
 # ECR Configuration
 variable "ecr_image_tag" {
   description = "ECR image tag to deploy"
@@ -91,6 +148,29 @@ variable "bedrock_model_id" {
   default     = "amazon.titan-image-generator-v1"
 }
 
+variable "generation_fallback_paths" {
+  description = "Fallback chain after the primary model: Titan-compatible model ids, regions and quality tiers tried in order"
+  type = list(object({
+    model   = string
+    region  = string
+    quality = string
+    cost    = optional(number)
+  }))
+  default = []
+}
+
+variable "hedge_after_seconds" {
+  description = "Start the next generation path in parallel if no image arrives within this many seconds (0 disables hedging)"
+  type        = number
+  default     = 0
+}
+
+variable "bedrock_latency_target_seconds" {
+  description = "Bedrock latency above which the adaptive concurrency controller stops increasing the generation limit"
+  type        = number
+  default     = 30
+}
+
 # CloudWatch Configuration
 variable "cloudwatch_log_retention_days" {
   description = "CloudWatch log retention in days"
@@ -0,0 +1,112 @@
+"""
+Compositor benchmark
+
+Times one product's variants rendered by the variants Lambda's Compositor
+against the per-variant Pillow renderer it replaced (generate_variant before
+the compositor: a fresh canvas, resize and paste per variant, the message
+drawn twice), full size and preview, for RGB, RGBA and palette sources.
+Not collected by pytest; run it directly:
+
+    python tests/benchmark_compositor.py [--repeat N] [--encode]
+"""
+
+import argparse
+import statistics
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from conftest import stage_path
+
+stage_path('variants')
+
+from shared.tiers import VARIANT_SIZES  # noqa: E402
+from compositor import Compositor  # noqa: E402
+from test_compositor import source, MESSAGE, COLORS  # noqa: E402
+
+SOURCE_SIZE = (1024, 1024)
+
+
+def previous_render(image: Image.Image, size, message: str, colors: list, scale: float) -> Image.Image:
+    """The replaced per-variant renderer, as it was (no scrim, no alpha blending)"""
+    canvas = Image.new('RGB', size, color=colors[0] if colors else '#FFFFFF')
+
+    img_ratio = image.width / image.height
+    canvas_ratio = size[0] / size[1]
+    if img_ratio > canvas_ratio:
+        new_width = int(size[0] * 0.8)
+        new_height = int(new_width / img_ratio)
+    else:
+        new_height = int(size[1] * 0.7)
+        new_width = int(new_height * img_ratio)
+
+    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    x = (size[0] - new_width) // 2
+    y = (size[1] - new_height) // 2 - int(50 * scale)
+    canvas.paste(resized, (x, y))
+
+    draw = ImageDraw.Draw(canvas)
+    text = message[:50]
+    text_y = size[1] - int(100 * scale)
+    bbox = draw.textbbox((0, 0), text)
+    text_x = (size[0] - (bbox[2] - bbox[0])) // 2
+    shadow_color = '#000000' if colors and colors[0] != '#000000' else '#FFFFFF'
+    draw.text((text_x + 2, text_y + 2), text, fill=shadow_color)
+    draw.text((text_x, text_y), text, fill='#FFFFFF')
+    return canvas
+
+
+def scaled(size, scale: float):
+    return (int(size[0] * scale), int(size[1] * scale))
+
+
+def encoded(canvas: Image.Image):
+    canvas.save(BytesIO(), format='JPEG', quality=90)
+
+
+def compositor_variants(image, scale: float, encode: bool):
+    compositor = Compositor(image)
+    for size in VARIANT_SIZES.values():
+        canvas = compositor.render(scaled(size, scale), MESSAGE, COLORS, scale)
+        if encode:
+            encoded(canvas)
+
+
+def previous_variants(image, scale: float, encode: bool):
+    for size in VARIANT_SIZES.values():
+        canvas = previous_render(image, scaled(size, scale), MESSAGE, COLORS, scale)
+        if encode:
+            encoded(canvas)
+
+
+def timed(func, *args, repeat: int) -> float:
+    """Median wall time of func(*args) in milliseconds"""
+    func(*args)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--encode', action='store_true', help='include the JPEG encode of each variant')
+    args = parser.parse_args()
+
+    print(f"{len(VARIANT_SIZES)} variants per product, {SOURCE_SIZE[0]}x{SOURCE_SIZE[1]} source, median of {args.repeat} runs"
+          f"{', JPEG encode included' if args.encode else ''}")
+    print(f"{'source':<8}{'scale':>6}{'previous ms':>14}{'compositor ms':>16}{'speedup':>10}")
+    for mode in ('RGB', 'RGBA', 'P'):
+        image = source(mode, SOURCE_SIZE)
+        for scale in (1.0, 0.5):
+            previous_ms = timed(previous_variants, image, scale, args.encode, repeat=args.repeat)
+            compositor_ms = timed(compositor_variants, image, scale, args.encode, repeat=args.repeat)
+            print(f"{mode:<8}{scale:>6}{previous_ms:>14.1f}{compositor_ms:>16.1f}{previous_ms / compositor_ms:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
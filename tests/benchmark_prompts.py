@@ -0,0 +1,107 @@
+"""
+Prompt compiler benchmark
+
+Times prompt building for large multi-product briefs: the generator's
+previous build_prompt (up to three f-string variants per product, then
+blunt truncation) against the PromptCompiler, cold (a new campaign, every
+product compiled once) and warm (the same products again, as on retries
+and regenerations in a warm container). Not collected by pytest; run it
+directly:
+
+    python tests/benchmark_prompts.py [--repeat N]
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from conftest import stage_path  # noqa: F401 (puts lambda/ on the path)
+
+from shared.prompts import MAX_PROMPT_LENGTH, PromptCompiler
+from test_prompts import generated_brief, MESSAGE
+
+BRIEF_SIZES = (100, 1000, 10000)
+
+
+def previous_build_prompt(product_name: str, product_description: str, campaign_message: str, target_audience: str, target_region: str) -> str:
+    """The generator's build_prompt before the compiler, as it was (minus its log lines)"""
+    base_style = "High-end commercial advertising, studio lighting, clean white background, photorealistic, 4K quality, centered composition."
+
+    full_prompt = f"""Professional commercial product photography of {product_name}.
+
+Product Details: {product_description}
+
+Target Audience: {target_audience}
+Target Market: {target_region}
+Campaign Message: {campaign_message}
+
+Style: {base_style}"""
+    if len(full_prompt) <= MAX_PROMPT_LENGTH:
+        return full_prompt
+
+    prompt_without_audience = f"""Professional commercial product photography of {product_name}.
+
+Product Details: {product_description}
+
+Target Market: {target_region}
+Campaign Message: {campaign_message}
+
+Style: {base_style}"""
+    if len(prompt_without_audience) <= MAX_PROMPT_LENGTH:
+        return prompt_without_audience
+
+    minimal_prompt = f"""Professional product photography of {product_name}.
+
+{product_description}
+
+Style: {base_style}"""
+    if len(minimal_prompt) <= MAX_PROMPT_LENGTH:
+        return minimal_prompt
+    return minimal_prompt[:MAX_PROMPT_LENGTH]
+
+
+def previous(brief):
+    return [previous_build_prompt(name, description, MESSAGE, audience, region) for name, description, region, audience in brief]
+
+
+def compiled(brief, compiler=None):
+    compiler = compiler or PromptCompiler(MESSAGE)
+    return [compiler.compile(name, description, region, audience) for name, description, region, audience in brief]
+
+
+def timed(func, *args, repeat: int) -> float:
+    """Median wall time of func(*args) in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Both log every compaction; the benchmark measures building, not logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"Median of {args.repeat} runs; 'style kept' counts prompts ending with a complete Style section")
+    print(f"{'products':>9}{'previous ms':>14}{'cold ms':>10}{'warm ms':>10}{'previous style kept':>22}{'compiled style kept':>22}")
+    for products in BRIEF_SIZES:
+        brief = generated_brief(products)
+        warm = PromptCompiler(MESSAGE)
+        compiled(brief, warm)
+
+        previous_ms = timed(previous, brief, repeat=args.repeat)
+        cold_ms = timed(compiled, brief, repeat=args.repeat)
+        warm_ms = timed(compiled, brief, warm, repeat=args.repeat)
+        kept_before = sum(p.endswith('composition.') for p in previous(brief))
+        kept_after = sum(p.endswith(('composition.', 'photorealistic.')) for p in compiled(brief))
+        print(f"{products:>9}{previous_ms:>14.1f}{cold_ms:>10.1f}{warm_ms:>10.1f}{kept_before:>16}/{products:<5}{kept_after:>16}/{products:<5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Test configuration: the Lambdas' shared modules import as `shared`, the
+way the Lambda images lay them out, and the dashboard package imports
+from the repository root.
+"""
+
+import os
+import sys
+import importlib.util
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (ROOT, os.path.join(ROOT, 'lambda')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def stage_path(stage: str):
+    """Put a Lambda stage's modules (lambda/<stage>) on the import path"""
+    path = os.path.join(ROOT, 'lambda', stage)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def stage_module(stage: str, name: str):
+    """Import lambda/<stage>/<name>.py as <stage>_<name>, for modules whose names the stages share (worker, app)"""
+    stage_path(stage)
+    module_name = f"{stage}_{name}"
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, 'lambda', stage, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+class MemoryBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class MemoryS3:
+    """In-memory stand-in for the S3 calls of listing-based jobs, recording every listing (prefix, delimiter)"""
+
+    def __init__(self):
+        self.objects = {}
+        self.listings = []
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        data = Body.encode() if isinstance(Body, str) else Body
+        self.objects[Key] = (data, datetime.now(timezone.utc))
+        return {'ETag': f'"{len(self.objects)}"'}
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self.put_object(bucket, key, fileobj.read())
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        return {'Body': MemoryBody(self.objects[Key][0]), 'ETag': '"etag"'}
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix='', Delimiter=None, **kwargs):
+        self.listings.append((Prefix, Delimiter))
+        contents, prefixes = [], set()
+        for key in sorted(self.objects):
+            if not key.startswith(Prefix):
+                continue
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                prefixes.add(Prefix + rest.split(Delimiter, 1)[0] + Delimiter)
+            else:
+                contents.append({'Key': key, 'LastModified': self.objects[key][1]})
+        yield {'Contents': contents, 'CommonPrefixes': [{'Prefix': p} for p in sorted(prefixes)]}
@@ -0,0 +1,79 @@
+"""Analytics compaction: changed dates found through the manifest date index"""
+
+import io
+import json
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import MemoryS3, stage_path
+from shared.costs import CostLedger
+from shared.manifest import ManifestStore, LocalLogSequence, INDEX_PREFIX
+
+stage_path('parser')
+
+from analytics import compact_analytics, ANALYTICS_PREFIX  # noqa: E402
+
+BUCKET = 'campaigns'
+
+
+@pytest.fixture
+def s3(tmp_path):
+    s3 = MemoryS3()
+    manifests = ManifestStore(s3, BUCKET, LocalLogSequence(str(tmp_path / 'sequences')))
+    for campaign_id in ('spring-20250101-000000', 'summer-20250102-000000'):
+        manifests.save(campaign_id, {
+            'campaign_id': campaign_id,
+            'status': 'completed',
+            'products': [{'index': 0, 'name': 'Bottle', 'status': 'completed', 'variants_count': 5, 'timings': {'throttles': 1}}]
+        })
+        CostLedger(s3, BUCKET).record(campaign_id, 'generate', 0, Decimal('4'))
+    return s3
+
+
+def read_partition(s3, date):
+    data = s3.objects[f"{ANALYTICS_PREFIX}date={date}/products.parquet"][0]
+    return pq.read_table(io.BytesIO(data)).to_pylist()
+
+
+def test_compaction_reads_only_index_and_campaign_prefixes(s3):
+    assert compact_analytics(s3, BUCKET) == {'dates': 2, 'rows': 2}
+
+    rows = read_partition(s3, '2025-01-01')
+    assert [(r['campaign_id'], r['throttles'], r['cost_cents']) for r in rows] == [('spring-20250101-000000', 1, 4.0)]
+    assert ('output/', None) not in s3.listings
+    assert not any(prefix in ('ledger/', 'ledger/campaigns/') for prefix, _ in s3.listings)
+
+
+def test_unchanged_dates_are_skipped(s3):
+    compact_analytics(s3, BUCKET)
+    assert compact_analytics(s3, BUCKET) == {'dates': 0, 'rows': 0}
+
+    ManifestStore(s3, BUCKET).save('summer-20250102-000000', {'campaign_id': 'summer-20250102-000000', 'products': []})
+    assert compact_analytics(s3, BUCKET) == {'dates': 1, 'rows': 0}
+
+
+def test_full_rebuild_indexes_older_campaigns(s3):
+    for key in [key for key in s3.objects if key.startswith(INDEX_PREFIX)]:
+        del s3.objects[key]
+
+    assert compact_analytics(s3, BUCKET, full=True) == {'dates': 2, 'rows': 2}
+    assert ('output/', '/') in s3.listings
+
+
+def test_state_keeps_per_date_totals(s3):
+    compact_analytics(s3, BUCKET)
+
+    state = json.loads(s3.objects['analytics/_state.json'][0])
+    assert state['dates'] == {
+        '2025-01-01': {'campaigns': 1, 'products': 1, 'variants': 5},
+        '2025-01-02': {'campaigns': 1, 'products': 1, 'variants': 5}
+    }
+
+    # Incremental runs keep the totals of dates they do not rebuild
+    ManifestStore(s3, BUCKET).save('summer-20250102-000000', {'campaign_id': 'summer-20250102-000000', 'products': []})
+    compact_analytics(s3, BUCKET)
+    state = json.loads(s3.objects['analytics/_state.json'][0])
+    assert set(state['dates']) == {'2025-01-01', '2025-01-02'}
+    assert state['dates']['2025-01-02']['products'] == 0
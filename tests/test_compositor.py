@@ -0,0 +1,105 @@
+"""Variant compositor: output matches the per-variant Pillow rendering it replaced"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from conftest import stage_path
+
+stage_path('variants')
+
+from compositor import Compositor, SCRIM_HEIGHT, SCRIM_OPACITY, FIT_WIDTH, FIT_HEIGHT  # noqa: E402
+
+MESSAGE = 'Spring Collection: fresh looks for the season ahead'
+COLORS = ['#1E3A8A', '#FFFFFF']
+
+# Pillow and the compositor round blends differently by at most a level or two
+TOLERANCE = 2
+
+
+def pillow_render(image: Image.Image, size, message: str, colors: list, scale: float = 1.0) -> Image.Image:
+    """Reference: one Pillow canvas per variant, composed with paste and draw calls"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    width, height = size
+    canvas = Image.new('RGB', size, color=colors[0] if colors else '#FFFFFF')
+
+    img_ratio = image.width / image.height
+    if img_ratio > width / height:
+        new_width = max(1, int(width * FIT_WIDTH))
+        new_height = max(1, int(new_width / img_ratio))
+    else:
+        new_height = max(1, int(height * FIT_HEIGHT))
+        new_width = max(1, int(new_height * img_ratio))
+    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    x = (width - new_width) // 2
+    y = (height - new_height) // 2 - int(50 * scale)
+    canvas.paste(resized.convert('RGB'), (x, y), resized if resized.mode == 'RGBA' else None)
+
+    band = int(height * SCRIM_HEIGHT)
+    if band > 0:
+        ramp = np.linspace(0, SCRIM_OPACITY * 255, band, dtype=np.float32).astype(np.uint8)
+        mask = Image.fromarray(np.repeat(ramp[:, None], width, axis=1), 'L')
+        canvas.paste((0, 0, 0), (0, height - band, width, height), mask)
+
+    draw = ImageDraw.Draw(canvas)
+    text = message[:50]
+    bbox = draw.textbbox((0, 0), text)
+    text_x = (width - (bbox[2] - bbox[0])) // 2
+    text_y = height - int(100 * scale)
+    shadow_color = '#000000' if colors and colors[0] != '#000000' else '#FFFFFF'
+    draw.text((text_x + 2, text_y + 2), text, fill=shadow_color)
+    draw.text((text_x, text_y), text, fill='#FFFFFF')
+    return canvas
+
+
+def source(mode: str, size=(640, 480)) -> Image.Image:
+    """Gradient product shot with a transparent margin, in the requested mode"""
+    width, height = size
+    xs, ys = np.meshgrid(np.linspace(0, 255, width), np.linspace(0, 255, height))
+    rgba = np.stack([xs, ys, 255 - xs, np.full_like(xs, 255)], axis=-1).astype(np.uint8)
+    rgba[:height // 8, :, 3] = 0
+    rgba[:, :width // 10, 3] = 96
+    image = Image.fromarray(rgba, 'RGBA')
+    if mode == 'RGB':
+        return image.convert('RGB')
+    if mode == 'P':
+        return image.convert('RGB').quantize(64)
+    if mode == 'PA':
+        # Palette image whose top-left colour is transparent (GIF/PNG-8 style)
+        palette = image.convert('RGB').quantize(64)
+        palette.info['transparency'] = palette.getpixel((0, 0))
+        return palette
+    return image
+
+
+def assert_equivalent(image, size, scale=1.0, colors=COLORS):
+    expected = np.asarray(pillow_render(image, size, MESSAGE, colors, scale), dtype=np.int16)
+    compositor = Compositor(image)
+    actual = np.asarray(compositor.render(size, MESSAGE, colors, scale), dtype=np.int16)
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() <= TOLERANCE
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'P'])
+@pytest.mark.parametrize('size', [(1080, 1080), (1080, 1920), (1200, 627), (540, 315)])
+def test_matches_pillow_rendering(mode, size):
+    assert_equivalent(source(mode), size, scale=0.5 if size == (540, 315) else 1.0)
+
+
+def test_palette_with_transparency_is_blended():
+    image = source('PA')
+    assert image.mode == 'P' and 'transparency' in image.info
+    assert_equivalent(image, (600, 600))
+
+
+@pytest.mark.parametrize('size', [(1, 1), (3, 2), (16, 16), (40, 9)])
+def test_tiny_canvases(size):
+    assert_equivalent(source('RGBA'), size, scale=0.05)
+
+
+def test_shared_fits_and_masks_do_not_leak_between_renders():
+    compositor = Compositor(source('RGBA'))
+    first = np.asarray(compositor.render((1080, 1080), MESSAGE, COLORS)).copy()
+    compositor.render((1080, 1920), MESSAGE, ['#000000'])
+    assert np.array_equal(np.asarray(compositor.render((1080, 1080), MESSAGE, COLORS)), first)
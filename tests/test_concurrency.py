@@ -0,0 +1,84 @@
+"""Adaptive concurrency: event source mappings converge on the target shares"""
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import stage_path
+
+stage_path('generator')
+
+from concurrency import ConcurrencyController  # noqa: E402
+
+CEILINGS = {'urgent': 10, 'bulk': 10}
+
+
+class FakeDynamo:
+    """Single-item table with the conditional put and update the controller uses"""
+
+    def __init__(self):
+        self.item = None
+
+    def get_item(self, **kwargs):
+        return {'Item': dict(self.item)} if self.item else {}
+
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeValues=None, **kwargs):
+        current = self.item['version']['N'] if self.item else None
+        expected = ExpressionAttributeValues[':version']['N'] if ExpressionAttributeValues else None
+        if current != expected:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+        self.item = dict(Item)
+
+    def update_item(self, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        self.item['applied'] = ExpressionAttributeValues[':applied']
+
+
+class FakeLambda:
+    def __init__(self):
+        self.concurrency = {}
+        self.failures = 0
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, **kwargs):
+        yield {'EventSourceMappings': [
+            {'UUID': f"uuid-{name}", 'EventSourceArn': f"arn:aws:sqs:us-east-1:1:dev-generation-{name}"}
+            for name in CEILINGS
+        ]}
+
+    def update_event_source_mapping(self, UUID, ScalingConfig):
+        if self.failures:
+            self.failures -= 1
+            raise ClientError({'Error': {'Code': 'ResourceInUseException'}}, 'UpdateEventSourceMapping')
+        self.concurrency[UUID] = ScalingConfig['MaximumConcurrency']
+
+
+@pytest.fixture
+def clients():
+    return FakeDynamo(), FakeLambda()
+
+
+def test_failed_resize_is_retried_while_shares_are_unchanged(clients):
+    dynamodb, lambda_client = clients
+    controller = ConcurrencyController('workflow', 'generator', CEILINGS, dynamodb, lambda_client)
+
+    lambda_client.failures = 1
+    controller.record(0, 1.0)
+    assert lambda_client.concurrency == {}
+
+    # The limit is already at its ceiling, so the target shares have not changed since the failure
+    controller.record(0, 1.0)
+    assert lambda_client.concurrency == {'uuid-urgent': 10, 'uuid-bulk': 10}
+
+
+def test_mappings_are_not_resized_once_applied(clients):
+    dynamodb, lambda_client = clients
+    controller = ConcurrencyController('workflow', 'generator', CEILINGS, dynamodb, lambda_client)
+
+    controller.record(0, 1.0)
+    lambda_client.concurrency.clear()
+    controller.record(0, 1.0)
+    assert lambda_client.concurrency == {}
+
+    controller.record(3, None)
+    assert lambda_client.concurrency == {'uuid-urgent': 7, 'uuid-bulk': 7}
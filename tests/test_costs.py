@@ -0,0 +1,57 @@
+"""Cost ledger: daily rollups keep overall spend equal to the sum of every entry"""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from conftest import MemoryS3
+from shared.costs import CostLedger, DAYS_PREFIX, CAMPAIGNS_PREFIX, ROLLUPS_PREFIX, aggregate
+
+BUCKET = 'campaigns'
+CHARGES = [
+    ('2025-01-01', 'spring-20250101-000000', 'generate', Decimal('4')),
+    ('2025-01-01', 'spring-20250101-000000', 'variants', Decimal('1')),
+    ('2025-01-02', 'summer-20250102-000000', 'generate', Decimal('0.8')),
+    ('2025-01-03', 'summer-20250102-000000', 'hedge', Decimal('4')),
+]
+
+
+@pytest.fixture
+def s3():
+    s3 = MemoryS3()
+    for number, (day, campaign_id, stage, cents) in enumerate(CHARGES):
+        name = f"{stage}-0-{cents}c-{number:016x}.json"
+        s3.put_object(BUCKET, f"{CAMPAIGNS_PREFIX}{campaign_id}/{name}", b'{}')
+        s3.put_object(BUCKET, f"{DAYS_PREFIX}{day}/{campaign_id}/{name}", b'')
+    return s3
+
+
+def every_entry(s3):
+    return aggregate(key for key in s3.objects if key.startswith(CAMPAIGNS_PREFIX))
+
+
+def test_rollup_covers_finished_days_only(s3):
+    ledger = CostLedger(s3, BUCKET)
+
+    assert ledger.roll_up(now=datetime(2025, 1, 3, 0, 30, tzinfo=timezone.utc)) == 1
+    assert [key for key in s3.objects if key.startswith(ROLLUPS_PREFIX)] == [f"{ROLLUPS_PREFIX}2025-01-01.json"]
+
+    assert ledger.roll_up(now=datetime(2025, 1, 4, 6, tzinfo=timezone.utc)) == 2
+    assert ledger.roll_up(now=datetime(2025, 1, 4, 6, tzinfo=timezone.utc)) == 0
+
+
+@pytest.mark.parametrize('rolled_up_through', [None, datetime(2025, 1, 2, 12, tzinfo=timezone.utc), datetime(2025, 1, 9, tzinfo=timezone.utc)])
+def test_total_matches_every_entry(s3, rolled_up_through):
+    ledger = CostLedger(s3, BUCKET)
+    if rolled_up_through:
+        ledger.roll_up(now=rolled_up_through)
+
+    s3.listings.clear()
+    totals = ledger.total_costs()
+    expected = every_entry(s3)
+
+    assert totals['total_cents'] == expected['total_cents'] == Decimal('9.8')
+    assert totals['by_stage'] == expected['by_stage']
+    assert totals['entries'] == expected['entries']
+    assert (CAMPAIGNS_PREFIX, None) not in s3.listings
@@ -0,0 +1,66 @@
+"""Generation fallback chain: hedging and accounting for losing paths"""
+
+import threading
+
+from conftest import stage_path
+
+stage_path('generator')
+
+from fallback import FallbackChain, GenerationPath  # noqa: E402
+
+PRIMARY = GenerationPath('model-a', 'us-east-1')
+HEDGE = GenerationPath('model-b', 'us-west-2')
+
+
+def test_losing_hedge_is_charged_before_generate_returns():
+    release_primary = threading.Event()
+    discarded = []
+
+    def invoke(path):
+        if path is PRIMARY:
+            release_primary.wait(5)
+        else:
+            # The winner returns; the loser finishes within the settle time
+            threading.Timer(0.05, release_primary.set).start()
+        return path.name.encode()
+
+    chain = FallbackChain([PRIMARY, HEDGE], hedge_after=0.05, settle_seconds=5)
+    image, path, attempt = chain.generate(invoke, lambda path, presumed: discarded.append((path, presumed)))
+
+    assert (image, path, attempt['hedged']) == (HEDGE.name.encode(), HEDGE, True)
+    assert discarded == [(PRIMARY, False)]
+
+
+def test_unsettled_loser_is_charged_as_presumed():
+    release_primary = threading.Event()
+    discarded = []
+
+    def invoke(path):
+        if path is PRIMARY:
+            release_primary.wait(5)
+        return path.name.encode()
+
+    chain = FallbackChain([PRIMARY, HEDGE], hedge_after=0.05, settle_seconds=0.05)
+    _, path, _ = chain.generate(invoke, lambda path, presumed: discarded.append((path, presumed)))
+    release_primary.set()
+
+    assert path is HEDGE
+    assert discarded == [(PRIMARY, True)]
+
+
+def test_failed_loser_is_not_charged():
+    release_primary = threading.Event()
+    discarded = []
+
+    def invoke(path):
+        if path is PRIMARY:
+            release_primary.wait(5)
+            raise RuntimeError('throttled')
+        threading.Timer(0.05, release_primary.set).start()
+        return b'image'
+
+    chain = FallbackChain([PRIMARY, HEDGE], hedge_after=0.05, settle_seconds=5)
+    _, path, _ = chain.generate(invoke, lambda path, presumed: discarded.append((path, presumed)))
+
+    assert path is HEDGE
+    assert discarded == []
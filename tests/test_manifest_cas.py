@@ -0,0 +1,100 @@
+"""Manifest compare-and-swap under concurrent product completions"""
+
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from shared.manifest import ManifestStore, LocalObjects, LocalLogSequence
+
+BUCKET = 'campaigns'
+CAMPAIGN = 'stress-campaign-20250101-000000'
+PRODUCTS = 100
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ManifestStore(LocalObjects(str(tmp_path / 'objects')), BUCKET, LocalLogSequence(str(tmp_path / 'sequences')))
+    store.save(CAMPAIGN, {
+        'campaign_id': CAMPAIGN,
+        'status': 'processing',
+        'expected_products': PRODUCTS,
+        'products': [{'index': i, 'status': 'processing'} for i in range(PRODUCTS)]
+    })
+    return store
+
+
+def test_simultaneous_completions(store):
+    """100 products finish at once: every update survives and exactly one caller completes the campaign"""
+    start = threading.Barrier(PRODUCTS)
+    completions = []
+    errors = []
+
+    def complete_product(index: int):
+        try:
+            start.wait()
+            store.update_product(CAMPAIGN, index, {'status': 'completed', 'variants': [{'platform': 'instagram_square'}]})
+            completions.append(store.complete_if_done(CAMPAIGN))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=complete_product, args=(i,)) for i in range(PRODUCTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert completions.count(True) == 1
+
+    manifest = store.compact(CAMPAIGN)
+    assert manifest['status'] == 'completed'
+    assert sorted(p['index'] for p in manifest['products'] if p['status'] == 'completed') == list(range(PRODUCTS))
+    assert all('variants' in p for p in manifest['products'])
+    assert store.log_entries(CAMPAIGN) == []
+
+
+def test_concurrent_modifications_are_not_lost(store):
+    """Concurrent read-modify-write changes all land, retried on conflict"""
+    writers = 8
+    start = threading.Barrier(writers)
+
+    def tag(name: str):
+        start.wait()
+        store.modify(CAMPAIGN, lambda manifest: manifest.setdefault('tags', {}).update({name: True}))
+
+    threads = [threading.Thread(target=tag, args=(f"writer-{i}",)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(store.load(CAMPAIGN)['tags']) == sorted(f"writer-{i}" for i in range(writers))
+
+
+def test_stale_if_match_is_rejected(store):
+    stale = store.s3.get_object(Bucket=BUCKET, Key=f"output/{CAMPAIGN}/manifest.json")['ETag']
+    store.update_product(CAMPAIGN, 0, {'status': 'completed'})
+    store.compact(CAMPAIGN)
+
+    with pytest.raises(ClientError) as error:
+        store.save(CAMPAIGN, {'campaign_id': CAMPAIGN, 'products': []}, if_match=stale)
+    assert error.value.response['Error']['Code'] == 'PreconditionFailed'
+    assert store.load(CAMPAIGN)['products'][0]['status'] == 'completed'
+
+
+def test_promotion_waits_for_final_round(store):
+    """Products promoted from a completed preview round only count as done once their final variants are in"""
+    for index in range(PRODUCTS):
+        store.update_product(CAMPAIGN, index, {'status': 'completed', 'tier': 'preview', 'variants': [{'platform': 'instagram_square'}]})
+    assert store.complete_if_done(CAMPAIGN)
+
+    store.update_campaign(CAMPAIGN, {'status': 'processing'})
+    for index in (0, 1):
+        store.update_product(CAMPAIGN, index, {'status': 'processing', 'awaiting_tier': 'final'})
+
+    store.update_product(CAMPAIGN, 0, {'status': 'completed', 'tier': 'final'})
+    assert not store.complete_if_done(CAMPAIGN)
+
+    store.update_product(CAMPAIGN, 1, {'status': 'completed', 'tier': 'final'})
+    assert store.complete_if_done(CAMPAIGN)
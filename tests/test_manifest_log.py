@@ -0,0 +1,131 @@
+"""Manifest delta log ordering: sequence order, late entries and folded entries"""
+
+import pytest
+
+from shared.manifest import ManifestStore, LocalObjects, LocalLogSequence, ObjectLogSequence, UNFOLDED_TTL, encode, log_key, mark_folded, is_folded
+from dashboard.progress import ProgressTracker
+
+BUCKET = 'campaigns'
+CAMPAIGN = 'test-campaign-20250101-000000'
+
+
+@pytest.fixture
+def objects(tmp_path):
+    return LocalObjects(str(tmp_path / 'objects'))
+
+
+@pytest.fixture
+def sequence(tmp_path):
+    return LocalLogSequence(str(tmp_path / 'sequences'))
+
+
+@pytest.fixture
+def store(objects, sequence):
+    store = ManifestStore(objects, BUCKET, sequence)
+    store.save(CAMPAIGN, {'campaign_id': CAMPAIGN, 'products': [{'index': 0, 'status': 'processing'}]})
+    return store
+
+
+def status(manifest, index):
+    return next(p['status'] for p in manifest['products'] if p.get('index', p.get('product_index')) == index)
+
+
+def write_late(objects, sequence_number, delta):
+    """An entry whose writer took its sequence number earlier but whose PUT lands now"""
+    objects.put_object(Bucket=BUCKET, Key=log_key(CAMPAIGN, sequence_number), Body=encode(delta))
+
+
+def test_entries_apply_in_sequence_order(store):
+    store.update_product(CAMPAIGN, 0, {'status': 'generated'})
+    store.update_product(CAMPAIGN, 0, {'status': 'completed'})
+
+    assert status(store.load(CAMPAIGN), 0) == 'completed'
+    assert status(store.compact(CAMPAIGN), 0) == 'completed'
+
+
+def test_late_entry_below_folded_ones_is_applied(store, objects, sequence):
+    late = sequence.next(CAMPAIGN)
+    store.update_product(CAMPAIGN, 1, {'status': 'completed'})
+    store.compact(CAMPAIGN)
+
+    write_late(objects, late, {'product': 2, 'set': {'status': 'completed'}})
+    assert status(store.load(CAMPAIGN), 2) == 'completed'
+
+    # The next compaction folds it and clears the gap
+    manifest = store.compact(CAMPAIGN)
+    assert status(manifest, 2) == 'completed'
+    assert manifest['manifest_log'] == {'sequence': 2, 'unfolded': {}}
+
+
+def test_folded_entry_is_not_reapplied(store, objects):
+    store.update_product(CAMPAIGN, 0, {'status': 'generated'})
+    store.update_product(CAMPAIGN, 0, {'status': 'completed'})
+    store.compact(CAMPAIGN)
+
+    # A folded entry still listed (its deletion not yet visible) must not roll the product back
+    write_late(objects, 1, {'product': 0, 'set': {'status': 'generated'}})
+    assert status(store.load(CAMPAIGN), 0) == 'completed'
+
+
+def test_progress_tracker_applies_late_entry(store, objects, sequence):
+    tracker = ProgressTracker(objects, BUCKET)
+    late = sequence.next(CAMPAIGN)
+    store.update_product(CAMPAIGN, 0, {'status': 'completed'})
+    assert status(tracker.get(CAMPAIGN), 0) == 'completed'
+
+    # Lands after the tracker has applied a later entry: still applied, and before it
+    write_late(objects, late, {'product': 0, 'set': {'status': 'generated', 'image_key': 'image.png'}})
+    manifest = tracker.get(CAMPAIGN)
+    assert status(manifest, 0) == 'completed'
+    assert manifest['products'][0]['image_key'] == 'image.png'
+
+
+def test_progress_tracker_after_compaction(store):
+    tracker = ProgressTracker(store.s3, BUCKET)
+    store.update_product(CAMPAIGN, 0, {'status': 'generated'})
+    tracker.get(CAMPAIGN)
+
+    store.update_product(CAMPAIGN, 0, {'status': 'completed'})
+    store.compact(CAMPAIGN)
+    assert status(tracker.get(CAMPAIGN), 0) == 'completed'
+
+
+def test_hosts_without_shared_counter_never_share_a_key(objects, tmp_path):
+    # Each host's own counter starts at 1: the conditional write moves the loser past the taken numbers
+    first = ManifestStore(objects, BUCKET, LocalLogSequence(str(tmp_path / 'host-a')))
+    second = ManifestStore(objects, BUCKET, LocalLogSequence(str(tmp_path / 'host-b')))
+    first.save(CAMPAIGN, {'campaign_id': CAMPAIGN, 'products': []})
+
+    first.update_product(CAMPAIGN, 0, {'status': 'generated'})
+    second.update_product(CAMPAIGN, 1, {'status': 'generated'})
+    first.update_product(CAMPAIGN, 2, {'status': 'generated'})
+
+    manifest = first.load(CAMPAIGN)
+    assert [status(manifest, index) for index in range(3)] == ['generated'] * 3
+
+
+def test_object_sequence_numbers_past_folded_entries(objects):
+    store = ManifestStore(objects, BUCKET, ObjectLogSequence(objects, BUCKET))
+    store.save(CAMPAIGN, {'campaign_id': CAMPAIGN, 'products': []})
+    store.update_product(CAMPAIGN, 0, {'status': 'generated'})
+    store.update_product(CAMPAIGN, 1, {'status': 'generated'})
+    store.compact(CAMPAIGN)
+
+    # The folded entries are deleted: numbering continues from the manifest, not from 1
+    assert store.log_entries(CAMPAIGN) == []
+    other = ManifestStore(objects, BUCKET, ObjectLogSequence(objects, BUCKET))
+    other.update_product(CAMPAIGN, 0, {'status': 'completed'})
+    assert store.log_entries(CAMPAIGN) == [(3, log_key(CAMPAIGN, 3))]
+    assert status(store.load(CAMPAIGN), 0) == 'completed'
+
+
+def test_numbers_never_written_are_pruned():
+    manifest = {}
+    mark_folded(manifest, [3], now=0)
+    assert not is_folded(manifest, 1) and not is_folded(manifest, 2)
+
+    mark_folded(manifest, [1, 4], now=UNFOLDED_TTL - 1)
+    assert manifest['manifest_log'] == {'sequence': 4, 'unfolded': {'2': 0}}
+
+    mark_folded(manifest, [5], now=UNFOLDED_TTL)
+    assert manifest['manifest_log'] == {'sequence': 5, 'unfolded': {}}
@@ -0,0 +1,16 @@
+"""Campaign progress summary shown on the dashboard"""
+
+from dashboard.progress import summarize
+
+
+def test_failed_products_finish_the_bar():
+    manifest = {
+        'status': 'completed',
+        'expected_products': 2,
+        'products': [{'index': 0, 'status': 'completed'}, {'index': 1, 'status': 'failed', 'error': 'throttled'}]
+    }
+
+    summary = summarize(manifest)
+
+    assert summary['fraction'] == 1.0
+    assert (summary['completed'], summary['failed']) == (1, 1)
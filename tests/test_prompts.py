@@ -0,0 +1,75 @@
+"""Prompt compiler: 512-character budget, product names kept, memoized per product"""
+
+import random
+
+import pytest
+
+from shared.prompts import MAX_PROMPT_LENGTH, PromptCompiler, build_prompt, campaign_compiler
+
+WORDS = 'organic vanilla bottle matte finish recycled glass citrus notes limited edition amber cap gift set'.split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def generated_brief(products: int, seed: int = 7):
+    """A large brief: long, repetitive descriptions, asides, and a few very long product names"""
+    rng = random.Random(seed)
+    brief = []
+    for index in range(products):
+        name = f"Product {index} " + ' '.join(rng.choice(WORDS) for _ in range(rng.choice((1, 3, 30))))
+        description = ' '.join(sentence(rng, rng.randint(5, 25)) for _ in range(rng.randint(1, 40)))
+        if index % 3 == 0:
+            description += ' (includes travel pouch and refill pack)'
+        brief.append((name, description, rng.choice(('US', 'EU', 'LATAM', '')), rng.choice(('Adults 25-45 ' * 10, 'Teens', ''))))
+    return brief
+
+
+MESSAGE = 'Discover the new season of sustainable luxury. ' * 8
+
+
+@pytest.fixture
+def compiler():
+    return PromptCompiler(MESSAGE)
+
+
+def test_every_prompt_fits_the_budget_and_keeps_the_name(compiler):
+    for name, description, region, audience in generated_brief(500):
+        prompt = compiler.compile(name, description, region, audience)
+        assert len(prompt) <= MAX_PROMPT_LENGTH
+        assert name in prompt
+
+
+def test_short_prompt_is_left_whole():
+    prompt = PromptCompiler('Summer sale').compile('Water Bottle', 'Keeps drinks cold.', 'US', 'Hikers')
+    for part in ('Water Bottle', 'Keeps drinks cold.', 'Target Market: US', 'Target Audience: Hikers', 'Campaign Message: Summer sale'):
+        assert part in prompt
+
+
+def test_product_name_over_budget_is_truncated_to_the_budget(compiler):
+    prompt = compiler.compile('Gigantic ' * 100, 'Anything.', 'US', '')
+    assert len(prompt) == MAX_PROMPT_LENGTH
+    assert prompt.startswith('Professional commercial product photography of Gigantic')
+
+
+def test_repeated_products_are_memoized(compiler):
+    brief = generated_brief(200)
+    # A large brief repeats its products across rounds and regional variants
+    for _ in range(5):
+        for name, description, region, audience in brief:
+            compiler.compile(name, description, region, audience)
+
+    info = compiler.compile.cache_info()
+    assert info.misses == len(set(brief))
+    assert info.hits == 5 * len(brief) - len(set(brief))
+
+
+def test_build_prompt_reuses_the_campaign_compiler():
+    campaign_compiler.cache_clear()
+    name, description, region, audience = generated_brief(1)[0]
+
+    first = build_prompt(name, description, MESSAGE, audience, region)
+    assert build_prompt(name, description, MESSAGE, audience, region) == first
+    assert campaign_compiler.cache_info().misses == 1
+    assert campaign_compiler(MESSAGE).compile.cache_info().hits == 1
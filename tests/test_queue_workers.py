@@ -0,0 +1,104 @@
+"""Parser and variants queue workers: SQS errors and dead render processes never stop the loop"""
+
+import os
+import sys
+import threading
+
+from botocore.exceptions import ClientError
+
+from conftest import stage_module
+
+variants_worker = stage_module('variants', 'worker')
+parser_worker = stage_module('parser', 'worker')
+
+
+def record(body: str):
+    return {'messageId': body, 'receiptHandle': body, 'body': body}
+
+
+def throttled(operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation)
+
+
+class ScriptedPoller:
+    """Plays back receive results (lists, or exceptions to raise), then stops the worker"""
+
+    def __init__(self, script, stopping: threading.Event, failing_deletes: int = 0):
+        self.queue_url = 'https://sqs.test/queue'
+        self.script = list(script)
+        self.stopping = stopping
+        self.failing_deletes = failing_deletes
+        self.deleted = []
+
+    def receive(self, max_messages=10, wait_seconds=20):
+        if not self.script:
+            self.stopping.set()
+            return []
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+    def delete(self, records):
+        self.deleted.extend(r['messageId'] for r in records)
+
+
+def run_worker(module, monkeypatch, poller):
+    monkeypatch.setattr(module, 'QueuePoller', lambda sqs, url: poller)
+    monkeypatch.setattr(module, 'stop_on_signals', lambda: poller.stopping)
+    monkeypatch.setattr(module.boto3, 'client', lambda service: None)
+    monkeypatch.setattr(module, 'RECEIVE_ERROR_DELAY', 0.01)
+    worker = threading.Thread(target=module.main, daemon=True)
+    worker.start()
+    worker.join(30)
+    assert not worker.is_alive()
+
+
+def render(body: str):
+    if body == 'oom':
+        os._exit(137)  # Killed mid-render, as by the OOM killer
+    return {'statusCode': 200}
+
+
+def no_warm():
+    pass
+
+
+def test_variants_worker_survives_receive_errors_and_a_dead_render_process(monkeypatch):
+    monkeypatch.setenv('VARIANTS_QUEUE_URL', 'https://sqs.test/variants')
+    monkeypatch.setattr(variants_worker, 'WORKER_PROCESSES', 1)
+    monkeypatch.setattr(variants_worker, 'render', render)
+    monkeypatch.setattr(variants_worker, 'warm', no_warm)
+    poller = ScriptedPoller([throttled('ReceiveMessage'), [record('first')], [record('oom')], [record('after')]], threading.Event())
+
+    run_worker(variants_worker, monkeypatch, poller)
+
+    # The killed render is left for redelivery; the pool is replaced and keeps rendering
+    assert poller.deleted == ['first', 'after']
+
+
+def test_parser_worker_survives_receive_errors(monkeypatch):
+    monkeypatch.setenv('CAMPAIGN_QUEUE_URL', 'https://sqs.test/campaigns')
+    handled = []
+
+    class App:
+        @staticmethod
+        def handler(event, context):
+            handled.extend(r['messageId'] for r in event['Records'])
+            return {'batchItemFailures': []}
+
+    monkeypatch.setitem(sys.modules, 'app', App)
+    poller = ScriptedPoller([throttled('ReceiveMessage'), [record('brief')]], threading.Event())
+
+    run_worker(parser_worker, monkeypatch, poller)
+    assert handled == ['brief'] and poller.deleted == ['brief']
+
+
+def test_failed_delete_is_logged_not_raised():
+    from shared.queue_worker import QueuePoller
+
+    class SQS:
+        def delete_message_batch(self, **kwargs):
+            raise throttled('DeleteMessageBatch')
+
+    QueuePoller(SQS(), 'https://sqs.test/queue').delete([record('done')])
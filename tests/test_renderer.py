@@ -0,0 +1,40 @@
+"""Variant renderers: local renders hand the upload their JPEG buffers, pooled renders return bytes"""
+
+from io import BytesIO
+
+from PIL import Image
+
+from conftest import stage_path
+
+stage_path('variants')
+
+import renderer  # noqa: E402
+from compositor import Compositor  # noqa: E402
+
+JOB = {
+    'size': (120, 90),
+    'message': 'Fresh for spring',
+    'colors': ['#1E3A8A'],
+    'scale': 0.1,
+    'thumbnail_size': (32, 32),
+    'thumbnail_quality': 80
+}
+
+
+def test_local_render_returns_rewound_buffers():
+    compositor = Compositor(Image.new('RGB', (64, 48), '#FF0000'))
+    image_jpeg, thumbnail_jpeg = renderer.LocalRenderer(lambda: compositor).submit(JOB).result()
+
+    for buffer, size in ((image_jpeg, JOB['size']), (thumbnail_jpeg, (32, 24))):
+        assert isinstance(buffer, BytesIO) and buffer.tell() == 0
+        with Image.open(buffer) as image:
+            assert image.format == 'JPEG' and image.size == size
+
+
+def test_render_is_deferred_until_its_result_is_needed():
+    calls = []
+    future = renderer.LocalRenderer(lambda: calls.append(1) or Compositor(Image.new('RGB', (8, 8)))).submit(JOB)
+    assert calls == []
+    future.result()
+    future.result()
+    assert calls == [1]
@@ -0,0 +1,29 @@
+"""Status channel: every dashboard process sees every event"""
+
+import json
+import os
+
+from dashboard.status_channel import LocalBackend, StatusChannel
+
+
+def publish(directory, name, event):
+    with open(os.path.join(directory, f"{name}.json"), 'w') as f:
+        json.dump(event, f)
+
+
+def test_local_readers_do_not_consume_events(tmp_path):
+    first, second = LocalBackend(str(tmp_path)), LocalBackend(str(tmp_path))
+    publish(str(tmp_path), '20250101T000000000000-a', {'campaign_id': 'c', 'status': 'generated'})
+
+    assert first.receive() == [{'campaign_id': 'c', 'status': 'generated'}]
+    assert second.receive() == [{'campaign_id': 'c', 'status': 'generated'}]
+
+    # An event renamed into place late, with an earlier name, is still delivered once
+    publish(str(tmp_path), '20241231T235959000000-b', {'campaign_id': 'c', 'status': 'completed'})
+    assert first.receive() == [{'campaign_id': 'c', 'status': 'completed'}]
+    assert first.receive() == []
+
+
+def test_wait_returns_at_once_without_events(tmp_path):
+    channel = StatusChannel(LocalBackend(str(tmp_path)))
+    assert channel.wait('c', 0) == []
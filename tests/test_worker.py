@@ -0,0 +1,77 @@
+"""Generator queue worker: class slots follow the shared concurrency limit"""
+
+import asyncio
+import threading
+
+from conftest import stage_path
+
+stage_path('generator')
+
+import worker  # noqa: E402
+from worker import Slots, follow_limit  # noqa: E402
+
+
+def test_slots_shrink_without_revoking_held_permits():
+    async def scenario():
+        slots = Slots(3)
+        for _ in range(3):
+            await slots.acquire()
+
+        slots.resize(1)
+        slots.release()
+        slots.release()
+        assert slots.locked()
+
+        waiting = asyncio.create_task(slots.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        slots.release()
+        await asyncio.wait_for(waiting, 1)
+        assert slots.in_use == 1
+
+    asyncio.run(scenario())
+
+
+def test_slots_grow_wakes_waiters():
+    async def scenario():
+        slots = Slots(1)
+        await slots.acquire()
+        waiters = [asyncio.create_task(slots.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        slots.resize(3)
+        await asyncio.wait_for(asyncio.gather(*waiters), 1)
+        assert slots.in_use == 3
+
+    asyncio.run(scenario())
+
+
+class SharedLimit:
+    def __init__(self, shares):
+        self.current = shares
+
+    def shares(self):
+        return self.current
+
+
+def test_follow_limit_caps_classes_at_their_share(monkeypatch):
+    monkeypatch.setattr(worker, 'LIMIT_REFRESH_SECONDS', 0.01)
+    limits = {'urgent': 8, 'bulk': 8}
+    slots = {name: Slots(limit) for name, limit in limits.items()}
+    controller = SharedLimit({'urgent': 4, 'bulk': 12})
+    stopping = threading.Event()
+
+    async def scenario():
+        following = asyncio.create_task(follow_limit(controller, limits, slots, stopping))
+        await asyncio.sleep(0.05)
+        assert (slots['urgent'].limit, slots['bulk'].limit) == (4, 8)
+
+        controller.current = {'urgent': 2, 'bulk': 2}
+        await asyncio.sleep(0.05)
+        assert (slots['urgent'].limit, slots['bulk'].limit) == (2, 2)
+
+        stopping.set()
+        await asyncio.wait_for(following, 1)
+
+    asyncio.run(scenario())
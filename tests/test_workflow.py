@@ -0,0 +1,75 @@
+"""Workflow completion barrier: campaigns finalize exactly once"""
+
+import threading
+
+import pytest
+
+from shared.workflow import SQLiteWorkflowStore, record_product_outcome
+from shared.manifest import ManifestStore, LocalObjects, LocalLogSequence
+
+BUCKET = 'campaigns'
+CAMPAIGN = 'barrier-campaign-20250101-000000'
+PRODUCTS = 50
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteWorkflowStore(str(tmp_path / 'workflow.db'))
+    store.start_campaign(CAMPAIGN, PRODUCTS)
+    return store
+
+
+def complete_concurrently(outcome, indexes):
+    """Run outcome(index) for every index at once, returning the results"""
+    start = threading.Barrier(len(indexes))
+    results = {}
+
+    def run(index: int):
+        start.wait()
+        results[index] = outcome(index)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_barrier_releases_exactly_once(store):
+    results = complete_concurrently(lambda i: store.complete_product(CAMPAIGN, i, succeeded=i % 10 != 0), range(PRODUCTS))
+
+    summaries = [summary for summary in results.values() if summary]
+    assert summaries == [{'expected': PRODUCTS, 'completed': PRODUCTS, 'failed': PRODUCTS // 10}]
+    assert store.get_campaign(CAMPAIGN)['finalized']
+
+
+def test_repeated_completions_count_once(store):
+    # Redelivered messages complete the same products again
+    results = complete_concurrently(lambda i: store.complete_product(CAMPAIGN, i % PRODUCTS, succeeded=True), range(PRODUCTS * 2))
+
+    assert sum(1 for summary in results.values() if summary) == 1
+    assert store.get_campaign(CAMPAIGN)['completed'] == PRODUCTS
+    assert store.complete_product(CAMPAIGN, 0, succeeded=True) is None
+
+
+def test_unfinished_campaign_is_not_finalized(store):
+    for index in range(PRODUCTS - 1):
+        assert store.complete_product(CAMPAIGN, index, succeeded=True) is None
+
+    campaign = store.get_campaign(CAMPAIGN)
+    assert campaign['completed'] == PRODUCTS - 1
+    assert not campaign['finalized']
+
+
+def test_manifest_finalized_once(store, tmp_path, monkeypatch):
+    monkeypatch.setenv('MANIFEST_STORE_DIR', str(tmp_path / 'objects'))
+    manifests = ManifestStore(LocalObjects(str(tmp_path / 'objects')), BUCKET, LocalLogSequence(str(tmp_path / 'objects' / '.sequences')))
+    manifests.save(CAMPAIGN, {'campaign_id': CAMPAIGN, 'status': 'processing', 'products': []})
+
+    results = complete_concurrently(lambda i: record_product_outcome(store, None, BUCKET, CAMPAIGN, i, True), range(PRODUCTS))
+
+    assert list(results.values()).count(True) == 1
+    manifest = manifests.load(CAMPAIGN)
+    assert manifest['status'] == 'completed'
+    assert manifest['failed_products'] == 0